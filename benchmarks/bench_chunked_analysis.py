@@ -0,0 +1,54 @@
+"""
+Benchmark analyzer latency over document length with chunked map-reduce analysis
+
+Uses the stub LLM so the numbers reflect chunk count and batching, not model speed.
+
+Usage:
+    python -m benchmarks.bench_chunked_analysis [--tokens 1000 4000 16000 64000] [--latency 0.5]
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import print_table
+from benchmarks.stubs import install_stub_llm
+from benchmarks.synthetic import LINES
+
+def _document(tokens: int) -> str:
+    """Synthetic clinical text of roughly the requested token count, with page breaks"""
+    page = "\n".join(LINES)
+    pages = []
+    while sum(len(p) for p in pages) < tokens * 4:
+        pages.append(page)
+    return "\n\n".join(pages)
+
+def run(token_counts, latency: float, batch_sizes):
+    install_stub_llm(latency=latency, tokens_per_second=200.0)
+    from medical_analyzer.core import llm_chain
+    from medical_analyzer.core.chunking import estimate_tokens, split_into_chunks
+    from medical_analyzer.core.config import settings
+    
+    rows = []
+    for tokens in token_counts:
+        document = _document(tokens)
+        chunks = len(split_into_chunks(document, llm_chain.analysis_token_budget()))
+        row = {"doc_tokens": estimate_tokens(document), "chunks": chunks}
+        for batch_size in batch_sizes:
+            settings.BATCH_SIZE = batch_size
+            start = time.perf_counter()
+            asyncio.run(llm_chain.analyze_document({"context": document, "bypass_cache": True}))
+            row[f"batch_{batch_size}_s"] = time.perf_counter() - start
+        rows.append(row)
+    print_table(f"Chunked analysis (budget {llm_chain.analysis_token_budget()} tokens/chunk)", rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tokens", type=int, nargs="+", default=[1000, 4000, 16000, 64000], help="Document lengths in tokens")
+    parser.add_argument("--latency", type=float, default=0.5, help="Stub LLM latency per call in seconds")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4], help="BATCH_SIZE values to compare")
+    args = parser.parse_args()
+    run(args.tokens, args.latency, args.batch_sizes)
+
+if __name__ == "__main__":
+    main()
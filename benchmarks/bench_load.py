@@ -0,0 +1,270 @@
+"""
+Load test the analysis pipeline at increasing concurrency with a stub LLM and synthetic PDFs
+
+The same documents are driven through process_medical_document on a thread
+pool ('direct') and through the FastAPI app in-process over ASGI ('app':
+upload, then poll the job). Per-stage latencies come from the timings block of
+each result. Results are written as JSON tagged with the commit, so two runs
+can be compared with --compare.
+
+Usage:
+    python -m benchmarks.bench_load [--concurrency 1 2 4 8] [--docs 16] [--kinds text scanned]
+        [--pages 1 5 20] [--target direct app] [--latency 0.2] [--tokens-per-second 50]
+        [--output load.json] [--compare benchmarks/results/load-<commit>.json]
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmarks.common import PeakRssSampler, load_results, print_table, summarize, write_results
+from benchmarks.stubs import install_stub_llm
+from benchmarks.synthetic import generate_documents
+
+TARGETS = ("direct", "app")
+
+# Stage of the end-to-end latency seen by the caller (queueing included for the app)
+END_TO_END = "end_to_end"
+
+def _record(samples: Dict[str, List[float]], result: Dict[str, Any], latency: float):
+    """Add the stage durations of one analysed document to the samples"""
+    samples.setdefault(END_TO_END, []).append(latency)
+    for stage, seconds in ((result.get("timings") or {}).get("stages") or {}).items():
+        samples.setdefault(stage, []).append(seconds)
+    for page in result.get("pages") or []:
+        if page.get("source") == "ocr" and page.get("seconds") is not None:
+            samples.setdefault("ocr_page", []).append(page["seconds"])
+
+def _level(target: str, concurrency: int, docs: int, failures: int, elapsed: float,
+           samples: Dict[str, List[float]], peak_rss_mb: float, **extra) -> Dict[str, Any]:
+    return {
+        "target": target,
+        "concurrency": concurrency,
+        "docs": docs,
+        "failures": failures,
+        "elapsed_s": elapsed,
+        "docs_per_second": (docs - failures) / elapsed if elapsed else 0.0,
+        "peak_rss_mb": peak_rss_mb,
+        "stages": {stage: {"count": len(values), **summarize(values)} for stage, values in sorted(samples.items())},
+        **extra,
+    }
+
+def run_direct(documents: List[Dict], concurrency: int, docs: int) -> Dict[str, Any]:
+    """Call process_medical_document from `concurrency` threads"""
+    from medical_analyzer.core.processor import process_medical_document
+    
+    def analyze(document: Dict) -> tuple:
+        start = time.perf_counter()
+        result = process_medical_document(document["path"], bypass_cache=True)
+        return result, time.perf_counter() - start
+    
+    samples: Dict[str, List[float]] = {}
+    failures = 0
+    with PeakRssSampler() as rss:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(analyze, document) for document in itertools.islice(itertools.cycle(documents), docs)]
+            for future in futures:
+                try:
+                    result, latency = future.result()
+                except Exception:
+                    failures += 1
+                    continue
+                _record(samples, result, latency)
+        elapsed = time.perf_counter() - start
+    return _level("direct", concurrency, docs, failures, elapsed, samples, rss.peak_mb)
+
+async def _drive_app(app, documents: List[Dict], concurrency: int, docs: int, poll_interval: float) -> Dict[str, Any]:
+    import httpx
+    
+    queue: asyncio.Queue = asyncio.Queue()
+    for document in itertools.islice(itertools.cycle(documents), docs):
+        queue.put_nowait(document)
+    payloads = {document["path"]: Path(document["path"]).read_bytes() for document in documents}
+    samples: Dict[str, List[float]] = {}
+    counts = {"failures": 0, "rejected": 0}
+    
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        async def analyze(document: Dict):
+            start = time.perf_counter()
+            files = {"file": (Path(document["path"]).name, payloads[document["path"]], "application/pdf")}
+            response = await client.post("/analyze-medical-document", params={"no_cache": "true"}, files=files)
+            # A full queue answers 503; back off and retry like a client would
+            while response.status_code == 503:
+                counts["rejected"] += 1
+                await asyncio.sleep(poll_interval * 10)
+                response = await client.post("/analyze-medical-document", params={"no_cache": "true"}, files=files)
+            if response.status_code != 202:
+                counts["failures"] += 1
+                return
+            job = response.json()
+            while job["job_status"] in ("queued", "running"):
+                await asyncio.sleep(poll_interval)
+                job = (await client.get(job["status_url"])).json()
+            if job["job_status"] != "succeeded":
+                counts["failures"] += 1
+                return
+            _record(samples, job["result"], time.perf_counter() - start)
+        
+        async def client_loop():
+            while not queue.empty():
+                await analyze(queue.get_nowait())
+        
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return {"elapsed": elapsed, "samples": samples, **counts}
+
+def run_app(documents: List[Dict], concurrency: int, docs: int, poll_interval: float = 0.05) -> Dict[str, Any]:
+    """Upload through the FastAPI app from `concurrency` clients and poll the jobs"""
+    from medical_analyzer.app import app
+    
+    with PeakRssSampler() as rss:
+        outcome = asyncio.run(_drive_app(app, documents, concurrency, docs, poll_interval))
+    return _level(
+        "app", concurrency, docs, outcome["failures"], outcome["elapsed"], outcome["samples"], rss.peak_mb,
+        rejected=outcome["rejected"]
+    )
+
+def _print_levels(levels: List[Dict[str, Any]]):
+    rows = []
+    for level in levels:
+        end_to_end = level["stages"].get(END_TO_END, {})
+        rows.append({
+            "target": level["target"],
+            "concurrency": level["concurrency"],
+            "docs": level["docs"],
+            "failed": level["failures"],
+            "docs_per_s": level["docs_per_second"],
+            "p50_s": end_to_end.get("p50_ms", 0.0) / 1000,
+            "p95_s": end_to_end.get("p95_ms", 0.0) / 1000,
+            "p99_s": end_to_end.get("p99_ms", 0.0) / 1000,
+            "peak_rss_mb": level["peak_rss_mb"],
+        })
+    print_table("Throughput", rows)
+    
+    rows = [
+        {
+            "target": level["target"],
+            "concurrency": level["concurrency"],
+            "stage": stage,
+            "count": stats["count"],
+            "p50_ms": stats["p50_ms"],
+            "p95_ms": stats["p95_ms"],
+            "p99_ms": stats["p99_ms"],
+        }
+        for level in levels
+        for stage, stats in level["stages"].items()
+        if stage != END_TO_END
+    ]
+    print_table("Stage latency", rows)
+
+def _print_comparison(baseline: Dict[str, Any], levels: List[Dict[str, Any]]):
+    """Docs/sec and end-to-end p95 of this run against an earlier results file"""
+    previous = {(level["target"], level["concurrency"]): level for level in baseline.get("levels", [])}
+    rows = []
+    for level in levels:
+        before = previous.get((level["target"], level["concurrency"]))
+        if before is None:
+            continue
+        p95_before = before["stages"].get(END_TO_END, {}).get("p95_ms", 0.0)
+        p95_after = level["stages"].get(END_TO_END, {}).get("p95_ms", 0.0)
+        rows.append({
+            "target": level["target"],
+            "concurrency": level["concurrency"],
+            "docs_per_s_before": before["docs_per_second"],
+            "docs_per_s_after": level["docs_per_second"],
+            "change_pct": (level["docs_per_second"] / before["docs_per_second"] - 1) * 100 if before["docs_per_second"] else 0.0,
+            "p95_s_before": p95_before / 1000,
+            "p95_s_after": p95_after / 1000,
+        })
+    print_table(f"Against {baseline.get('commit', 'baseline')}", rows)
+
+def run(
+    concurrencies: List[int],
+    docs: int,
+    kinds: List[str],
+    page_counts: List[int],
+    targets: List[str],
+    latency: float,
+    tokens_per_second: float,
+    extraction_cache: bool,
+    output: Optional[str],
+    compare: Optional[str]
+):
+    install_stub_llm(latency=latency, tokens_per_second=tokens_per_second)
+    from medical_analyzer.core.config import settings
+    from medical_analyzer.core.llm_chain import warm_chain_registry
+    from medical_analyzer.services.ocr_engines import ocr_worker_pool, warm_ocr_engines
+    
+    # Repeated documents would otherwise skip extraction after the first pass
+    settings.EXTRACTION_CACHE_ENABLED = extraction_cache
+    
+    # Compile the chain and load the OCR engine up front, as the server does at startup
+    warm_chain_registry()
+    try:
+        warm_ocr_engines()
+    except Exception as e:
+        print(f"OCR warm-up failed, scanned pages may not be OCR'd: {e}")
+    
+    levels = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        documents = generate_documents(tmp_dir, kinds, page_counts)
+        for target in targets:
+            for concurrency in concurrencies:
+                print(f"{target}: {docs} documents at concurrency {concurrency}...")
+                if target == "direct":
+                    levels.append(run_direct(documents, concurrency, docs))
+                else:
+                    levels.append(run_app(documents, concurrency, docs))
+    ocr_worker_pool.shutdown()
+    
+    _print_levels(levels)
+    path = write_results("load", {
+        "config": {
+            "concurrency": concurrencies,
+            "docs_per_level": docs,
+            "kinds": kinds,
+            "pages": page_counts,
+            "stub_latency_s": latency,
+            "stub_tokens_per_second": tokens_per_second,
+            "extraction_cache": extraction_cache,
+            "ocr_engine": settings.OCR_ENGINE,
+            "pipeline_mode": settings.PIPELINE_MODE,
+        },
+        "levels": levels,
+    }, output)
+    print(f"Results written to {path}")
+    
+    if compare:
+        _print_comparison(load_results(compare), levels)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8], help="Concurrent documents per level")
+    parser.add_argument("--docs", type=int, default=16, help="Documents analyzed per level")
+    parser.add_argument("--kinds", nargs="+", choices=["text", "scanned", "mixed"], default=["text", "scanned"], help="Synthetic document kinds")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5, 20], help="Page counts of the synthetic documents")
+    parser.add_argument("--target", nargs="+", choices=TARGETS, default=list(TARGETS), help="Drive the processor directly, the app, or both")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub LLM prompt latency in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Stub LLM generation rate")
+    parser.add_argument("--extraction-cache", action="store_true", help="Keep the extraction cache on (repeat documents skip OCR)")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/load-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare throughput and p95 against")
+    args = parser.parse_args()
+    
+    # The app's job pool is sized from the environment when it is first imported
+    os.environ.setdefault("JOB_WORKERS", str(max(args.concurrency)))
+    os.environ.setdefault("JOB_QUEUE_LIMIT", str(max(args.concurrency) * 4))
+    
+    run(args.concurrency, args.docs, args.kinds, args.pages, args.target, args.latency,
+        args.tokens_per_second, args.extraction_cache, args.output, args.compare)
+
+if __name__ == "__main__":
+    main()
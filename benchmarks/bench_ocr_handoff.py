@@ -0,0 +1,83 @@
+"""
+Micro-benchmark of the per-page overhead of handing a rasterized page to the OCR engine
+
+Compares the old path (pixmap -> PIL -> JPEG temp file -> decoded back by the
+engine) with the in-memory path (pixmap buffer -> numpy array -> BGR view),
+excluding recognition itself. With --paddle the full PaddleOCR call is timed
+for both inputs as well.
+
+Usage:
+    python -m benchmarks.bench_ocr_handoff [--pages 10] [--dpi 200] [--paddle]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pymupdf
+from PIL import Image
+
+from benchmarks.common import summarize, print_table
+from benchmarks.synthetic import generate_scanned_pdf
+from medical_analyzer.services.ocr import pixmap_to_array
+from medical_analyzer.services.ocr_engines import PaddleEngine
+
+def _via_temp_file(pixmap):
+    """Previous handoff: encode a JPEG to disk and decode it again, as Paddle did with a path"""
+    image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as temp:
+        image_path = temp.name
+        image.save(image_path, "JPEG")
+    try:
+        with Image.open(image_path) as decoded:
+            return np.asarray(decoded.convert("RGB"))[:, :, ::-1]
+    finally:
+        os.unlink(image_path)
+
+def _in_memory(pixmap):
+    """Current handoff: copy the pixmap buffer into an array and flip to BGR"""
+    return PaddleEngine.to_bgr(pixmap_to_array(pixmap))
+
+def run(pages: int, dpi: int, with_paddle: bool):
+    engine = None
+    if with_paddle:
+        engine = PaddleEngine()
+        engine.ensure_loaded()
+    
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = generate_scanned_pdf(os.path.join(tmp_dir, "scan.pdf"), pages, dpi=dpi)
+        samples = {"temp_jpeg": [], "in_memory": []}
+        ocr_samples = {"temp_jpeg": [], "in_memory": []}
+        with pymupdf.open(pdf_path) as doc:
+            for page in doc:
+                pixmap = page.get_pixmap(dpi=dpi, alpha=False)
+                for name, handoff in (("temp_jpeg", _via_temp_file), ("in_memory", _in_memory)):
+                    start = time.perf_counter()
+                    array = handoff(pixmap)
+                    samples[name].append(time.perf_counter() - start)
+                    if engine is not None:
+                        start = time.perf_counter()
+                        engine.ocr.ocr(np.ascontiguousarray(array), cls=True)
+                        ocr_samples[name].append(time.perf_counter() - start)
+        
+        for name in samples:
+            stats = summarize(samples[name])
+            row = {"handoff": name, "pages": pages, "mean_ms": stats["mean_ms"], "p95_ms": stats["p95_ms"]}
+            if engine is not None:
+                row["ocr_mean_ms"] = summarize(ocr_samples[name])["mean_ms"]
+            rows.append(row)
+    print_table(f"Per-page OCR handoff overhead ({dpi} DPI)", rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=10, help="Pages to rasterize")
+    parser.add_argument("--dpi", type=int, default=200, help="Rasterization resolution")
+    parser.add_argument("--paddle", action="store_true", help="Also time PaddleOCR on both inputs")
+    args = parser.parse_args()
+    run(args.pages, args.dpi, args.paddle)
+
+if __name__ == "__main__":
+    main()
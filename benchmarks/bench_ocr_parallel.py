@@ -0,0 +1,60 @@
+"""
+Benchmark sequential, per-document process-pool and persistent-worker OCR on synthetic scanned PDFs
+
+The per-document column runs without OCR_PERSISTENT_WORKERS, so the workers
+are started for each document and shut down after it. The persistent pool is
+warmed up before timing, as it is at server startup, so its column excludes
+process spawn and engine load.
+
+Usage:
+    python -m benchmarks.bench_ocr_parallel [--pages 4 16 40] [--workers 4]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from medical_analyzer.core.config import settings
+from medical_analyzer.services import ocr
+from medical_analyzer.services.ocr_engines import ocr_worker_pool
+from benchmarks.common import print_table
+from benchmarks.synthetic import generate_corpus
+
+def _time_ocr(pdf_path: str, workers: int, persistent: bool = False) -> float:
+    ocr_worker_pool.workers = workers
+    settings.OCR_PERSISTENT_WORKERS = persistent
+    if persistent:
+        ocr_worker_pool.warm_up()
+    start = time.perf_counter()
+    ocr.ocr_pdf_pages(pdf_path)
+    return time.perf_counter() - start
+
+def run(page_counts, workers: int):
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for pdf_path, pages in zip(generate_corpus(tmp_dir, page_counts, scanned=True), page_counts):
+            sequential = _time_ocr(pdf_path, 1)
+            parallel = _time_ocr(pdf_path, workers)
+            persistent = _time_ocr(pdf_path, workers, persistent=True)
+            # Back to per-document workers for the next row
+            ocr_worker_pool.shutdown()
+            rows.append({
+                "pages": pages,
+                "sequential_s": sequential,
+                f"parallel_{workers}w_s": parallel,
+                f"persistent_{workers}w_s": persistent,
+                "speedup": sequential / persistent if persistent else 0.0,
+                "pages_per_s": pages / persistent if persistent else 0.0,
+            })
+    print_table(f"OCR engine: {settings.OCR_ENGINE}", rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, nargs="+", default=[4, 16, 40], help="Page counts to benchmark")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="OCR processes for the parallel run")
+    args = parser.parse_args()
+    run(args.pages, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Exercise the pooled async Ollama client against the local stub server
+
+Fires concurrent requests through PooledChatOllama and reports throughput,
+latency percentiles and the retries needed with injected failures.
+
+Usage:
+    python -m benchmarks.bench_ollama_pool [--requests 32] [--concurrency 1 4 8] [--failure-rate 0.1]
+"""
+
+import argparse
+import asyncio
+import time
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from benchmarks.common import summarize, print_table
+from benchmarks.stub_ollama import start_stub_ollama
+
+async def _drive(llm, requests: int, concurrency: int):
+    limit = asyncio.Semaphore(concurrency)
+    samples = []
+    
+    async def one(index: int):
+        async with limit:
+            start = time.perf_counter()
+            await llm.ainvoke([SystemMessage(content="You are a medical report summarizer."), HumanMessage(content=f"Document {index}")])
+            samples.append(time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return time.perf_counter() - start, samples
+
+def run(requests: int, concurrencies, failure_rate: float, num_parallel: int):
+    server, url, stub = start_stub_ollama(latency=0.2, tokens_per_second=200.0, failure_rate=failure_rate, num_parallel=num_parallel)
+    from medical_analyzer.services.llm_pool import OllamaConnectionPool, PooledChatOllama
+    from medical_analyzer.services import llm_pool
+    
+    rows = []
+    try:
+        for concurrency in concurrencies:
+            llm_pool.ollama_pool = OllamaConnectionPool(
+                base_url=url, max_connections=16, max_parallel_per_model=num_parallel,
+                max_retries=5, retry_backoff=0.05, timeout=60,
+            )
+            llm = PooledChatOllama(model="phi3")
+            elapsed, samples = asyncio.run(_drive(llm, requests, concurrency))
+            stats = summarize(samples)
+            rows.append({
+                "concurrency": concurrency,
+                "req_per_s": requests / elapsed,
+                "p50_ms": stats["p50_ms"],
+                "p99_ms": stats["p99_ms"],
+                "retries": llm_pool.ollama_pool.stats()["retries"],
+            })
+            llm_pool.ollama_pool.close()
+    finally:
+        server.shutdown()
+    print_table(f"Pooled Ollama client (stub parallel={num_parallel}, failure rate={failure_rate})", rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=32, help="Requests per run")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8], help="Client concurrency levels")
+    parser.add_argument("--failure-rate", type=float, default=0.1, help="Fraction of stub responses that are 503")
+    parser.add_argument("--num-parallel", type=int, default=4, help="Stub server and per-model client parallelism")
+    args = parser.parse_args()
+    run(args.requests, args.concurrency, args.failure_rate, args.num_parallel)
+
+if __name__ == "__main__":
+    main()
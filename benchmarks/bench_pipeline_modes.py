@@ -0,0 +1,47 @@
+"""
+Benchmark the linear and parallel pipeline modes with a stub LLM of fixed latency
+
+Extraction is skipped by seeding the graph state with a synthetic context, so
+the numbers isolate the LLM stages.
+
+Usage:
+    python -m benchmarks.bench_pipeline_modes [--latency 1.0] [--tokens-per-second 40] [--runs 3]
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import summarize, print_table
+from benchmarks.stubs import install_stub_llm
+from benchmarks.synthetic import LINES
+
+def run(latency: float, tokens_per_second: float, runs: int):
+    install_stub_llm(latency=latency, tokens_per_second=tokens_per_second)
+    from medical_analyzer.core import llm_chain
+    
+    context = "\n".join(LINES * 10)
+    
+    rows = []
+    for mode in llm_chain.PIPELINE_MODES:
+        chain = llm_chain.build_medical_analysis_chain(mode)
+        samples = []
+        for _ in range(runs):
+            state = {"file_name": "synthetic.pdf", "context": context, "pages": []}
+            start = time.perf_counter()
+            asyncio.run(chain.ainvoke(state))
+            samples.append(time.perf_counter() - start)
+        stats = summarize(samples)
+        rows.append({"mode": mode, "runs": runs, "mean_s": stats["mean_ms"] / 1000, "p95_s": stats["p95_ms"] / 1000})
+    print_table(f"Pipeline modes (stub LLM: {latency}s latency, {tokens_per_second} tok/s)", rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=1.0, help="Stub LLM prompt latency in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0, help="Stub LLM generation rate")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per mode")
+    args = parser.parse_args()
+    run(args.latency, args.tokens_per_second, args.runs)
+
+if __name__ == "__main__":
+    main()
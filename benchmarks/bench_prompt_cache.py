@@ -0,0 +1,111 @@
+"""
+Benchmark prompt evaluation time per stage with and without system prompt caching
+
+Stages run in pipeline order (analyzer, summarizer, validator), so without the
+cache the analyzer model alternates between two system prompts and loses the
+prefix on every call. Each request generates a single token, so its latency is
+dominated by prompt evaluation.
+
+llama.cpp: compares the model pool with LLAMACPP_PROMPT_CACHE on and off.
+Ollama: compares stable system prompts with prompts broken by a per-request
+nonce, using the prompt_eval_duration Ollama reports.
+
+Usage:
+    python -m benchmarks.bench_prompt_cache --backend llamacpp --model-path models/phi-3-mini-4k-instruct.Q4_K_M.gguf
+    python -m benchmarks.bench_prompt_cache --backend ollama [--host http://localhost:11434] [--rounds 5]
+"""
+
+import argparse
+import time
+import uuid
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from benchmarks.common import summarize, print_table
+from benchmarks.synthetic import LINES
+
+def _stages():
+    from medical_analyzer.core.llm_chain import ANALYZER_SYSTEM_PROMPT, SUMMARY_SYSTEM_PROMPT, VALIDATOR_SYSTEM_PROMPT
+    document = "\n".join(LINES * 3)
+    return [
+        ("analyzer", "analyzer", ANALYZER_SYSTEM_PROMPT, f"Analyze this medical document:\n\n{document}"),
+        ("summary", "summary", SUMMARY_SYSTEM_PROMPT, f"Generate a detailed medical summary report based on this analysis: {document}"),
+        ("validator", "analyzer", VALIDATOR_SYSTEM_PROMPT, f"Analysis: {document}\nSummary: {document}"),
+    ]
+
+def _run_llamacpp(args):
+    from medical_analyzer.services import model_pool
+    from medical_analyzer.services.model_pool import LlamaCppModelPool, PooledChatLlamaCpp
+    
+    rows = []
+    for cached in (False, True):
+        pool = LlamaCppModelPool(memory_budget_bytes=0, n_ctx=args.context_size, n_threads=args.threads, prompt_cache=cached)
+        pool.register("analyzer", args.model_path)
+        pool.register("summary", args.summary_model_path or args.model_path)
+        model_pool.llamacpp_pool = pool
+        pool.preload()
+        
+        samples = {stage: [] for stage, *_ in _stages()}
+        for _ in range(args.rounds):
+            for stage, model_type, system_prompt, content in _stages():
+                llm = PooledChatLlamaCpp(model_type=model_type, max_tokens=1)
+                start = time.perf_counter()
+                llm.invoke([SystemMessage(content=system_prompt), HumanMessage(content=content)])
+                samples[stage].append(time.perf_counter() - start)
+        pool.close()
+        
+        for stage, values in samples.items():
+            # The first round evaluates each prompt from scratch in both modes
+            stats = summarize(values[1:] or values)
+            rows.append({"stage": stage, "prompt_cache": cached, "p50_ms": stats["p50_ms"], "p95_ms": stats["p95_ms"]})
+    print_table(f"llama.cpp prompt evaluation ({args.rounds} rounds)", rows)
+
+def _run_ollama(args):
+    from medical_analyzer.core.config import settings
+    from medical_analyzer.services import llm_pool
+    from medical_analyzer.services.llm_pool import OllamaConnectionPool, PooledChatOllama
+    
+    llm_pool.ollama_pool = OllamaConnectionPool(
+        base_url=args.host, max_connections=4, max_parallel_per_model=1,
+        max_retries=3, retry_backoff=0.5, timeout=600,
+    )
+    models = {"summary": settings.OLLAMA_SUMMARY_MODEL, "analyzer": settings.OLLAMA_ANALYZER_MODEL}
+    
+    rows = []
+    try:
+        for stable in (False, True):
+            samples = {stage: [] for stage, *_ in _stages()}
+            for _ in range(args.rounds):
+                for stage, model_type, system_prompt, content in _stages():
+                    if not stable:
+                        system_prompt = f"Request {uuid.uuid4()}\n{system_prompt}"
+                    llm = PooledChatOllama(model=models[model_type], keep_alive=settings.OLLAMA_KEEP_ALIVE)
+                    response = llm.invoke([SystemMessage(content=system_prompt), HumanMessage(content=content)])
+                    samples[stage].append(response.response_metadata.get("prompt_eval_duration", 0) / 1e9)
+            for stage, values in samples.items():
+                stats = summarize(values[1:] or values)
+                rows.append({"stage": stage, "stable_prefix": stable, "p50_ms": stats["p50_ms"], "p95_ms": stats["p95_ms"]})
+    finally:
+        llm_pool.ollama_pool.close()
+    print_table(f"Ollama prompt evaluation ({args.rounds} rounds)", rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", choices=["llamacpp", "ollama"], default="llamacpp")
+    parser.add_argument("--rounds", type=int, default=5, help="Passes through the three stages")
+    parser.add_argument("--model-path", help="GGUF model for the analyzer (and summary) stages")
+    parser.add_argument("--summary-model-path", help="Separate GGUF model for the summary stage")
+    parser.add_argument("--context-size", type=int, default=4096)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--host", default="http://localhost:11434", help="Ollama server")
+    args = parser.parse_args()
+    
+    if args.backend == "llamacpp":
+        if not args.model_path:
+            parser.error("--model-path is required for the llamacpp backend")
+        _run_llamacpp(args)
+    else:
+        _run_ollama(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark peak memory of eager (convert_from_path) versus streaming page rasterization
+
+Each measurement runs in a fresh process so its peak RSS is not polluted by earlier runs.
+
+Usage:
+    python -m benchmarks.bench_rasterizer_memory [--pages 10 50 100]
+"""
+
+import argparse
+import multiprocessing
+import resource
+import sys
+import tempfile
+
+from benchmarks.common import print_table
+from benchmarks.synthetic import generate_corpus
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of the current process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _rasterize(mode: str, pdf_path: str, queue):
+    from medical_analyzer.services import ocr
+    
+    baseline = _peak_rss_mb()
+    pages = 0
+    if mode == "eager":
+        import pdf2image
+        images = pdf2image.convert_from_path(pdf_path)
+        pages = len(images)
+    else:
+        for _, image in ocr.iter_page_images(pdf_path):
+            pages += 1
+    queue.put((pages, _peak_rss_mb() - baseline))
+
+def _measure(mode: str, pdf_path: str):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_rasterize, args=(mode, pdf_path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+def run(page_counts):
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for pdf_path, pages in zip(generate_corpus(tmp_dir, page_counts, scanned=True), page_counts):
+            _, eager_mb = _measure("eager", pdf_path)
+            _, streaming_mb = _measure("streaming", pdf_path)
+            rows.append({
+                "pages": pages,
+                "eager_peak_mb": eager_mb,
+                "streaming_peak_mb": streaming_mb,
+            })
+    print_table("Rasterization peak RSS growth", rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 100], help="Page counts to benchmark")
+    args = parser.parse_args()
+    run(args.pages)
+
+if __name__ == "__main__":
+    main()
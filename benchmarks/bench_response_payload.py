@@ -0,0 +1,84 @@
+"""
+Benchmark AnalysisResponse payload size and serialization time with and without the embedded graph
+
+Usage:
+    python -m benchmarks.bench_response_payload [--iterations 2000]
+"""
+
+import argparse
+import base64
+import json
+import os
+import time
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+
+from medical_analyzer.api.schemas import AnalysisResponse
+from medical_analyzer.core.config import settings
+from benchmarks.common import summarize, print_table
+
+SECTION = """### Key Findings
+- Elevated blood pressure (150/95 mmHg) on admission
+- Intermittent chest pain radiating to the left arm
+
+### Treatment Plan
+- Aspirin 81 mg daily
+- Follow-up with cardiology in two weeks
+"""
+
+def _load_graph_base64() -> str:
+    """Use a rendered workflow graph if one exists, otherwise a same-sized random PNG stand-in"""
+    graphs = sorted(Path(settings.STATIC_DIR).glob("workflow-*.png"))
+    if graphs:
+        return base64.b64encode(graphs[0].read_bytes()).decode("utf-8")
+    # Rendered mermaid diagrams of this pipeline are roughly 30-40 KB
+    return base64.b64encode(os.urandom(36 * 1024)).decode("utf-8")
+
+def _serialize(response: AnalysisResponse) -> bytes:
+    """Serialize the way FastAPI does for a response_model with exclude_none"""
+    content = jsonable_encoder(response, exclude_none=True)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def run(iterations: int):
+    graph_base64 = _load_graph_base64()
+    common = {
+        "analysis": SECTION * 8,
+        "summary": SECTION * 4,
+        "validation": SECTION * 4,
+        "graph_url": "/static/workflow-0123456789abcdef.png",
+        "llm_backend": settings.LLM_BACKEND,
+        "ocr_engine": settings.OCR_ENGINE,
+    }
+    variants = {
+        "with graph (before)": AnalysisResponse(graph=graph_base64, **common),
+        "lean (after)": AnalysisResponse(**common),
+    }
+    
+    rows = []
+    for name, response in variants.items():
+        # Warm up
+        for _ in range(50):
+            _serialize(response)
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            body = _serialize(response)
+            samples.append(time.perf_counter() - start)
+        stats = summarize(samples)
+        rows.append({
+            "variant": name,
+            "payload_bytes": len(body),
+            "p50_ms": stats["p50_ms"],
+            "p99_ms": stats["p99_ms"],
+        })
+    print_table("AnalysisResponse serialization", rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=2000, help="Serializations per variant")
+    args = parser.parse_args()
+    run(args.iterations)
+
+if __name__ == "__main__":
+    main()
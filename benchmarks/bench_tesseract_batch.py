@@ -0,0 +1,66 @@
+"""
+Benchmark Tesseract backends on synthetic scanned PDFs
+
+Compares one tesseract process per page (pytesseract, the previous
+implementation), batched tesseract processes (TESSERACT_BATCH_PAGES pages per
+process) and an in-process tesserocr session, all in a single process so the
+per-page overhead is visible. Pass --preset to compare tuning presets.
+
+Usage:
+    python -m benchmarks.bench_tesseract_batch [--pages 10 50] [--batch-pages 8] [--preset default typed]
+"""
+
+import argparse
+import tempfile
+import time
+
+from benchmarks.common import print_table
+from benchmarks.synthetic import generate_corpus
+from medical_analyzer.core.config import settings
+from medical_analyzer.services import ocr
+from medical_analyzer.services.ocr_engines import OCR_ENGINES, ocr_worker_pool
+
+def _time_ocr(pdf_path: str, engine: str, batch_pages: int) -> float:
+    settings.OCR_ENGINE = engine
+    settings.TESSERACT_BATCH_PAGES = batch_pages
+    start = time.perf_counter()
+    ocr.ocr_pdf_pages(pdf_path)
+    return time.perf_counter() - start
+
+def run(page_counts, batch_pages: int, presets):
+    # Single process, so the comparison is per-page overhead rather than parallelism
+    ocr_worker_pool.workers = 1
+    backends = [("per_page", "tesseract", 1), (f"batch_{batch_pages}", "tesseract", batch_pages)]
+    if OCR_ENGINES["tesserocr"].available():
+        backends.append(("tesserocr", "tesserocr", 1))
+    
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdfs = generate_corpus(tmp_dir, page_counts, scanned=True)
+        for preset in presets:
+            settings.OCR_PRESET = preset
+            for pdf_path, pages in zip(pdfs, page_counts):
+                baseline = None
+                for label, engine, batch in backends:
+                    elapsed = _time_ocr(pdf_path, engine, batch)
+                    baseline = baseline or elapsed
+                    rows.append({
+                        "preset": preset,
+                        "pages": pages,
+                        "backend": label,
+                        "seconds": elapsed,
+                        "ms_per_page": elapsed / pages * 1000,
+                        "speedup": baseline / elapsed if elapsed else 0.0,
+                    })
+    print_table("Tesseract backends (single process)", rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50], help="Page counts to benchmark")
+    parser.add_argument("--batch-pages", type=int, default=8, help="Pages per tesseract process in batch mode")
+    parser.add_argument("--preset", nargs="+", default=["default"], help="OCR presets to compare")
+    args = parser.parse_args()
+    run(args.pages, args.batch_pages, args.preset)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Measure throughput scaling of the server with 1..N pre-forked workers
+
+Each level starts `run.py --workers N` against the stub Ollama server, so the
+LLM is fast and never the bottleneck, and uploads synthetic PDFs from enough
+concurrent clients to keep every worker busy. Status polls land on random
+workers, which exercises the shared job store. Caches are disabled so every
+document is extracted and analyzed.
+
+Usage:
+    python -m benchmarks.bench_workers [--workers 1 2 4] [--docs 32] [--kind text] [--pages 20]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks.common import print_table, summarize, write_results
+from benchmarks.stub_ollama import start_stub_ollama
+from benchmarks.synthetic import generate_documents
+
+RUN_SCRIPT = Path(__file__).resolve().parent.parent / "run.py"
+
+def _start_server(workers: int, port: int, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, str(RUN_SCRIPT), "--workers", str(workers), "--port", str(port), "--host", "127.0.0.1", "--log-level", "WARNING"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+def _free_port() -> int:
+    """A port nothing listens on, so a leftover server cannot answer for the one under test"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 180.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{url}/system-status", timeout=2).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {url} did not become ready in {timeout:.0f}s")
+
+def _stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+async def _drive(url: str, path: str, docs: int, concurrency: int) -> Dict[str, Any]:
+    payload = Path(path).read_bytes()
+    latencies: List[float] = []
+    counts = {"failures": 0, "remaining": docs}
+    
+    async with httpx.AsyncClient(base_url=url, timeout=None) as client:
+        async def analyze():
+            start = time.perf_counter()
+            files = {"file": (Path(path).name, payload, "application/pdf")}
+            response = await client.post("/analyze-medical-document", params={"no_cache": "true"}, files=files)
+            while response.status_code == 503:
+                await asyncio.sleep(0.5)
+                response = await client.post("/analyze-medical-document", params={"no_cache": "true"}, files=files)
+            if response.status_code != 202:
+                counts["failures"] += 1
+                return
+            job = response.json()
+            while job.get("job_status") in ("queued", "running"):
+                await asyncio.sleep(0.1)
+                job = (await client.get(job["status_url"])).json()
+            if job.get("job_status") != "succeeded":
+                counts["failures"] += 1
+                return
+            latencies.append(time.perf_counter() - start)
+        
+        async def client_loop():
+            while counts["remaining"] > 0:
+                counts["remaining"] -= 1
+                await analyze()
+        
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return {"elapsed": elapsed, "latencies": latencies, "failures": counts["failures"]}
+
+def run(worker_counts: List[int], docs: int, kind: str, pages: int, job_workers: int, port: int):
+    stub, stub_url, _ = start_stub_ollama(latency=0.05, tokens_per_second=2000.0, num_parallel=64)
+    levels = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            document = generate_documents(tmp_dir, [kind], [pages])[0]
+            for workers in worker_counts:
+                env = {
+                    **os.environ,
+                    "LLM_BACKEND": "ollama",
+                    "OLLAMA_HOST": stub_url,
+                    "LLM_CACHE_ENABLED": "false",
+                    "EXTRACTION_CACHE_ENABLED": "false",
+                    "OCR_WARMUP": "false",
+                    "JOB_WORKERS": str(job_workers),
+                    "CACHE_DIR": os.path.join(tmp_dir, f"cache-{workers}"),
+                    "DATA_DIR": os.path.join(tmp_dir, f"data-{workers}"),
+                }
+                server_port = port or _free_port()
+                url = f"http://127.0.0.1:{server_port}"
+                print(f"{workers} worker(s): {docs} documents...")
+                process = _start_server(workers, server_port, env)
+                try:
+                    _wait_ready(url, process)
+                    # Two documents per job slot keep every worker's queue non-empty
+                    outcome = asyncio.run(_drive(url, document["path"], docs, workers * job_workers * 2))
+                finally:
+                    _stop_server(process)
+                completed = docs - outcome["failures"]
+                levels.append({
+                    "workers": workers,
+                    "docs": docs,
+                    "failures": outcome["failures"],
+                    "elapsed_s": outcome["elapsed"],
+                    "docs_per_second": completed / outcome["elapsed"] if outcome["elapsed"] else 0.0,
+                    "latency": summarize(outcome["latencies"]),
+                })
+    finally:
+        stub.shutdown()
+    
+    base = levels[0]["docs_per_second"] / levels[0]["workers"] if levels and levels[0]["docs_per_second"] else 0.0
+    rows = []
+    for level in levels:
+        speedup = level["docs_per_second"] / base if base else 0.0
+        level["scaling_efficiency"] = speedup / level["workers"] if level["workers"] else 0.0
+        rows.append({
+            "workers": level["workers"],
+            "docs": level["docs"],
+            "failed": level["failures"],
+            "docs_per_s": level["docs_per_second"],
+            "speedup": speedup,
+            "efficiency": level["scaling_efficiency"],
+            "p95_s": level["latency"]["p95_ms"] / 1000,
+        })
+    print_table(f"Worker scaling ({kind}, {pages} pages, {job_workers} job thread(s) per worker)", rows)
+    path = write_results("workers", {
+        "config": {"workers": worker_counts, "docs": docs, "kind": kind, "pages": pages, "job_workers": job_workers},
+        "levels": levels,
+    })
+    print(f"Results written to {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Server worker counts to compare")
+    parser.add_argument("--docs", type=int, default=32, help="Documents analyzed per level")
+    parser.add_argument("--kind", choices=["text", "scanned", "mixed"], default="text", help="Synthetic document kind")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per document")
+    parser.add_argument("--job-workers", type=int, default=1, help="Analysis threads per server worker (JOB_WORKERS)")
+    parser.add_argument("--port", type=int, default=0, help="Port for the server under test (default: a free port per level)")
+    args = parser.parse_args()
+    run(args.workers, args.docs, args.kind, args.pages, args.job_workers, args.port)
+
+if __name__ == "__main__":
+    main()
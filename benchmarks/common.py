@@ -0,0 +1,162 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Return the pct-th percentile (0-100) of samples using nearest-rank"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Summarize latency samples (seconds) as mean/p50/p95/p99 in milliseconds"""
+    return {
+        "mean_ms": statistics.fmean(samples) * 1000 if samples else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+    }
+
+def print_table(title: str, rows: List[Dict[str, object]]):
+    """Print a list of result rows as an aligned text table"""
+    print("\n" + "=" * 60)
+    print(f" {title} ".center(60, "="))
+    print("=" * 60)
+    if not rows:
+        print("No results")
+        return
+    columns = list(rows[0].keys())
+    widths = {
+        col: max(len(col), *(len(_format_cell(row[col])) for row in rows))
+        for col in columns
+    }
+    print("  ".join(col.ljust(widths[col]) for col in columns))
+    for row in rows:
+        print("  ".join(_format_cell(row[col]).ljust(widths[col]) for col in columns))
+    print()
+
+def _format_cell(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
+
+def _process_rss_bytes(pid: int) -> int:
+    """Resident set size of a process, 0 if it is gone"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def _child_pids(pid: int) -> List[int]:
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+    except (OSError, ValueError):
+        pass
+    return children
+
+def tree_rss_bytes(pid: Optional[int] = None) -> int:
+    """RSS of a process plus all its descendants (e.g. OCR workers), Linux only"""
+    pid = pid or os.getpid()
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        total += _process_rss_bytes(current)
+        pending.extend(_child_pids(current))
+    return total
+
+class PeakRssSampler:
+    """
+    Samples the RSS of this process and its children in a background thread
+    
+    Falls back to the ru_maxrss high-water mark where /proc is not available,
+    which cannot go down between measurements.
+    """
+    
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def _sample(self) -> int:
+        if os.path.exists("/proc/self/statm"):
+            return tree_rss_bytes()
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes on Linux
+        return peak if platform.system() == "Darwin" else peak * 1024
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, self._sample())
+            self._stop.wait(self.interval)
+    
+    def __enter__(self) -> "PeakRssSampler":
+        self.peak_bytes = self._sample()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self._sample())
+    
+    @property
+    def peak_mb(self) -> float:
+        return self.peak_bytes / (1024 * 1024)
+
+def git_revision() -> str:
+    """Short hash of the checked out commit, with '-dirty' for local changes"""
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip()
+        return f"{revision}-dirty" if dirty else revision
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def write_results(name: str, payload: Dict[str, Any], path: Optional[str] = None) -> str:
+    """
+    Store benchmark results as JSON, tagged with the commit and time of the run
+    
+    Args:
+        name: Benchmark name, used in the default file name
+        payload: Results
+        path: Output file (default: benchmarks/results/<name>-<commit>.json)
+        
+    Returns:
+        str: The file written
+    """
+    revision = git_revision()
+    document = {
+        "benchmark": name,
+        "commit": revision,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "host": {"platform": platform.platform(), "cpus": os.cpu_count(), "python": platform.python_version()},
+        **payload,
+    }
+    output = Path(path or Path(__file__).parent / "results" / f"{name}-{revision}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(document, indent=2, sort_keys=True))
+    return str(output)
+
+def load_results(path: str) -> Dict[str, Any]:
+    """Read results written by write_results"""
+    return json.loads(Path(path).read_text())
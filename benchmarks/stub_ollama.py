@@ -0,0 +1,162 @@
+"""
+A local HTTP server mimicking the parts of the Ollama API the analyzer uses
+
+Supports POST /api/chat (streaming NDJSON and non-streaming), GET /api/tags
+and GET /api/version, with configurable latency, token rate, failure rate
+and server-side parallelism. Also used by the test suite.
+
+Usage:
+    python -m benchmarks.stub_ollama [--port 11435] [--latency 0.2] [--tokens-per-second 50]
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+class StubOllamaConfig:
+    """Behaviour of the stub server"""
+    
+    def __init__(self, latency: float = 0.2, tokens_per_second: float = 50.0, response_tokens: int = 120,
+                 failure_rate: float = 0.0, num_parallel: int = 4, failures: int = 0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.failure_rate = failure_rate
+        self.failures_left = failures  # The first N requests are answered with 503
+        self.slots = threading.Semaphore(num_parallel)
+        self.requests = 0
+        self.failures = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+def _make_handler(config: StubOllamaConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like Ollama
+        
+        def log_message(self, format, *args):
+            pass
+        
+        def _send_json(self, status: int, body: dict):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._send_json(200, {"models": [{"name": "phi3:latest"}, {"name": "llama3:latest"}]})
+            elif self.path == "/api/version":
+                self._send_json(200, {"version": "0.0.0-stub"})
+            else:
+                self._send_json(404, {"error": "not found"})
+        
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if self.path != "/api/chat":
+                self._send_json(404, {"error": "not found"})
+                return
+            
+            with config.lock:
+                config.requests += 1
+                fail = config.failures_left > 0 or random.random() < config.failure_rate
+                if fail:
+                    config.failures_left = max(config.failures_left - 1, 0)
+                    config.failures += 1
+            if fail:
+                self._send_json(503, {"error": "server busy"})
+                return
+            
+            # Requests beyond num_parallel queue, as they do in Ollama
+            with config.slots:
+                with config.lock:
+                    config.active += 1
+                    config.max_active = max(config.max_active, config.active)
+                try:
+                    self._respond(request)
+                finally:
+                    with config.lock:
+                        config.active -= 1
+        
+        def _respond(self, request: dict):
+            prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in request.get("messages", []))
+            tokens = [f"token{i} " for i in range(config.response_tokens)]
+            prompt_eval = config.latency
+            time.sleep(prompt_eval)
+            final = {
+                "model": request.get("model", "stub"),
+                "done": True,
+                "done_reason": "stop",
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(prompt_eval * 1e9),
+                "eval_count": len(tokens),
+                "eval_duration": int(len(tokens) / config.tokens_per_second * 1e9),
+            }
+            
+            if request.get("stream", True):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for token in tokens:
+                    time.sleep(1 / config.tokens_per_second)
+                    self._write_chunk({"model": final["model"], "message": {"role": "assistant", "content": token}, "done": False})
+                self._write_chunk({**final, "message": {"role": "assistant", "content": ""}})
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                time.sleep(len(tokens) / config.tokens_per_second)
+                self._send_json(200, {**final, "message": {"role": "assistant", "content": "".join(tokens)}})
+        
+        def _write_chunk(self, body: dict):
+            line = (json.dumps(body) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+            self.wfile.flush()
+    
+    return Handler
+
+def start_stub_ollama(port: int = 0, **kwargs) -> Tuple[ThreadingHTTPServer, str, StubOllamaConfig]:
+    """
+    Start the stub server on a background thread
+    
+    Returns:
+        tuple: (server, base_url, config); call server.shutdown() to stop it
+    """
+    config = StubOllamaConfig(**kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-ollama", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", config
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=11435, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.2, help="Prompt evaluation delay in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Generation rate")
+    parser.add_argument("--response-tokens", type=int, default=120, help="Tokens per response")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--num-parallel", type=int, default=4, help="Requests processed concurrently")
+    args = parser.parse_args()
+    
+    server, url, _ = start_stub_ollama(
+        args.port,
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+        failure_rate=args.failure_rate,
+        num_parallel=args.num_parallel,
+    )
+    print(f"Stub Ollama listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Deterministic stand-ins for the LLM clients, with configurable latency and token rate
+"""
+
+import asyncio
+import re
+import time
+from typing import Any, Iterator, AsyncIterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+_HEADER = re.compile(r"^###\s+(.+)$", re.MULTILINE)
+
+class StubChatModel(BaseChatModel):
+    """
+    A chat model that answers with the section headers requested by the system
+    prompt after a fixed prompt latency plus a per-token generation delay
+    """
+    
+    model: str = "stub"
+    temperature: float = 0.0
+    latency: float = 0.2  # Seconds before the first token (prompt evaluation)
+    tokens_per_second: float = 50.0
+    response_tokens: int = 120
+    
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+    
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        """Deterministic response tokens shaped like the requested markdown sections"""
+        system = next((m.content for m in messages if m.type == "system"), "")
+        headers = _HEADER.findall(system) or ["Response"]
+        words = []
+        per_section = max(1, self.response_tokens // len(headers))
+        for header in headers:
+            words.append(f"### {header}\n")
+            words.extend(f"- finding {i} " for i in range(per_section - 1))
+            words.append("\n\n")
+        return words
+    
+    @staticmethod
+    def _result(messages: List[BaseMessage], tokens: List[str]) -> ChatResult:
+        input_tokens = sum(len(str(m.content).split()) for m in messages)
+        message = AIMessage(content="".join(tokens), usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": len(tokens),
+            "total_tokens": input_tokens + len(tokens),
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+    
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        time.sleep(self.latency + len(tokens) / self.tokens_per_second)
+        return self._result(messages, tokens)
+    
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        await asyncio.sleep(self.latency + len(tokens) / self.tokens_per_second)
+        return self._result(messages, tokens)
+    
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for token in self._tokens(messages):
+            time.sleep(1 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+    
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for token in self._tokens(messages):
+            await asyncio.sleep(1 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+def install_stub_llm(latency: float = 0.2, tokens_per_second: float = 50.0, response_tokens: int = 120):
+    """
+    Replace the LLM clients with StubChatModel instances
+    
+    Must be called before medical_analyzer.core.llm_chain is imported so the
+    module-level clients are built from the stub; if it is already imported the
+    clients are swapped in place. The LLM response cache is disabled so every
+    call pays the configured latency.
+    """
+    from medical_analyzer.core.config import settings
+    from medical_analyzer.services import llm as llm_service
+    from medical_analyzer.services import llm_pool
+    
+    settings.LLM_CACHE_ENABLED = False
+    
+    def get_llm_client(model_type: str = "summary", temperature: float = 0.0, **kwargs):
+        return StubChatModel(
+            model=f"stub-{model_type}",
+            temperature=temperature,
+            latency=latency,
+            tokens_per_second=tokens_per_second,
+            response_tokens=response_tokens,
+        )
+    
+    llm_service.get_llm_client = get_llm_client
+    llm_pool.get_pooled_llm_client = get_llm_client
+    
+    import sys
+    llm_chain = sys.modules.get("medical_analyzer.core.llm_chain")
+    if llm_chain is not None:
+        from medical_analyzer.services.llm_cache import CachedChatModel
+        llm_chain.summary_llm = CachedChatModel(get_llm_client("summary"))
+        llm_chain.analyzer_llm = CachedChatModel(get_llm_client("analyzer", temperature=0.6))
+    return get_llm_client
@@ -0,0 +1,111 @@
+"""
+Synthetic medical PDFs for benchmarks, generated locally with PyMuPDF
+"""
+
+import random
+from pathlib import Path
+from typing import Dict, List
+
+import pymupdf
+
+LINES = [
+    "DISCHARGE SUMMARY",
+    "Patient: John Doe    DOB: 04/12/1961    MRN: 00482913",
+    "Admission Date: 03/02/2024    Discharge Date: 03/06/2024",
+    "Facility: St. Mary's General Hospital, Springfield",
+    "Attending Physician: Dr. Sarah Patel, MD (Cardiology)",
+    "Chief Complaint: Intermittent chest pain radiating to the left arm.",
+    "Vital Signs: BP 150/95 mmHg, HR 92 bpm, RR 18, SpO2 97% on room air.",
+    "History: Hypertension, type 2 diabetes mellitus, hyperlipidemia.",
+    "Troponin I 0.04 ng/mL, repeat 0.03 ng/mL. ECG: normal sinus rhythm.",
+    "Assessment: Unstable angina ruled out, likely stable angina pectoris.",
+    "Medications: Aspirin 81 mg PO daily; Atorvastatin 40 mg PO nightly.",
+    "New: Metoprolol succinate 25 mg PO daily; Nitroglycerin 0.4 mg SL PRN.",
+    "Follow-up: Cardiology clinic in 2 weeks, stress test scheduled.",
+    "Instructions: Low sodium diet, daily walking, monitor blood pressure.",
+]
+
+def _page_text(page_number: int, rng: random.Random) -> str:
+    """Plausible clinical text for one page"""
+    lines = [f"Page {page_number}"] + [rng.choice(LINES) for _ in range(40)]
+    return "\n".join(lines)
+
+def _add_text_page(doc, text: str):
+    """Append a page with an embedded text layer"""
+    page = doc.new_page()
+    page.insert_text((50, 50), text, fontsize=9)
+
+def _add_scanned_page(doc, text: str, dpi: int):
+    """Append an image-only page, like the output of a document scanner"""
+    # Render a text page to a bitmap and embed only the bitmap
+    source = pymupdf.open()
+    source_page = source.new_page()
+    source_page.insert_text((50, 50), text, fontsize=9)
+    pixmap = source_page.get_pixmap(dpi=dpi, colorspace=pymupdf.csGRAY)
+    page = doc.new_page(width=source_page.rect.width, height=source_page.rect.height)
+    page.insert_image(page.rect, pixmap=pixmap)
+    source.close()
+
+def _save(doc, path: str) -> str:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    doc.save(path, deflate=True)
+    doc.close()
+    return path
+
+def generate_text_pdf(path: str, pages: int, seed: int = 0) -> str:
+    """Generate a PDF whose pages have an embedded text layer"""
+    rng = random.Random(seed)
+    doc = pymupdf.open()
+    for page_number in range(1, pages + 1):
+        _add_text_page(doc, _page_text(page_number, rng))
+    return _save(doc, path)
+
+def generate_scanned_pdf(path: str, pages: int, dpi: int = 200, seed: int = 0) -> str:
+    """Generate an image-only PDF"""
+    rng = random.Random(seed)
+    doc = pymupdf.open()
+    for page_number in range(1, pages + 1):
+        _add_scanned_page(doc, _page_text(page_number, rng), dpi)
+    return _save(doc, path)
+
+def generate_mixed_pdf(path: str, pages: int, dpi: int = 200, seed: int = 0) -> str:
+    """Generate a PDF alternating text-layer pages (odd) and scanned pages (even)"""
+    rng = random.Random(seed)
+    doc = pymupdf.open()
+    for page_number in range(1, pages + 1):
+        if page_number % 2:
+            _add_text_page(doc, _page_text(page_number, rng))
+        else:
+            _add_scanned_page(doc, _page_text(page_number, rng), dpi)
+    return _save(doc, path)
+
+def generate_corpus(directory: str, page_counts: List[int], scanned: bool = True) -> List[str]:
+    """Generate one synthetic PDF per page count"""
+    paths = []
+    for pages in page_counts:
+        kind = "scanned" if scanned else "text"
+        path = str(Path(directory) / f"{kind}_{pages}p.pdf")
+        if not Path(path).exists():
+            if scanned:
+                generate_scanned_pdf(path, pages)
+            else:
+                generate_text_pdf(path, pages)
+        paths.append(path)
+    return paths
+
+GENERATORS = {
+    "text": generate_text_pdf,
+    "scanned": generate_scanned_pdf,
+    "mixed": generate_mixed_pdf,
+}
+
+def generate_documents(directory: str, kinds: List[str], page_counts: List[int]) -> List[Dict]:
+    """Generate one synthetic PDF per kind ('text', 'scanned', 'mixed') and page count, reusing existing files"""
+    documents = []
+    for kind in kinds:
+        for pages in page_counts:
+            path = str(Path(directory) / f"{kind}_{pages}p.pdf")
+            if not Path(path).exists():
+                GENERATORS[kind](path, pages)
+            documents.append({"path": path, "kind": kind, "pages": pages})
+    return documents
@@ -2,22 +2,31 @@
 API routes for the Medical Document Analyzer
 """
 
-from fastapi import APIRouter, UploadFile, File, Request, BackgroundTasks, HTTPException
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi import APIRouter, Request, Query
+from fastapi.responses import JSONResponse, HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-import shutil
-from pathlib import Path
-from datetime import datetime
-import os
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import json
 import logging
+import threading
+from typing import Optional
 
 from medical_analyzer.core.config import settings
-from medical_analyzer.core.processor import process_medical_document
-from medical_analyzer.core.llm_chain import create_medical_analysis_chain
-from medical_analyzer.api.schemas import AnalysisResponse, ErrorResponse, SystemStatusResponse
+from medical_analyzer.core.processor import process_medical_document, stream_medical_document
+from medical_analyzer.core.packet import process_medical_packet
+from medical_analyzer.core.llm_chain import get_workflow_graph
+from medical_analyzer.core.metrics import PROMETHEUS_CONTENT_TYPE, REGISTRY, time_to_first_token
+from medical_analyzer.api.schemas import AnalysisResponse, ErrorResponse, FilesListResponse, JobResponse, PacketAnalysisResponse, SystemStatusResponse
 from medical_analyzer.services.document import DocumentService
-from medical_analyzer.services.ocr import check_ocr_dependencies
-from medical_analyzer.services.llm import download_models
+from medical_analyzer.services.ocr import check_ocr_dependencies, extraction_cache
+from medical_analyzer.services.ocr_engines import ocr_worker_pool
+from medical_analyzer.services.jobs import FINISHED_STATUSES, Job, JobStatus, QueueFullError, job_manager
+from medical_analyzer.services.llm_cache import llm_cache_stats
+from medical_analyzer.services.llm_pool import ollama_pool
+from medical_analyzer.services.model_pool import llamacpp_pool
+from medical_analyzer.services.retention import retention_sweeper
+from medical_analyzer.services.upload import UploadTooLargeError, discard_uploads, receive_upload, receive_uploads
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -33,70 +42,152 @@ document_service = DocumentService()
 @router.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Render home page with graph visualization"""
-    # Generate the graph visualization when loading the page
-    _, graph_base64 = create_medical_analysis_chain()
+    # The graph is rendered at startup and served from /static, never rendered here
+    graph = get_workflow_graph()
     return templates.TemplateResponse(
         "index.html", 
         {
             "request": request,
-            "graph_base64": graph_base64,
+            "graph_url": graph["url"] if graph else None,
             "llm_backend": settings.LLM_BACKEND,
             "ocr_engine": settings.OCR_ENGINE
         }
     )
 
+def _build_analysis_response(result: dict, include_graph: bool = False) -> AnalysisResponse:
+    """Build the API response for a processed document"""
+    return AnalysisResponse(
+        status="success",
+        analysis=result["analysis"],
+        summary=result["summary"],
+        validation=result["validation"],
+        graph=result["graph"] if include_graph else None,
+        graph_url=result["graph_url"],
+        pages=result.get("pages") or None,
+        timings=result.get("timings"),
+        llm_backend=settings.LLM_BACKEND,
+        ocr_engine=settings.OCR_ENGINE
+    )
+
+# The upload endpoints read the multipart body themselves, so the file field is declared here for the docs
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+PACKET_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["files"],
+                    "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+                }
+            }
+        },
+    }
+}
+
+def _upload_error_response(error: ValueError) -> JSONResponse:
+    """Map an upload validation error to its HTTP response"""
+    logger.warning(f"Rejected upload: {str(error)}")
+    return JSONResponse(
+        status_code=413 if isinstance(error, UploadTooLargeError) else 400,
+        content={"status": "error", "message": str(error)}
+    )
+
+def _busy_response(reason: str) -> JSONResponse:
+    """503 asking the client to retry an upload the job queue cannot take"""
+    logger.warning(f"Rejected upload: {reason}")
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": "30"},
+        content={"status": "error", "message": "Server is busy, please retry later"}
+    )
+
+def _reject_if_busy() -> Optional[JSONResponse]:
+    """The busy response if the job queue is full, checked before accepting an upload we cannot queue"""
+    if job_manager.queue_depth >= job_manager.max_queue_depth:
+        return _busy_response(f"Job queue is full ({job_manager.queue_depth} jobs waiting)")
+    return None
+
+def _build_packet_response(result: dict) -> PacketAnalysisResponse:
+    """Build the API response for a processed multi-document packet"""
+    return PacketAnalysisResponse(
+        status="success",
+        **result,
+        llm_backend=settings.LLM_BACKEND,
+        ocr_engine=settings.OCR_ENGINE
+    )
+
+def _build_job_response(job: Job, include_graph: bool = False) -> JobResponse:
+    """Build the API response describing a job"""
+    response = JobResponse(status_url=f"/jobs/{job.id}", **job.to_dict())
+    if job.status == JobStatus.SUCCEEDED and job.result is not None:
+        if "documents" in job.result:
+            response.result = _build_packet_response(job.result)
+        else:
+            response.result = _build_analysis_response(job.result, include_graph)
+    return response
+
 @router.post(
     "/analyze-medical-document", 
-    response_model=AnalysisResponse,
+    status_code=202,
+    response_model=JobResponse,
+    response_model_exclude_none=True,
     responses={
         400: {"model": ErrorResponse},
-        500: {"model": ErrorResponse}
-    }
+        413: {"model": ErrorResponse},
+        500: {"model": ErrorResponse},
+        503: {"model": ErrorResponse}
+    },
+    openapi_extra=UPLOAD_REQUEST_BODY
 )
 async def analyze_document(
-    file: UploadFile = File(...),
-    background_tasks: BackgroundTasks = None
+    request: Request,
+    no_cache: bool = Query(False, description="Bypass the LLM response cache for this document")
 ):
-    """Analyze uploaded medical document"""
+    """Queue an uploaded medical document for analysis and return the job id"""
     try:
-        # Validate file extension
-        if not document_service.validate_file_extension(file.filename):
-            return JSONResponse(
-                status_code=400,
-                content={"status": "error", "message": f"Only {', '.join(settings.ALLOWED_EXTENSIONS)} files are supported"}
-            )
+        busy = _reject_if_busy()
+        if busy is not None:
+            return busy
         
-        # Validate file size
-        if file.size > settings.MAX_FILE_SIZE:
-            max_size_mb = settings.MAX_FILE_SIZE / (1024 * 1024)
-            return JSONResponse(
-                status_code=400,
-                content={"status": "error", "message": f"File size exceeds maximum allowed ({max_size_mb:.1f} MB)"}
-            )
-        
-        # Read file content
-        file_content = await file.read()
-        
-        # Save the file
-        file_path = document_service.save_uploaded_file(file_content, file.filename)
+        # Stream the file to disk, validating type and size and hashing it on the way
+        try:
+            upload = await receive_upload(request)
+        except ValueError as e:
+            return _upload_error_response(e)
         
-        # Process the document (this can take time)
-        result = process_medical_document(file_path)
-        
-        # Add cleanup task in the background if requested
-        if background_tasks:
-            # Schedule cleanup for temporary files if needed
-            pass
+        # Process the document on the worker pool (this can take time); with the
+        # shared job store, submit writes to SQLite, so it runs off the event loop
+        try:
+            job = await run_in_threadpool(
+                job_manager.submit,
+                process_medical_document,
+                upload.path,
+                bypass_cache=no_cache,
+                file_hash=upload.sha256,
+                description=upload.filename,
+                document_paths=[upload.path]
+            )
+        except QueueFullError as e:
+            await discard_uploads([upload])
+            return _busy_response(str(e))
         
-        return AnalysisResponse(
-            status="success",
-            analysis=result["analysis"],
-            summary=result["summary"],
-            validation=result["validation"],
-            graph=result["graph"],
-            llm_backend=settings.LLM_BACKEND,
-            ocr_engine=settings.OCR_ENGINE
-        )
+        return _build_job_response(job)
     except ValueError as e:
         logger.error(f"Validation error: {str(e)}")
         return JSONResponse(
@@ -104,34 +195,248 @@ async def analyze_document(
             content={"status": "error", "message": str(e)}
         )
     except Exception as e:
-        logger.error(f"Error processing document: {str(e)}", exc_info=True)
+        logger.error(f"Error queuing document: {str(e)}", exc_info=True)
         return JSONResponse(
             status_code=500,
             content={"status": "error", "message": "An error occurred while processing the document"}
         )
 
+@router.post(
+    "/analyze-medical-documents",
+    status_code=202,
+    response_model=JobResponse,
+    response_model_exclude_none=True,
+    responses={
+        400: {"model": ErrorResponse},
+        413: {"model": ErrorResponse},
+        500: {"model": ErrorResponse},
+        503: {"model": ErrorResponse}
+    },
+    openapi_extra=PACKET_REQUEST_BODY
+)
+async def analyze_documents(
+    request: Request,
+    no_cache: bool = Query(False, description="Bypass the LLM response cache for these documents"),
+    patient_summary: bool = Query(True, description="Combine the document summaries into a patient summary")
+):
+    """
+    Queue a patient packet of medical documents for analysis as one job
+    
+    Documents are extracted in parallel and their LLM calls share the model
+    pool, so the packet takes far less than one request per document. The job
+    result holds per-document results, the patient summary and packet timings.
+    """
+    try:
+        busy = _reject_if_busy()
+        if busy is not None:
+            return busy
+        
+        try:
+            uploads = await receive_uploads(request, field_name="files", max_files=int(settings.PACKET_MAX_FILES))
+        except ValueError as e:
+            return _upload_error_response(e)
+        
+        documents = [
+            {"path": upload.path, "filename": upload.filename, "sha256": upload.sha256}
+            for upload in uploads
+        ]
+        try:
+            job = await run_in_threadpool(
+                job_manager.submit,
+                process_medical_packet,
+                documents,
+                bypass_cache=no_cache,
+                patient_summary=patient_summary,
+                description=f"packet of {len(documents)} documents",
+                document_paths=[upload.path for upload in uploads]
+            )
+        except QueueFullError as e:
+            await discard_uploads(uploads)
+            return _busy_response(str(e))
+        
+        return _build_job_response(job)
+    except Exception as e:
+        logger.error(f"Error queuing document packet: {str(e)}", exc_info=True)
+        return JSONResponse(
+            status_code=500,
+            content={"status": "error", "message": "An error occurred while processing the documents"}
+        )
+
+def _sse(event: str, data: dict) -> str:
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _stream_analysis(job: Job, events: asyncio.Queue, stop: threading.Event):
+    """Relay the events of a streaming analysis job as SSE, then its result"""
+    try:
+        yield _sse("job", job.to_dict())
+        while True:
+            item = await events.get()
+            if item is None:
+                break
+            yield _sse(*item)
+        
+        if job.status == JobStatus.SUCCEEDED:
+            result = job.result
+            yield _sse("result", {
+                **_build_analysis_response({**result, "graph": None}).model_dump(exclude_none=True),
+                "time_to_first_token": result["time_to_first_token"],
+                "duration": result["duration"],
+            })
+        elif job.status == JobStatus.CANCELLED:
+            yield _sse("error", {"status": "error", "message": "The analysis was cancelled"})
+        else:
+            yield _sse("error", {"status": "error", "message": job.error or "An error occurred while processing the document"})
+    finally:
+        # Client went away: stop the analysis instead of running it for nobody.
+        # The request is being cancelled, so the cancel is handed to a thread, not awaited
+        if job.status not in FINISHED_STATUSES:
+            stop.set()
+            asyncio.get_running_loop().run_in_executor(None, job_manager.cancel, job.id)
+
+@router.post(
+    "/analyze-medical-document/stream",
+    responses={
+        200: {"content": {"text/event-stream": {}}},
+        400: {"model": ErrorResponse},
+        413: {"model": ErrorResponse},
+        503: {"model": ErrorResponse}
+    },
+    openapi_extra=UPLOAD_REQUEST_BODY
+)
+async def analyze_document_stream(
+    request: Request,
+    no_cache: bool = Query(False, description="Bypass the LLM response cache for this document")
+):
+    """
+    Analyze an uploaded medical document, streaming progress as Server-Sent Events
+    
+    The analysis runs as a job on the shared worker pool. Events: 'job' (job id
+    and status, usable with DELETE /jobs/{job_id}), 'stage' (node
+    started/completed with its output), 'token' (LLM token of the running
+    stage and the LLM call it belongs to), 'result' (final response) and 'error'.
+    """
+    # Streamed analyses run as jobs, so they share the worker pool and queue limit
+    busy = _reject_if_busy()
+    if busy is not None:
+        return busy
+    
+    try:
+        upload = await receive_upload(request)
+    except ValueError as e:
+        return _upload_error_response(e)
+    
+    # The job worker thread hands events to this request's loop
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    
+    def emit(event: str, data: dict):
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+    
+    try:
+        job = await run_in_threadpool(
+            job_manager.submit,
+            stream_medical_document,
+            upload.path,
+            emit,
+            bypass_cache=no_cache,
+            file_hash=upload.sha256,
+            stop=stop,
+            description=f"streaming {upload.filename}",
+            document_paths=[upload.path]
+        )
+    except QueueFullError as e:
+        await discard_uploads([upload])
+        return _busy_response(str(e))
+    job.future.add_done_callback(lambda _: loop.call_soon_threadsafe(events.put_nowait, None))
+    
+    return StreamingResponse(
+        _stream_analysis(job, events, stop),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=JobResponse,
+    response_model_exclude_none=True,
+    responses={404: {"model": ErrorResponse}}
+)
+async def get_job(
+    job_id: str,
+    include_graph: bool = Query(False, description="Embed the base64 workflow graph in the result")
+):
+    """Get the status of an analysis job, including its result once finished"""
+    # Falls back to the shared job store (SQLite) for jobs of other workers
+    job = await run_in_threadpool(job_manager.get, job_id)
+    if job is None:
+        return JSONResponse(
+            status_code=404,
+            content={"status": "error", "message": f"Job not found: {job_id}"}
+        )
+    return _build_job_response(job, include_graph)
+
+@router.delete(
+    "/jobs/{job_id}",
+    response_model=JobResponse,
+    response_model_exclude_none=True,
+    responses={404: {"model": ErrorResponse}}
+)
+async def cancel_job(job_id: str):
+    """Cancel a queued or running analysis job"""
+    job = await run_in_threadpool(job_manager.cancel, job_id)
+    if job is None:
+        return JSONResponse(
+            status_code=404,
+            content={"status": "error", "message": f"Job not found: {job_id}"}
+        )
+    return _build_job_response(job)
+
+@router.get(
+    "/files",
+    response_model=FilesListResponse,
+    response_model_exclude_none=True,
+    responses={400: {"model": ErrorResponse}}
+)
+async def list_files(
+    limit: int = Query(100, ge=1, le=1000, description="Files per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    status: Optional[str] = Query(None, description="Only files in this status (uploaded, analyzed, failed)")
+):
+    """List uploaded files from the document index, newest first"""
+    try:
+        listing = await run_in_threadpool(document_service.list_saved_files, limit, cursor, status)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"status": "error", "message": str(e)}
+        )
+    return FilesListResponse(**listing)
+
 @router.delete("/cleanup")
 async def cleanup_old_files():
-    """Clean up files older than the retention period"""
+    """Run the retention sweep now (expired uploads and cache entries)"""
     try:
-        current_time = datetime.now()
-        data_dir = Path(settings.DATA_DIR)
-        deleted_count = 0
+        # The background sweeper does the work in rate-limited batches; just wake it up
+        if retention_sweeper.trigger():
+            return JSONResponse(
+                status_code=202,
+                content={
+                    "status": "accepted",
+                    "message": "Retention sweep scheduled.",
+                    "last_sweep": retention_sweeper.last_sweep
+                }
+            )
         
-        for file_path in data_dir.glob("*.*"):
-            if file_path.suffix.lstrip('.').lower() in settings.ALLOWED_EXTENSIONS:
-                file_age = current_time - datetime.fromtimestamp(file_path.stat().st_mtime)
-                if file_age.days >= settings.FILE_RETENTION_DAYS:
-                    try:
-                        file_path.unlink()
-                        deleted_count += 1
-                    except Exception as e:
-                        logger.error(f"Error deleting file {file_path}: {e}")
-                
+        # Sweeper disabled: sweep once, off the event loop
+        result = await run_in_threadpool(retention_sweeper.sweep)
         return JSONResponse(
             content={
                 "status": "success", 
-                "message": f"Cleanup completed. {deleted_count} files removed."
+                "message": f"Cleanup completed. {result.get('deleted', 0)} items removed.",
+                "bytes_reclaimed": result.get("bytes_reclaimed", 0),
+                "last_sweep": result
             }
         )
     except Exception as e:
@@ -141,14 +446,27 @@ async def cleanup_old_files():
             content={"status": "error", "message": f"Cleanup failed: {str(e)}"}
         )
 
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Pipeline metrics (node, OCR page and LLM call latencies, tokens, cache hits, job queue) in Prometheus text format"""
+    return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+def _cache_stats() -> dict:
+    """Stats of the SQLite-backed caches (blocking)"""
+    return {"extraction": extraction_cache.stats(), "llm": llm_cache_stats()}
+
 @router.get("/system-status", response_model=SystemStatusResponse)
 async def system_status():
     """Check the status of all system components"""
+    cache_stats = await run_in_threadpool(_cache_stats)
     status = {
         "status": "ok",
         "components": {
-            "ocr": {"status": "ok", "engine": settings.OCR_ENGINE},
-            "llm": {"status": "ok", "backend": settings.LLM_BACKEND}
+            "ocr": {"status": "ok", "engine": settings.OCR_ENGINE, "details": {"workers": ocr_worker_pool.stats()}},
+            "llm": {"status": "ok", "backend": settings.LLM_BACKEND, "details": {"time_to_first_token": time_to_first_token.to_dict(), "pool": llamacpp_pool.stats() if settings.LLM_BACKEND == "llamacpp" else ollama_pool.stats()}},
+            "jobs": {"status": "ok", "details": job_manager.stats()},
+            "cache": {"status": "ok", "details": cache_stats},
+            "retention": {"status": "ok", "details": retention_sweeper.stats()}
         },
         "warnings": []
     }
@@ -159,6 +477,12 @@ async def system_status():
         status["components"]["ocr"]["status"] = "warning"
         status["warnings"].extend(ocr_issues)
     
+    # Flag a saturated job queue
+    job_stats = status["components"]["jobs"]["details"]
+    if job_stats["queue_depth"] >= job_stats["max_queue_depth"]:
+        status["components"]["jobs"]["status"] = "warning"
+        status["warnings"].append(f"Job queue is full ({job_stats['queue_depth']} jobs waiting)")
+    
     # If we have serious issues, change the overall status
     if status["warnings"]:
         if any("Error" in warning for warning in status["warnings"]):
@@ -10,16 +10,80 @@ class ErrorResponse(BaseModel):
     status: str = "error"
     message: str
 
+class PageProvenance(BaseModel):
+    """How the text of a single page was extracted"""
+    page: int = Field(..., description="1-based page number")
+    source: str = Field(..., description="Extraction source (text_layer, ocr, ocr_unavailable, empty)")
+    chars: int = Field(..., description="Number of characters extracted")
+    image_coverage: Optional[float] = Field(None, description="Fraction of the page covered by images")
+    has_fonts: Optional[bool] = Field(None, description="Whether the page embeds fonts")
+    seconds: Optional[float] = Field(None, description="Time spent extracting the page")
+
+class Timings(BaseModel):
+    """Where the time of one document went"""
+    stages: Dict[str, float] = Field(..., description="Seconds spent in each analysis graph node")
+    ocr_pages: int = Field(..., description="Pages run through OCR")
+    ocr_seconds: float = Field(..., description="OCR time summed over pages (pages run in parallel)")
+    llm_calls: int = Field(..., description="LLM calls, cache hits included")
+    llm_cache_hits: int = Field(..., description="LLM calls answered from the response cache")
+    llm_seconds: float = Field(..., description="LLM time summed over calls (chunks and branches run concurrently)")
+    input_tokens: int = Field(..., description="Prompt tokens evaluated by the LLMs")
+    output_tokens: int = Field(..., description="Tokens generated by the LLMs")
+    total_seconds: float = Field(..., description="Wall-clock time of the analysis")
+
 class AnalysisResponse(BaseModel):
     """Medical document analysis response schema"""
     status: str = "success"
     analysis: str = Field(..., description="Detailed analysis of the medical document")
     summary: str = Field(..., description="Summary of key findings")
     validation: str = Field(..., description="Validation of diagnosis and treatment")
-    graph: str = Field(..., description="Base64 encoded graph visualization")
+    graph: Optional[str] = Field(None, description="Base64 encoded graph visualization (only with include_graph=true)")
+    graph_url: Optional[str] = Field(None, description="URL of the cached workflow graph image")
+    pages: Optional[List[PageProvenance]] = Field(None, description="Per-page extraction provenance")
+    timings: Optional[Timings] = Field(None, description="Per-stage timings, OCR and LLM usage")
     llm_backend: Optional[str] = Field(None, description="LLM backend used for processing")
     ocr_engine: Optional[str] = Field(None, description="OCR engine used for processing")
 
+class PacketDocumentResult(BaseModel):
+    """Result for one document of a multi-document packet"""
+    filename: str = Field(..., description="Original filename of the document")
+    status: str = Field(..., description="success or error")
+    analysis: Optional[str] = Field(None, description="Detailed analysis of the medical document")
+    summary: Optional[str] = Field(None, description="Summary of key findings")
+    validation: Optional[str] = Field(None, description="Validation of diagnosis and treatment")
+    pages: Optional[List[PageProvenance]] = Field(None, description="Per-page extraction provenance")
+    error: Optional[str] = Field(None, description="Error message if the document failed")
+    extraction_seconds: Optional[float] = Field(None, description="Time spent extracting text")
+    analysis_seconds: Optional[float] = Field(None, description="Time spent in the LLM stages")
+    total_seconds: Optional[float] = Field(None, description="Time from start of extraction to result")
+    timings: Optional[Timings] = Field(None, description="Per-stage timings, OCR and LLM usage")
+
+class PacketAnalysisResponse(BaseModel):
+    """Multi-document packet analysis response schema"""
+    status: str = "success"
+    documents: List[PacketDocumentResult] = Field(..., description="Per-document results in upload order")
+    patient_summary: Optional[str] = Field(None, description="Cross-document patient summary (when requested and at least two documents succeeded)")
+    document_count: int = Field(..., description="Number of documents in the packet")
+    failed_count: int = Field(..., description="Number of documents that failed")
+    packet_seconds: float = Field(..., description="Wall-clock time to process the whole packet")
+    patient_summary_seconds: Optional[float] = Field(None, description="Time spent on the patient summary")
+    document_seconds_total: float = Field(..., description="Sum of the per-document times; the documents ran concurrently and slowed each other, so this is not the cost of processing them one by one")
+    graph_url: Optional[str] = Field(None, description="URL of the cached workflow graph image")
+    llm_backend: Optional[str] = Field(None, description="LLM backend used for processing")
+    ocr_engine: Optional[str] = Field(None, description="OCR engine used for processing")
+
+class JobResponse(BaseModel):
+    """Background analysis job response schema"""
+    status: str = "success"
+    job_id: str = Field(..., description="Identifier of the analysis job")
+    job_status: str = Field(..., description="Job state (queued, running, succeeded, failed, cancelled)")
+    status_url: Optional[str] = Field(None, description="URL to poll for the job status")
+    created_at: Optional[str] = Field(None, description="Time the job was queued")
+    started_at: Optional[str] = Field(None, description="Time a worker picked up the job")
+    finished_at: Optional[str] = Field(None, description="Time the job finished")
+    result: Optional[Union[AnalysisResponse, PacketAnalysisResponse]] = Field(None, description="Analysis result once the job has succeeded")
+    error: Optional[str] = Field(None, description="Error message if the job failed")
+
 class ComponentStatus(BaseModel):
     """System component status"""
     status: str = Field(..., description="Status of the component (ok, warning, error)")
@@ -36,13 +100,16 @@ class SystemStatusResponse(BaseModel):
 class FileInfo(BaseModel):
     """Information about a file in the data directory"""
     filename: str = Field(..., description="Name of the file")
-    path: str = Field(..., description="Path to the file")
+    path: str = Field(..., description="Path to the file, relative to the data directory")
     size: int = Field(..., description="Size of the file in bytes")
-    created: str = Field(..., description="Creation timestamp")
-    modified: str = Field(..., description="Last modification timestamp")
+    created: str = Field(..., description="Upload timestamp")
+    modified: str = Field(..., description="Last status change timestamp")
+    sha256: Optional[str] = Field(None, description="SHA-256 of the file content")
+    status: Optional[str] = Field(None, description="Document status (uploaded, analyzed, failed)")
 
 class FilesListResponse(BaseModel):
     """Response for listing files"""
     status: str = "success"
     files: List[FileInfo] = Field(..., description="List of files")
-    count: int = Field(..., description="Total number of files")
\ No newline at end of file
+    count: int = Field(..., description="Total number of files")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, absent on the last page")
\ No newline at end of file
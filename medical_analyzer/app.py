@@ -0,0 +1,151 @@
+"""
+Main application entry point for the Medical Document Analyzer
+"""
+
+import asyncio
+import uvicorn
+import logging
+from fastapi import FastAPI, Request
+from fastapi.staticfiles import StaticFiles
+from fastapi.templating import Jinja2Templates
+from pathlib import Path
+import os
+import re
+import sys
+
+from medical_analyzer.api.routes import router
+from medical_analyzer.core.config import settings
+from medical_analyzer.core.log import configure_logging
+from medical_analyzer.core.llm_chain import warm_chain_registry
+from medical_analyzer.services.ocr import check_ocr_dependencies
+from medical_analyzer.services.ocr_engines import ocr_worker_pool, warm_ocr_engines
+from medical_analyzer.services.document import document_index
+from medical_analyzer.services.llm import download_models
+from medical_analyzer.services.jobs import job_manager
+from medical_analyzer.services.llm_pool import ollama_pool
+from medical_analyzer.services.model_pool import llamacpp_pool
+from medical_analyzer.services.retention import retention_sweeper
+
+# Configure logging (a no-op when run.py has already configured it)
+configure_logging("INFO", settings.LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# Create required directories if they don't exist
+static_dir = Path(settings.STATIC_DIR)
+data_dir = Path(settings.DATA_DIR)
+models_dir = Path(settings.MODELS_DIR)
+for directory in [static_dir, data_dir, models_dir]:
+    directory.mkdir(parents=True, exist_ok=True)
+
+app = FastAPI(
+    title="Medical Document Analyzer",
+    description="API for analyzing medical documents using Open Source LLMs and LangGraph",
+    version="1.0.0"
+)
+
+# Content-hashed assets (e.g. workflow-<hash>.png) never change once written
+HASHED_ASSET_PATTERN = re.compile(r"-[0-9a-f]{16}\.[a-z0-9]+$")
+
+class CachedStaticFiles(StaticFiles):
+    """Static files with long-lived caching headers for content-hashed assets"""
+    
+    def file_response(self, full_path, *args, **kwargs):
+        response = super().file_response(full_path, *args, **kwargs)
+        # Starlette already sets ETag/Last-Modified and answers If-None-Match with 304
+        if HASHED_ASSET_PATTERN.search(str(full_path)):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+# Mount static files
+app.mount("/static", CachedStaticFiles(directory=str(static_dir)), name="static")
+
+# Include API routes
+app.include_router(router)
+
+@app.on_event("startup")
+async def startup_event():
+    """Initialize components on application startup"""
+    logger.info("Starting Medical Document Analyzer")
+    
+    # Check OCR dependencies
+    ocr_issues = check_ocr_dependencies()
+    if ocr_issues:
+        for issue in ocr_issues:
+            logger.warning(f"OCR Issue: {issue}")
+    
+    # Index uploads saved before the document index existed (once)
+    try:
+        document_index.import_existing(settings.ALLOWED_EXTENSIONS)
+    except Exception as e:
+        logger.error(f"Error indexing existing documents: {e}")
+    
+    # Load the OCR engine (in the persistent workers) before the first page arrives
+    if settings.OCR_WARMUP and not ocr_issues:
+        try:
+            warm_ocr_engines()
+        except Exception as e:
+            logger.error(f"Error warming up OCR engine: {e}")
+    
+    # Download/check LLM models
+    try:
+        download_models()
+    except Exception as e:
+        logger.error(f"Error initializing LLM models: {e}")
+    
+    # Load llama.cpp models now so the first request does not pay for it
+    if settings.LLM_BACKEND == "llamacpp" and settings.LLAMACPP_PRELOAD:
+        llamacpp_pool.preload()
+    
+    # Compile the analysis chain and render the workflow graph once per process,
+    # on a thread: rendering calls mermaid.ink
+    try:
+        await asyncio.to_thread(warm_chain_registry)
+    except Exception as e:
+        logger.error(f"Error building analysis chain: {e}")
+    
+    # Apply the retention period in the background instead of on request
+    if settings.RETENTION_SWEEP_ENABLED:
+        retention_sweeper.start()
+        
+    logger.info(f"Initialization complete (worker pid {os.getpid()})")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release resources on application shutdown"""
+    logger.info("Shutting down Medical Document Analyzer")
+    await retention_sweeper.stop()
+    job_manager.shutdown(wait=False)
+    ollama_pool.close()
+    llamacpp_pool.close()
+    ocr_worker_pool.shutdown()
+
+def main():
+    """Entry point for the application when run from command line"""
+    host = "0.0.0.0"
+    port = 8000
+    
+    # Show banner
+    print("\n" + "=" * 60)
+    print(" Medical Document Analyzer ".center(60, "="))
+    print("=" * 60)
+    print(f" OCR Engine: {settings.OCR_ENGINE}".ljust(60))
+    print(f" LLM Backend: {settings.LLM_BACKEND}".ljust(60))
+    print("=" * 60 + "\n")
+    
+    # Check for any critical issues
+    ocr_issues = check_ocr_dependencies()
+    if ocr_issues:
+        print("WARNING: OCR dependency issues detected:")
+        for issue in ocr_issues:
+            print(f" - {issue}")
+        print()
+    
+    try:
+        print(f"Starting server at http://{host}:{port}")
+        uvicorn.run("medical_analyzer.app:app", host=host, port=port, reload=True)
+    except KeyboardInterrupt:
+        print("\nShutting down server...")
+        sys.exit(0)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,286 @@
+"""
+Batch processing of many documents with separate OCR and LLM stage pools
+"""
+
+import asyncio
+import glob
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from medical_analyzer.core.llm_chain import get_medical_analysis_chain
+from medical_analyzer.services.cache import sha256_file
+from medical_analyzer.services.ocr import extract_pages_from_pdf
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def discover_documents(inputs: List[str]) -> List[Path]:
+    """
+    Expand directories and glob patterns into a sorted list of PDF files
+    
+    Args:
+        inputs: Directories (searched recursively), glob patterns or file paths
+        
+    Returns:
+        List[Path]: Unique PDF paths in a stable order
+    """
+    found = set()
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            found.update(p for p in path.rglob("*") if p.is_file() and p.suffix.lower() == ".pdf")
+        elif path.is_file():
+            found.add(path)
+        else:
+            found.update(Path(p) for p in glob.glob(item, recursive=True) if p.lower().endswith(".pdf"))
+    return sorted(p.resolve() for p in found)
+
+class BatchManifest:
+    """
+    Append-only JSONL checkpoint of processed documents
+    
+    Each finished document appends one line, so an interrupted run can be
+    resumed by skipping files that already succeeded and are unchanged
+    (same size and modification time).
+    """
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut short by an interrupted run
+                        continue
+                    self._entries[entry["file"]] = entry
+    
+    @staticmethod
+    def _fingerprint(path: Path) -> Dict[str, Any]:
+        stat = path.stat()
+        return {"size": stat.st_size, "mtime": stat.st_mtime}
+    
+    def is_done(self, path: Path, include_failed: bool = False) -> bool:
+        """Whether the file already succeeded (or failed, if include_failed) and has not changed since"""
+        entry = self._entries.get(str(path))
+        finished = {"succeeded", "failed"} if include_failed else {"succeeded"}
+        if not entry or entry.get("status") not in finished:
+            return False
+        return {"size": entry.get("size"), "mtime": entry.get("mtime")} == self._fingerprint(path)
+    
+    def record(self, path: Path, entry: Dict[str, Any]):
+        """Append an entry for a finished document (caller serializes writes)"""
+        entry = {"file": str(path), **self._fingerprint(path), **entry}
+        self._entries[str(path)] = entry
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+class BatchRunner:
+    """
+    Runs the analysis pipeline over many documents
+    
+    Text extraction and LLM analysis run on separate thread pools, so OCR of
+    upcoming documents overlaps with analysis of earlier ones. At most
+    max_in_flight documents are between the two stages at once, which bounds
+    the extracted text held in memory when OCR outpaces the LLMs.
+    """
+    
+    def __init__(
+        self,
+        output_path,
+        manifest_path=None,
+        ocr_workers: int = 2,
+        llm_workers: int = 2,
+        max_in_flight: Optional[int] = None,
+        bypass_cache: bool = False,
+        retry_failed: bool = True
+    ):
+        self.output_path = Path(output_path)
+        self.manifest = BatchManifest(manifest_path or self.output_path.with_suffix(".manifest.jsonl"))
+        self.ocr_workers = max(1, int(ocr_workers))
+        self.llm_workers = max(1, int(llm_workers))
+        self.max_in_flight = max_in_flight or self.ocr_workers + 2 * self.llm_workers
+        self.bypass_cache = bypass_cache
+        self.retry_failed = retry_failed
+        self._write_lock = threading.Lock()
+        self._in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        self._timings: Dict[str, List[float]] = {"ocr": [], "llm": []}
+        self._failures: List[Dict[str, str]] = []
+        self._succeeded = 0
+    
+    def _extract(self, path: Path) -> Dict[str, Any]:
+        start = time.perf_counter()
+        file_hash = sha256_file(str(path))
+        pages = extract_pages_from_pdf(str(path), file_hash)
+        context = "\n\n".join(page["text"] for page in pages)
+        if not context.strip():
+            raise ValueError("No text could be extracted from the document")
+        return {
+            "sha256": file_hash,
+            "context": context,
+            "pages": [{key: value for key, value in page.items() if key != "text"} for page in pages],
+            "ocr_seconds": time.perf_counter() - start,
+        }
+    
+    def _analyze(self, path: Path, extracted: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        chain = get_medical_analysis_chain()
+        # The context is seeded, so the chain's extractor node is a no-op
+        result = asyncio.run(chain.ainvoke({
+            "file_name": str(path),
+            "bypass_cache": self.bypass_cache,
+            "context": extracted["context"],
+            "pages": extracted["pages"],
+        }))
+        return {
+            "analysis": result.get("analysis_result", ""),
+            "summary": result.get("summary", ""),
+            "validation": result.get("validation_result", ""),
+            "llm_seconds": time.perf_counter() - start,
+        }
+    
+    def _finish(self, path: Path, done: Future, record: Dict[str, Any]):
+        try:
+            with self._write_lock:
+                with open(self.output_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"file": str(path), **record}) + "\n")
+                self.manifest.record(path, {
+                    key: record[key]
+                    for key in ("status", "sha256", "stage", "error", "finished_at")
+                    if key in record
+                })
+                if record["status"] == "succeeded":
+                    self._succeeded += 1
+                    self._timings["ocr"].append(record["timings"]["ocr_seconds"])
+                    self._timings["llm"].append(record["timings"]["llm_seconds"])
+                else:
+                    self._failures.append({"file": str(path), "stage": record["stage"], "error": record["error"]})
+        except Exception as e:
+            logger.error(f"Could not record result for {path}: {e}")
+        finally:
+            self._in_flight.release()
+            done.set_result(record["status"])
+    
+    def _abandon(self, done: Future):
+        """Release the slot of a document whose stage was cancelled by an interrupt"""
+        self._in_flight.release()
+        done.cancel()
+    
+    def _fail(self, path: Path, done: Future, stage: str, error: BaseException, extracted: Optional[Dict[str, Any]] = None):
+        logger.error(f"Batch {stage} stage failed for {path}: {error}")
+        self._finish(path, done, {
+            "status": "failed",
+            "stage": stage,
+            "error": str(error) or type(error).__name__,
+            "sha256": extracted["sha256"] if extracted else None,
+            "finished_at": datetime.now().isoformat(),
+        })
+    
+    def run(self, paths: List[Path]) -> Dict[str, Any]:
+        """
+        Process documents and append results to the output JSONL
+        
+        Args:
+            paths: Documents to process; ones already completed in the manifest are skipped
+            
+        Returns:
+            Dict: Run statistics (counts, throughput, per-stage timings, failures)
+        """
+        pending = [
+            path for path in paths
+            if not self.manifest.is_done(path, include_failed=not self.retry_failed)
+        ]
+        skipped = len(paths) - len(pending)
+        if skipped:
+            logger.info(f"Skipping {skipped} documents already completed in {self.manifest.path}")
+        
+        ocr_pool = ThreadPoolExecutor(max_workers=self.ocr_workers, thread_name_prefix="batch-ocr")
+        llm_pool = ThreadPoolExecutor(max_workers=self.llm_workers, thread_name_prefix="batch-llm")
+        completions: List[Future] = []
+        start = time.perf_counter()
+        
+        def after_analysis(path: Path, done: Future, extracted: Dict[str, Any], future: Future):
+            if future.cancelled():
+                self._abandon(done)
+                return
+            if future.exception() is not None:
+                self._fail(path, done, "llm", future.exception(), extracted)
+                return
+            result = future.result()
+            self._finish(path, done, {
+                "status": "succeeded",
+                "sha256": extracted["sha256"],
+                "analysis": result["analysis"],
+                "summary": result["summary"],
+                "validation": result["validation"],
+                "pages": extracted["pages"],
+                "timings": {"ocr_seconds": extracted["ocr_seconds"], "llm_seconds": result["llm_seconds"]},
+                "finished_at": datetime.now().isoformat(),
+            })
+        
+        def after_extract(path: Path, done: Future, future: Future):
+            if future.cancelled():
+                self._abandon(done)
+                return
+            if future.exception() is not None:
+                self._fail(path, done, "ocr", future.exception())
+                return
+            extracted = future.result()
+            try:
+                analysis = llm_pool.submit(self._analyze, path, extracted)
+            except RuntimeError as e:
+                # Pool shut down by an interrupt
+                self._fail(path, done, "llm", e, extracted)
+                return
+            analysis.add_done_callback(lambda f: after_analysis(path, done, extracted, f))
+        
+        try:
+            for path in pending:
+                # Backpressure: wait for a document to leave the pipeline
+                self._in_flight.acquire()
+                done: Future = Future()
+                completions.append(done)
+                extraction = ocr_pool.submit(self._extract, path)
+                extraction.add_done_callback(lambda f, path=path, done=done: after_extract(path, done, f))
+            wait(completions)
+        finally:
+            ocr_pool.shutdown(wait=True, cancel_futures=True)
+            llm_pool.shutdown(wait=True, cancel_futures=True)
+        
+        elapsed = time.perf_counter() - start
+        return self._report(len(paths), skipped, elapsed)
+    
+    @staticmethod
+    def _stage_stats(samples: List[float]) -> Dict[str, float]:
+        if not samples:
+            return {"total_s": 0.0, "mean_s": 0.0, "max_s": 0.0}
+        return {
+            "total_s": round(sum(samples), 2),
+            "mean_s": round(sum(samples) / len(samples), 2),
+            "max_s": round(max(samples), 2),
+        }
+    
+    def _report(self, total: int, skipped: int, elapsed: float) -> Dict[str, Any]:
+        errors = Counter(f"[{failure['stage']}] {failure['error']}" for failure in self._failures)
+        return {
+            "documents": total,
+            "skipped": skipped,
+            "succeeded": self._succeeded,
+            "failed": len(self._failures),
+            "elapsed_seconds": round(elapsed, 2),
+            "docs_per_minute": round(self._succeeded / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            "stages": {stage: self._stage_stats(samples) for stage, samples in self._timings.items()},
+            "failures": self._failures,
+            "top_errors": errors.most_common(10),
+            "output": str(self.output_path),
+            "manifest": str(self.manifest.path),
+        }
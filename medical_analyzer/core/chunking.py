@@ -0,0 +1,127 @@
+"""
+Splitting long documents to a token budget and merging per-chunk analyses
+"""
+
+import math
+import re
+from typing import Dict, List
+
+# Rough characters-per-token ratio for English clinical text with Llama/Phi tokenizers
+CHARS_PER_TOKEN = 4
+
+# Lines that open a new section: markdown headers or short upper-case labels ("HISTORY:", "MEDICATIONS")
+_SECTION_HEADING = re.compile(r"^\s*(#{1,6}\s+\S.*|[A-Z][A-Z0-9 /&()-]{2,60}:?)\s*$")
+_MARKDOWN_HEADER = re.compile(r"^(#{1,6})\s+(.+?)\s*$")
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in text without loading a tokenizer"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def split_into_chunks(text: str, token_budget: int) -> List[str]:
+    """
+    Split text into chunks of at most token_budget (estimated) tokens
+    
+    Blocks separated by blank lines (pages and paragraphs) are packed greedily,
+    starting a new chunk at a section heading once the current chunk is half
+    full. Blocks larger than the budget are split on lines, and lines larger
+    than the budget are split hard.
+    
+    Args:
+        text: Document text
+        token_budget: Maximum estimated tokens per chunk
+        
+    Returns:
+        List[str]: Chunks in document order
+    """
+    if estimate_tokens(text) <= token_budget:
+        return [text]
+    
+    max_chars = max(1, token_budget * CHARS_PER_TOKEN)
+    chunks = []
+    current: List[str] = []
+    current_chars = 0
+    
+    def flush():
+        nonlocal current, current_chars
+        if current:
+            chunks.append("\n\n".join(current))
+        current, current_chars = [], 0
+    
+    for block in _split_blocks(text, max_chars):
+        block_chars = len(block) + 2
+        starts_section = bool(_SECTION_HEADING.match(block.split("\n", 1)[0]))
+        if current and (
+            current_chars + block_chars > max_chars
+            or (starts_section and current_chars > max_chars // 2)
+        ):
+            flush()
+        current.append(block)
+        current_chars += block_chars
+    flush()
+    return chunks
+
+def _split_blocks(text: str, max_chars: int) -> List[str]:
+    """Break text into blank-line separated blocks no longer than max_chars"""
+    blocks = []
+    for block in re.split(r"\n\s*\n|\f", text):
+        block = block.strip()
+        if not block:
+            continue
+        if len(block) <= max_chars:
+            blocks.append(block)
+            continue
+        # Oversized block: pack its lines, hard-splitting oversized lines
+        current = ""
+        for line in block.split("\n"):
+            while len(line) > max_chars:
+                if current:
+                    blocks.append(current)
+                    current = ""
+                blocks.append(line[:max_chars])
+                line = line[max_chars:]
+            if current and len(current) + len(line) + 1 > max_chars:
+                blocks.append(current)
+                current = ""
+            current = f"{current}\n{line}" if current else line
+        if current:
+            blocks.append(current)
+    return blocks
+
+def merge_markdown_sections(documents: List[str]) -> str:
+    """
+    Merge markdown documents that use the same section headers
+    
+    Sections are emitted in order of first appearance; the content of each
+    section is concatenated across documents with duplicate lines dropped.
+    
+    Args:
+        documents: Markdown documents (e.g. per-chunk analyses)
+        
+    Returns:
+        str: A single markdown document
+    """
+    preamble: List[str] = []
+    sections: Dict[str, List[str]] = {}
+    header_lines: Dict[str, str] = {}
+    
+    for document in documents:
+        key = None
+        for line in document.strip().splitlines():
+            match = _MARKDOWN_HEADER.match(line.strip())
+            if match:
+                key = match.group(2).strip().lower()
+                header_lines.setdefault(key, line.strip())
+                sections.setdefault(key, [])
+                continue
+            target = sections[key] if key is not None else preamble
+            if line.strip() and line.strip() in (existing.strip() for existing in target):
+                continue
+            target.append(line)
+    
+    parts = []
+    if any(line.strip() for line in preamble):
+        parts.append("\n".join(preamble).strip())
+    for key, lines in sections.items():
+        body = "\n".join(line for line in lines if line.strip())
+        parts.append(f"{header_lines[key]}\n{body}".strip())
+    return "\n\n".join(parts)
@@ -17,6 +17,7 @@ class Settings(BaseSettings):
     DATA_DIR: str = os.path.join(BASE_DIR, "medical_analyzer/data")
     TEMPLATES_DIR: str = os.path.join(BASE_DIR, "medical_analyzer/templates")
     MODELS_DIR: str = os.path.join(BASE_DIR, "medical_analyzer/models")
+    CACHE_DIR: str = os.path.join(BASE_DIR, "medical_analyzer/cache")
     
     # Model settings - open source SLMs
     LLM_BACKEND: str = os.getenv("LLM_BACKEND", "ollama")  # 'ollama' or 'llamacpp'
@@ -25,6 +26,16 @@ class Settings(BaseSettings):
     OLLAMA_SUMMARY_MODEL: str = "phi3"  # Phi-3 Mini
     OLLAMA_ANALYZER_MODEL: str = "llama3"  # Llama 3 8B
     
+    # Ollama connection pool
+    OLLAMA_HOST: str = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+    OLLAMA_NUM_PARALLEL: int = os.getenv("OLLAMA_NUM_PARALLEL", 4)  # Concurrent requests per model, match the Ollama server
+    OLLAMA_MAX_CONNECTIONS: int = os.getenv("OLLAMA_MAX_CONNECTIONS", 16)  # Keep-alive connections shared by all models
+    LLM_REQUEST_TIMEOUT: float = os.getenv("LLM_REQUEST_TIMEOUT", 300)  # Seconds per LLM request
+    LLM_MAX_RETRIES: int = os.getenv("LLM_MAX_RETRIES", 3)
+    LLM_RETRY_BACKOFF: float = os.getenv("LLM_RETRY_BACKOFF", 0.5)  # Initial retry delay in seconds, doubled per attempt
+    OLLAMA_KEEP_ALIVE: str = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # Keep models and their prompt cache loaded between requests
+    OLLAMA_CONTEXT_SIZE: int = os.getenv("OLLAMA_CONTEXT_SIZE", 2048)  # Context window requested per request (num_ctx), Ollama's default
+    
     # LlamaCpp model paths (relative to MODELS_DIR)
     LLAMACPP_SUMMARY_MODEL: str = "phi-3-mini-4k-instruct.Q4_K_M.gguf"
     LLAMACPP_ANALYZER_MODEL: str = "llama-3-8b-instruct.Q4_K_M.gguf"
@@ -33,17 +44,62 @@ class Settings(BaseSettings):
     LLAMACPP_THREADS: int = os.getenv("LLAMACPP_THREADS", 4)
     LLAMACPP_CONTEXT_SIZE: int = os.getenv("LLAMACPP_CONTEXT_SIZE", 4096)
     
+    # LlamaCpp model pool
+    LLAMACPP_PRELOAD: bool = os.getenv("LLAMACPP_PRELOAD", True)  # Load models at startup instead of on first request
+    LLAMACPP_MEMORY_BUDGET_MB: int = os.getenv("LLAMACPP_MEMORY_BUDGET_MB", 0)  # Loaded model size before LRU eviction, 0 = unlimited
+    LLAMACPP_PINNED_MODELS: str = os.getenv("LLAMACPP_PINNED_MODELS", "")  # Comma-separated model types never evicted ('summary', 'analyzer')
+    LLAMACPP_USE_MLOCK: bool = os.getenv("LLAMACPP_USE_MLOCK", False)  # Lock model pages in RAM so they cannot be swapped out
+    LLAMACPP_PROMPT_CACHE: bool = os.getenv("LLAMACPP_PROMPT_CACHE", True)  # Reuse the evaluated state of the fixed system prompts
+    
     # OCR settings
-    OCR_ENGINE: str = os.getenv("OCR_ENGINE", "tesseract")  # 'tesseract' or 'paddle'
+    OCR_ENGINE: str = os.getenv("OCR_ENGINE", "tesseract")  # 'tesseract', 'tesserocr' or 'paddle'
     TESSERACT_CMD: str = os.getenv("TESSERACT_CMD", "tesseract")
+    OCR_WORKERS: int = os.getenv("OCR_WORKERS", 0)  # OCR worker processes, 0 = CPU cores / SERVER_WORKERS
+    OCR_DPI: int = os.getenv("OCR_DPI", 200)  # Rasterization resolution for OCR (presets may raise it)
+    OCR_PRESET: str = os.getenv("OCR_PRESET", "default")  # 'default', 'typed' (printed forms) or 'handwriting'
+    TESSERACT_PSM: int = os.getenv("TESSERACT_PSM", 0)  # Page segmentation mode, 0 = from the preset
+    TESSERACT_OEM: int = os.getenv("TESSERACT_OEM", -1)  # OCR engine mode, -1 = from the preset
+    TESSERACT_BATCH_PAGES: int = os.getenv("TESSERACT_BATCH_PAGES", 4)  # Pages per tesseract process, 1 = one process per page
+    OCR_PERSISTENT_WORKERS: bool = os.getenv("OCR_PERSISTENT_WORKERS", True)  # Keep the shared OCR processes alive between documents
+    OCR_WARMUP: bool = os.getenv("OCR_WARMUP", True)  # Load the OCR engine at startup instead of on the first page
+    OCR_PAGE_MIN_CHARS: int = os.getenv("OCR_PAGE_MIN_CHARS", 50)  # Pages with less embedded text are OCR'd
+    OCR_PAGE_IMAGE_COVERAGE: float = os.getenv("OCR_PAGE_IMAGE_COVERAGE", 0.5)  # Image-dominated pages with sparse text are OCR'd
+    
+    # Extraction cache settings (keyed by PDF hash and OCR settings)
+    EXTRACTION_CACHE_ENABLED: bool = os.getenv("EXTRACTION_CACHE_ENABLED", True)
+    EXTRACTION_CACHE_MAX_MB: int = os.getenv("EXTRACTION_CACHE_MAX_MB", 512)
+    
+    # LLM response cache settings (keyed by messages, model and temperature)
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", True)
+    LLM_CACHE_TTL_SECONDS: int = os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600)
+    LLM_CACHE_MAX_MB: int = os.getenv("LLM_CACHE_MAX_MB", 256)
     
     # File settings
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_EXTENSIONS: list = ["pdf"]
     FILE_RETENTION_DAYS: int = 1
+    CACHE_RETENTION_DAYS: float = os.getenv("CACHE_RETENTION_DAYS", 0)  # Maximum age of cached extractions/LLM responses, 0 = FILE_RETENTION_DAYS
+    RETENTION_SWEEP_ENABLED: bool = os.getenv("RETENTION_SWEEP_ENABLED", True)  # Apply FILE_RETENTION_DAYS on a background task
+    RETENTION_SWEEP_INTERVAL_SECONDS: int = os.getenv("RETENTION_SWEEP_INTERVAL_SECONDS", 3600)
+    RETENTION_SWEEP_BATCH_SIZE: int = os.getenv("RETENTION_SWEEP_BATCH_SIZE", 200)  # Items removed per batch
+    RETENTION_SWEEP_PAUSE_SECONDS: float = os.getenv("RETENTION_SWEEP_PAUSE_SECONDS", 0.2)  # Pause between batches
     
     # Performance settings
     BATCH_SIZE: int = 4  # For processing large documents in chunks
+    ANALYZER_RESPONSE_TOKENS: int = os.getenv("ANALYZER_RESPONSE_TOKENS", 1024)  # Context reserved for each analyzer response
+    PIPELINE_MODE: str = os.getenv("PIPELINE_MODE", "linear")  # 'linear' or 'parallel' (summary and validation side by side)
+    PACKET_MAX_FILES: int = os.getenv("PACKET_MAX_FILES", 20)  # Documents accepted per multi-document upload
+    PACKET_EXTRACTION_WORKERS: int = os.getenv("PACKET_EXTRACTION_WORKERS", 4)  # Packet documents extracted concurrently
+    
+    # Job queue settings
+    JOB_WORKERS: int = os.getenv("JOB_WORKERS", 2)  # Concurrent analysis jobs
+    JOB_QUEUE_LIMIT: int = os.getenv("JOB_QUEUE_LIMIT", 16)  # Queued jobs per server worker before new uploads are rejected
+    JOB_HISTORY_LIMIT: int = os.getenv("JOB_HISTORY_LIMIT", 1000)  # Finished jobs kept for status lookups
+    JOB_SHARED_STORE: bool = os.getenv("JOB_SHARED_STORE", False)  # Keep job state in SQLite so any server worker can answer status polls
+    SERVER_WORKERS: int = os.getenv("SERVER_WORKERS", 1)  # Server worker processes sharing the CPU cores (set by run.py --workers)
+    
+    # Logging
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text")  # 'text' or 'json' (one object per line, for log shippers)
     
     class Config:
         env_file = ".env"
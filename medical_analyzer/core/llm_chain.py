@@ -3,60 +3,45 @@ LangGraph chain implementation for medical document analysis
 """
 
 from typing_extensions import TypedDict
+from typing import Any, Dict, List, Optional, Tuple
+from pathlib import Path
 from langchain_core.messages import HumanMessage, SystemMessage
 from langgraph.graph import StateGraph, START, END
+import asyncio
 import base64
+import hashlib
 import logging
+import os
+import threading
 
 from medical_analyzer.core.config import settings
-from medical_analyzer.services.ocr import extract_text_from_pdf
-from medical_analyzer.services.llm import get_llm_client
+from medical_analyzer.core.chunking import estimate_tokens, merge_markdown_sections, split_into_chunks
+from medical_analyzer.core.metrics import instrument_node
+from medical_analyzer.services.ocr import extract_pages_from_pdf
+from medical_analyzer.services.llm import context_size
+from medical_analyzer.services.llm_cache import CachedChatModel
+from medical_analyzer.services.llm_pool import get_pooled_llm_client
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Initialize LLM clients
-summary_llm = get_llm_client(model_type="summary")
-analyzer_llm = get_llm_client(model_type="analyzer", temperature=0.6)
+# Initialize LLM clients behind the response cache
+summary_llm = CachedChatModel(get_pooled_llm_client(model_type="summary"))
+analyzer_llm = CachedChatModel(get_pooled_llm_client(model_type="analyzer", temperature=0.6))
 
 # Define the state for our graph
 class MedicalAnalysisState(TypedDict):
     file_name: str
+    file_hash: Optional[str]
+    bypass_cache: bool
     context: str
+    pages: List[Dict[str, Any]]
     analysis_result: str
     summary: str
     validation_result: str
 
-def create_medical_analysis_chain():
-    """
-    Create a LangGraph chain for medical document analysis
-    
-    Returns:
-        tuple: (compiled_chain, graph_base64)
-    """
-    # Define the nodes (agents) in our graph
-    def extract_context(state: MedicalAnalysisState):
-        """Extract text from PDF document"""
-        print("----------------------------------------------------")
-        print("-----------Extracting context from PDF--------------")
-        print("----------------------------------------------------")
-        
-        pdf_name = state['file_name']
-        text = extract_text_from_pdf(pdf_name)
-        state["context"] = text
-        return state
-    
-    def analyze_document(state: MedicalAnalysisState):
-        """Analyze the extracted text"""
-        print("----------------------------------------------------")
-        print("------------Analyzing context from PDF--------------")
-        print("----------------------------------------------------")
-        
-        document_content = state["context"]
-        
-        # Use Langchain with open-source LLM for medical analysis
-        messages = [
-            SystemMessage(content="""You are a medical document analyzer. Extract key information and format it in markdown with the following sections:
+# System prompts are constant across requests; only the user content changes
+ANALYZER_SYSTEM_PROMPT = """You are a medical document analyzer. Extract key information and format it in markdown with the following sections:
 
 ### Date of Incident
 - Specify the date when the medical incident occurred
@@ -79,29 +64,9 @@ def create_medical_analysis_chain():
 - New prescriptions
 - Dosage information
 
-Please ensure the response is well-formatted in markdown with appropriate headers and bullet points."""),
-            HumanMessage(content=document_content)
-        ]
-        response = analyzer_llm.invoke(messages)
-        
-        # Clean up response if it contains thinking process markers
-        analysis = response.content
-        if "</think>" in analysis:
-            analysis = analysis.split("</think>")[-1]
-            
-        state["analysis_result"] = analysis
-        return state
-
-    def generate_summary(state: MedicalAnalysisState):
-        """Generate a summary of the analysis"""
-        print("----------------------------------------------------")
-        print("------------Generating summary from PDF-------------")
-        print("----------------------------------------------------")
-        
-        analysis_result = state["analysis_result"]
-        
-        messages = [
-            SystemMessage(content="""You are a medical report summarizer. Create a detailed summary in markdown format with the following sections:
+Please ensure the response is well-formatted in markdown with appropriate headers and bullet points."""
+
+SUMMARY_SYSTEM_PROMPT = """You are a medical report summarizer. Create a detailed summary in markdown format with the following sections:
 
 ### Key Findings
 - Main medical issues identified
@@ -120,25 +85,9 @@ Please ensure the response is well-formatted in markdown with appropriate header
 - Important considerations
 - Special instructions
 
-Please ensure proper markdown formatting with headers, bullet points, and emphasis where appropriate."""),
-            HumanMessage(content=f"Generate a detailed medical summary report based on this analysis: {analysis_result}")
-        ]
-        response = summary_llm.invoke(messages)
-        
-        state["summary"] = response.content
-        return state
-
-    def validate_diagnosis(state: MedicalAnalysisState):
-        """Validate the diagnosis and treatment plan"""
-        print("----------------------------------------------------")
-        print("------------Validating diagnosis from PDF-----------")
-        print("----------------------------------------------------")
-        
-        analysis_result = state["analysis_result"]
-        summary = state["summary"]
-        
-        messages = [
-            SystemMessage(content="""You are a medical diagnosis validator. Provide your assessment in markdown format with these sections:
+Please ensure proper markdown formatting with headers, bullet points, and emphasis where appropriate."""
+
+VALIDATOR_SYSTEM_PROMPT = """You are a medical diagnosis validator. Provide your assessment in markdown format with these sections:
 
 ### Alignment Analysis
 - Evaluate if diagnosis matches symptoms
@@ -155,43 +104,320 @@ Please ensure proper markdown formatting with headers, bullet points, and emphas
 - Drug interaction concerns
 - Follow-up recommendations
 
-Please format your response in clear markdown with appropriate headers and bullet points."""),
-            HumanMessage(content=f"""Analysis: {analysis_result}\nSummary: {summary}
-                         Based on the Analysis and Summary provided please provide whether diagnosis, treatment and medication provided is in alignment with medical complaint.
-                         If not in alignment then specify what best treatment and medication could have been provided.
-                         """)
-        ]
-        response = analyzer_llm.invoke(messages)
+Please format your response in clear markdown with appropriate headers and bullet points."""
+
+PATIENT_SUMMARY_SYSTEM_PROMPT = """You are a clinical summarizer combining several medical documents from the same patient. Create a patient-level summary in markdown format with the following sections:
+
+### Patient Overview
+- Demographics and relevant history
+- Documents reviewed and their dates
+
+### Consolidated Findings
+- Diagnoses across documents
+- Significant results and how they changed over time
+
+### Current Treatment
+- Active medications and dosages
+- Ongoing treatment plans
+
+### Discrepancies and Gaps
+- Conflicting information between documents
+- Missing follow-ups or tests
+
+Please ensure proper markdown formatting with headers, bullet points, and emphasis where appropriate."""
+
+PIPELINE_MODES = ("linear", "parallel")
+
+# Process-wide registry of compiled chains and the rendered workflow diagram.
+# Compiling the graph and rendering the mermaid PNG are slow, so both happen
+# once per process (at startup) and are reused by every request.
+_chain_registry: Dict[str, Any] = {}
+_workflow_graph: Optional[Dict[str, str]] = None
+_graph_rendered = False
+_registry_lock = threading.Lock()
+_graph_lock = threading.Lock()
+
+def _strip_thinking(text: str) -> str:
+    """Clean up response if it contains thinking process markers"""
+    if "</think>" in text:
+        text = text.split("</think>")[-1]
+    return text
+
+# Define the nodes (agents) in our graph. Each node returns only the keys it
+# updates, so branches running in parallel never write the same channel.
+# LLM nodes are async and the chain must be run with ainvoke/astream; the
+# extractor stays synchronous and runs on LangGraph's thread pool. Nodes are
+# wrapped with instrument_node when the graph is built, which logs and times them.
+def extract_context(state: MedicalAnalysisState):
+    """Extract text from PDF document"""
+    # Text already extracted upstream (e.g. seeded by a caller), nothing to do
+    if state.get("context"):
+        return {}
+    
+    pdf_name = state['file_name']
+    # Uploads are hashed while streamed to disk, so the cache lookup skips re-reading the file
+    pages = extract_pages_from_pdf(pdf_name, state.get("file_hash"))
+    return {
+        "context": "\n\n".join(page["text"] for page in pages),
+        # Keep per-page provenance (text layer vs OCR) without duplicating the text
+        "pages": [{key: value for key, value in page.items() if key != "text"} for page in pages],
+    }
+
+def input_token_budget(system_prompt: str) -> int:
+    """Tokens of input that fit in one call of the active backend next to the system prompt and the response"""
+    reserved = estimate_tokens(system_prompt) + int(settings.ANALYZER_RESPONSE_TOKENS)
+    return max(256, context_size() - reserved)
+
+def analysis_token_budget() -> int:
+    """Tokens of document text that fit in one analyzer call next to the prompt and the response"""
+    return input_token_budget(ANALYZER_SYSTEM_PROMPT)
+
+async def _analyze_chunk(content: str, bypass_cache: bool) -> str:
+    """Run the analyzer prompt over one piece of the document"""
+    # Use Langchain with open-source LLM for medical analysis
+    messages = [
+        SystemMessage(content=ANALYZER_SYSTEM_PROMPT),
+        HumanMessage(content=content)
+    ]
+    response = await analyzer_llm.ainvoke(messages, bypass_cache=bypass_cache)
+    return _strip_thinking(response.content)
+
+async def analyze_document(state: MedicalAnalysisState):
+    """Analyze the extracted text"""
+    document_content = state["context"]
+    bypass_cache = state.get("bypass_cache", False)
+    
+    chunks = split_into_chunks(document_content, analysis_token_budget())
+    if len(chunks) == 1:
+        return {"analysis_result": await _analyze_chunk(document_content, bypass_cache)}
+    
+    # Map: analyze the chunks concurrently, at most BATCH_SIZE at a time
+    logger.info(f"Document exceeds the analyzer context, analyzing {len(chunks)} chunks")
+    contents = [
+        f"Part {index} of {len(chunks)} of the medical document:\n\n{chunk}"
+        for index, chunk in enumerate(chunks, start=1)
+    ]
+    batch_limit = asyncio.Semaphore(max(1, int(settings.BATCH_SIZE)))
+    
+    async def analyze_in_batch(content: str) -> str:
+        async with batch_limit:
+            return await _analyze_chunk(content, bypass_cache)
+    
+    analyses = await asyncio.gather(*(analyze_in_batch(content) for content in contents))
+    
+    # Reduce: merge the per-chunk markdown sections into one analysis
+    return {"analysis_result": merge_markdown_sections(analyses)}
+
+async def generate_summary(state: MedicalAnalysisState):
+    """Generate a summary of the analysis"""
+    analysis_result = state["analysis_result"]
+    
+    messages = [
+        SystemMessage(content=SUMMARY_SYSTEM_PROMPT),
+        HumanMessage(content=f"Generate a detailed medical summary report based on this analysis: {analysis_result}")
+    ]
+    response = await summary_llm.ainvoke(messages, bypass_cache=state.get("bypass_cache", False))
+    
+    return {"summary": response.content}
+
+async def validate_diagnosis(state: MedicalAnalysisState):
+    """Validate the diagnosis and treatment plan"""
+    analysis_result = state["analysis_result"]
+    summary = state["summary"]
+    
+    messages = [
+        SystemMessage(content=VALIDATOR_SYSTEM_PROMPT),
+        HumanMessage(content=f"""Analysis: {analysis_result}\nSummary: {summary}
+                     Based on the Analysis and Summary provided please provide whether diagnosis, treatment and medication provided is in alignment with medical complaint.
+                     If not in alignment then specify what best treatment and medication could have been provided.
+                     """)
+    ]
+    response = await analyzer_llm.ainvoke(messages, bypass_cache=state.get("bypass_cache", False))
+    
+    return {"validation_result": _strip_thinking(response.content)}
+
+async def validate_analysis(state: MedicalAnalysisState):
+    """Validate the diagnosis and treatment plan from the analysis alone (runs alongside the summarizer)"""
+    analysis_result = state["analysis_result"]
+    
+    messages = [
+        SystemMessage(content=VALIDATOR_SYSTEM_PROMPT),
+        HumanMessage(content=f"""Analysis: {analysis_result}
+                     Based on the Analysis provided please provide whether diagnosis, treatment and medication provided is in alignment with medical complaint.
+                     If not in alignment then specify what best treatment and medication could have been provided.
+                     """)
+    ]
+    response = await analyzer_llm.ainvoke(messages, bypass_cache=state.get("bypass_cache", False))
+    
+    return {"validation_result": _strip_thinking(response.content)}
+
+async def summarize_patient(documents: List[Tuple[str, str]], bypass_cache: bool = False) -> str:
+    """
+    Combine the summaries of several documents from one patient into a patient-level summary
+    
+    Args:
+        documents: (document name, summary) pairs
+        bypass_cache: Call the LLM even if a cached response exists
         
-        # Clean up response if it contains thinking process markers
-        validation = response.content
-        if "</think>" in validation:
-            validation = validation.split("</think>")[-1]
-            
-        state["validation_result"] = validation
-        return state
+    Returns:
+        str: Markdown patient summary
+    """
+    combined = "\n\n".join(f"## Document: {name}\n\n{summary}" for name, summary in documents)
+    budget = input_token_budget(PATIENT_SUMMARY_SYSTEM_PROMPT)
+    
+    async def summarize(content: str) -> str:
+        messages = [
+            SystemMessage(content=PATIENT_SUMMARY_SYSTEM_PROMPT),
+            HumanMessage(content=f"Generate a patient summary from these document summaries:\n\n{content}")
+        ]
+        response = await summary_llm.ainvoke(messages, bypass_cache=bypass_cache)
+        return _strip_thinking(response.content)
+    
+    # Large packets: summarize groups of documents and merge the sections
+    chunks = split_into_chunks(combined, budget)
+    if len(chunks) == 1:
+        return await summarize(combined)
+    return merge_markdown_sections(await asyncio.gather(*(summarize(chunk) for chunk in chunks)))
+
+async def join_results(state: MedicalAnalysisState):
+    """Wait for the parallel branches; their results are already merged into the state"""
+    return {}
 
+def build_medical_analysis_chain(mode: Optional[str] = None):
+    """
+    Build and compile a LangGraph chain for medical document analysis
+    
+    Args:
+        mode: 'linear' runs extractor -> analyzer -> summarizer -> validator;
+            'parallel' runs the summarizer and an analysis-only validator
+            side by side after the analyzer and joins them
+            (defaults to settings.PIPELINE_MODE)
+    
+    Returns:
+        CompiledStateGraph: The compiled chain
+    """
+    mode = mode or settings.PIPELINE_MODE
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unsupported pipeline mode: {mode}")
+    
     # Create the graph
     workflow = StateGraph(MedicalAnalysisState)
 
     # Add nodes
-    workflow.add_node("extractor", extract_context)
-    workflow.add_node("analyzer", analyze_document)
-    workflow.add_node("summarizer", generate_summary)
-    workflow.add_node("validator", validate_diagnosis)
+    workflow.add_node("extractor", instrument_node("extractor", extract_context))
+    workflow.add_node("analyzer", instrument_node("analyzer", analyze_document))
+    workflow.add_node("summarizer", instrument_node("summarizer", generate_summary))
 
     # Define edges
     workflow.add_edge(START, "extractor")
     workflow.add_edge("extractor", "analyzer")  
     workflow.add_edge("analyzer", "summarizer")
-    workflow.add_edge("summarizer", "validator")
-    workflow.add_edge("validator", END)
+    
+    if mode == "parallel":
+        # Fan out after the analyzer, join once both branches are done
+        workflow.add_node("validator", instrument_node("validator", validate_analysis))
+        workflow.add_node("join", instrument_node("join", join_results))
+        workflow.add_edge("analyzer", "validator")
+        workflow.add_edge(["summarizer", "validator"], "join")
+        workflow.add_edge("join", END)
+    else:
+        workflow.add_node("validator", instrument_node("validator", validate_diagnosis))
+        workflow.add_edge("summarizer", "validator")
+        workflow.add_edge("validator", END)
 
     # Compile the graph
-    chain = workflow.compile()
+    return workflow.compile()
+
+def get_medical_analysis_chain(mode: Optional[str] = None):
+    """
+    Get the process-wide compiled chain for a pipeline mode, building it on first use
     
-    # Generate graph visualization
-    graph_png = chain.get_graph().draw_mermaid_png()
-    graph_base64 = base64.b64encode(graph_png).decode('utf-8')
+    Args:
+        mode: Pipeline mode (defaults to settings.PIPELINE_MODE)
     
-    return chain, graph_base64
\ No newline at end of file
+    Returns:
+        CompiledStateGraph: The shared compiled chain
+    """
+    mode = mode or settings.PIPELINE_MODE
+    chain = _chain_registry.get(mode)
+    if chain is None:
+        with _registry_lock:
+            chain = _chain_registry.get(mode)
+            if chain is None:
+                logger.info(f"Compiling {mode} medical analysis chain")
+                chain = build_medical_analysis_chain(mode)
+                _chain_registry[mode] = chain
+    return chain
+
+def _render_workflow_graph(chain) -> Optional[Dict[str, str]]:
+    """Render the workflow diagram and store it under its content hash in the static directory"""
+    try:
+        graph_png = chain.get_graph().draw_mermaid_png()
+    except Exception as e:
+        logger.warning(f"Could not render workflow graph: {e}")
+        return None
+    
+    content_hash = hashlib.sha256(graph_png).hexdigest()
+    filename = f"workflow-{content_hash[:16]}.png"
+    graph_path = Path(settings.STATIC_DIR) / filename
+    
+    # Content-addressed, so an existing file is already up to date
+    if not graph_path.exists():
+        graph_path.parent.mkdir(parents=True, exist_ok=True)
+        # Per-process temporary name: server workers render the graph concurrently at startup
+        tmp_path = graph_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(graph_png)
+        tmp_path.replace(graph_path)
+        logger.info(f"Saved workflow graph to {graph_path}")
+    
+    return {
+        "hash": content_hash,
+        "filename": filename,
+        "url": f"/static/{filename}",
+        "base64": base64.b64encode(graph_png).decode('utf-8'),
+    }
+
+def render_workflow_graph() -> Optional[Dict[str, str]]:
+    """
+    Render the workflow diagram, once per process
+    
+    Rendering calls the mermaid.ink service and blocks, so it runs from the
+    startup hook on a worker thread. A failed render is not retried; the home
+    page shows no diagram until the next restart.
+    
+    Returns:
+        Optional[Dict[str, str]]: hash, filename, url and base64 of the PNG,
+        or None if the diagram could not be rendered
+    """
+    global _workflow_graph, _graph_rendered
+    chain = get_medical_analysis_chain()
+    with _graph_lock:
+        if not _graph_rendered:
+            _workflow_graph = _render_workflow_graph(chain)
+            _graph_rendered = True
+    return _workflow_graph
+
+def get_workflow_graph() -> Optional[Dict[str, str]]:
+    """
+    Get the workflow diagram rendered at startup, without rendering it
+    
+    Returns:
+        Optional[Dict[str, str]]: hash, filename, url and base64 of the PNG,
+        or None if it has not been (or could not be) rendered
+    """
+    return _workflow_graph
+
+def warm_chain_registry():
+    """Compile the chain and render the workflow diagram ahead of the first request (blocking)"""
+    get_medical_analysis_chain()
+    render_workflow_graph()
+
+def create_medical_analysis_chain() -> Tuple[Any, str]:
+    """
+    Get the shared LangGraph chain for medical document analysis
+    
+    Returns:
+        tuple: (compiled_chain, graph_base64)
+    """
+    graph = render_workflow_graph()
+    return get_medical_analysis_chain(), graph["base64"] if graph else ""
\ No newline at end of file
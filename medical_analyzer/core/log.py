@@ -0,0 +1,65 @@
+"""
+Structured logging helpers
+"""
+
+import json
+import logging
+from typing import Any
+
+LOG_FORMATS = ("text", "json")
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the fields of structured events as top-level keys"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        event = getattr(record, "event", None)
+        if event:
+            entry["event"] = event
+            entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def log_event(logger: logging.Logger, event: str, level: int = logging.INFO, **fields: Any):
+    """
+    Log a structured event
+    
+    Text logs show 'event key=value ...'; the JSON formatter emits the event
+    name and fields as separate keys.
+    
+    Args:
+        logger: Logger to write to
+        event: Event name, e.g. 'node_finished'
+        level: Logging level
+        fields: Event fields
+    """
+    if not logger.isEnabledFor(level):
+        return
+    message = " ".join([event] + [f"{key}={value}" for key, value in fields.items()])
+    logger.log(level, message, extra={"event": event, "fields": fields})
+
+def configure_logging(level: str = "INFO", log_format: str = "text"):
+    """
+    Configure the root logger
+    
+    Args:
+        level: Logging level name
+        log_format: 'text' or 'json' (one JSON object per line)
+    """
+    numeric_level = getattr(logging, level.upper(), None)
+    if not isinstance(numeric_level, int):
+        raise ValueError(f"Invalid log level: {level}")
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f"Unsupported log format: {log_format}")
+    
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT))
+    logging.basicConfig(level=numeric_level, handlers=[handler])
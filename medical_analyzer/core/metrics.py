@@ -0,0 +1,345 @@
+"""
+Lightweight in-process metrics
+
+Counters, gauges and histograms are rendered in the Prometheus text format
+for the /metrics endpoint. Timings of a single request are gathered with
+collect_timings() and returned on its response.
+"""
+
+import contextvars
+import functools
+import inspect
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from medical_analyzer.core.log import log_event
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from a cached LLM response up to OCR of a long document
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Content type of the Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+class LatencyStats:
+    """Running count/total/max of latencies in seconds"""
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+    
+    def record(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+    
+    def to_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "count": self.count,
+                "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+                "max_ms": round(self.max * 1000, 3),
+            }
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+class MetricsRegistry:
+    """Named metrics rendered together for a scrape"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, "Metric"] = {}
+        self._lock = threading.Lock()
+    
+    def register(self, metric: "Metric"):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+    
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Metrics served at /metrics
+REGISTRY = MetricsRegistry()
+
+class Metric:
+    """
+    A metric family with optional labels
+    
+    Args:
+        name: Metric name
+        documentation: HELP text
+        labels: Label names; every update passes a value for each of them
+        function: Called at scrape time for the current value(s) instead of
+            tracking updates: a number, or a dict of label value tuples to numbers
+        registry: Registry to add the metric to
+    """
+    
+    type = "untyped"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        function: Optional[Callable[[], Any]] = None,
+        registry: Optional[MetricsRegistry] = None
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.function = function
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+    
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if len(labels) != len(self.label_names) or any(name not in labels for name in self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+    
+    def _current(self) -> Dict[Tuple[str, ...], Any]:
+        if self.function is None:
+            with self._lock:
+                return dict(self._values)
+        value = self.function()
+        return value if isinstance(value, dict) else {(): value}
+    
+    def _samples(self, key: Tuple[str, ...], value: Any) -> List[str]:
+        return [f"{self.name}{_format_labels(list(zip(self.label_names, key)))} {_format_value(value)}"]
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        try:
+            values = self._current()
+        except Exception as e:
+            logger.warning(f"Could not collect metric {self.name}: {e}")
+            return lines
+        for key, value in sorted(values.items()):
+            lines.extend(self._samples(key, value))
+        return lines
+
+class Counter(Metric):
+    """Monotonically increasing total"""
+    
+    type = "counter"
+    
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+class Gauge(Metric):
+    """Value that can go up and down"""
+    
+    type = "gauge"
+    
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+class Histogram(Metric):
+    """Distribution of observations over cumulative buckets"""
+    
+    type = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+        super().__init__(name, documentation, labels, **kwargs)
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+    
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the duration of the block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+    
+    def _current(self) -> Dict[Tuple[str, ...], Any]:
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+    
+    def _samples(self, key: Tuple[str, ...], value: Any) -> List[str]:
+        counts, total, count = value
+        labels = list(zip(self.label_names, key))
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', _format_value(bound))])} {cumulative}")
+        lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', '+Inf')])} {count}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+# Time from the start of a streamed analysis to the first LLM token
+time_to_first_token = LatencyStats()
+
+# Hot-path metrics shared by the pipeline
+node_seconds = Histogram("medical_analyzer_node_seconds", "Time spent in each analysis graph node", ["node"])
+ocr_page_seconds = Histogram("medical_analyzer_ocr_page_seconds", "OCR time per page", ["engine"])
+llm_call_seconds = Histogram("medical_analyzer_llm_call_seconds", "LLM call latency, cache hits included", ["model", "cache"])
+llm_tokens = Counter("medical_analyzer_llm_tokens_total", "Tokens processed by the LLMs", ["model", "kind"])
+time_to_first_token_seconds = Histogram("medical_analyzer_time_to_first_token_seconds", "Time from the start of a streamed analysis to the first LLM token")
+
+class RequestTimings:
+    """Per-stage durations and OCR/LLM usage of one request"""
+    
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.ocr_pages = 0
+        self.ocr_seconds = 0.0
+        self.llm_calls = 0
+        self.llm_cache_hits = 0
+        self.llm_seconds = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._lock = threading.Lock()
+    
+    def add_stage(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+    
+    def add_ocr_page(self, seconds: float):
+        with self._lock:
+            self.ocr_pages += 1
+            self.ocr_seconds += seconds
+    
+    def add_llm_call(self, seconds: float, cached: bool, input_tokens: int = 0, output_tokens: int = 0):
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_cache_hits += int(cached)
+            self.llm_seconds += seconds
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+    
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "stages": {name: round(seconds, 3) for name, seconds in self.stages.items()},
+                "ocr_pages": self.ocr_pages,
+                "ocr_seconds": round(self.ocr_seconds, 3),
+                "llm_calls": self.llm_calls,
+                "llm_cache_hits": self.llm_cache_hits,
+                "llm_seconds": round(self.llm_seconds, 3),
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "total_seconds": round(time.perf_counter() - self.start, 3),
+            }
+
+# Timings of the request being processed; asyncio tasks and LangGraph's
+# executor threads copy the context, so nodes and OCR/LLM calls see it too
+_request_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+def current_timings() -> Optional[RequestTimings]:
+    """Timings of the current request, or None outside collect_timings()"""
+    return _request_timings.get()
+
+@contextmanager
+def collect_timings() -> Iterator[RequestTimings]:
+    """Gather the stage, OCR and LLM timings recorded inside the block"""
+    timings = RequestTimings()
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        try:
+            _request_timings.reset(token)
+        except ValueError:
+            # An abandoned stream closed from another context; its own context ends with it
+            _request_timings.set(None)
+
+def instrument_node(name: str, node: Callable) -> Callable:
+    """
+    Wrap a graph node so it logs start/finish events and records its duration
+    in the node histogram and the current request timings
+    
+    Args:
+        name: Node name in the graph
+        node: Sync or async node function
+        
+    Returns:
+        Callable: The wrapped node, async if the node is
+    """
+    def started(state: Dict[str, Any]) -> float:
+        log_event(logger, "node_started", node=name, document=state.get("file_name"))
+        return time.perf_counter()
+    
+    def finished(state: Dict[str, Any], start: float, error: Optional[BaseException] = None):
+        seconds = time.perf_counter() - start
+        node_seconds.observe(seconds, node=name)
+        timings = current_timings()
+        if timings is not None:
+            timings.add_stage(name, seconds)
+        if error is None:
+            log_event(logger, "node_finished", node=name, document=state.get("file_name"), seconds=round(seconds, 3))
+        else:
+            log_event(logger, "node_failed", level=logging.WARNING, node=name, document=state.get("file_name"),
+                      seconds=round(seconds, 3), error=type(error).__name__)
+    
+    if inspect.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def async_wrapper(state, *args, **kwargs):
+            start = started(state)
+            try:
+                result = await node(state, *args, **kwargs)
+            except BaseException as e:
+                finished(state, start, e)
+                raise
+            finished(state, start)
+            return result
+        return async_wrapper
+    
+    @functools.wraps(node)
+    def wrapper(state, *args, **kwargs):
+        start = started(state)
+        try:
+            result = node(state, *args, **kwargs)
+        except BaseException as e:
+            finished(state, start, e)
+            raise
+        finished(state, start)
+        return result
+    return wrapper
@@ -0,0 +1,145 @@
+"""
+Analysis of multi-document patient packets
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List
+
+from medical_analyzer.core.config import settings
+from medical_analyzer.core.llm_chain import get_medical_analysis_chain, get_workflow_graph, summarize_patient
+from medical_analyzer.core.metrics import collect_timings
+from medical_analyzer.services.document import document_index
+from medical_analyzer.services.ocr import extract_pages_from_pdf
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+async def _process_packet_document(
+    chain,
+    document: Dict[str, Any],
+    extraction_limit: asyncio.Semaphore,
+    bypass_cache: bool
+) -> Dict[str, Any]:
+    """Extract and analyze one document of a packet, recording its timings and any error"""
+    result: Dict[str, Any] = {"filename": document["filename"], "status": "success"}
+    start = time.perf_counter()
+    with collect_timings() as timings:
+        try:
+            # Extraction is blocking (text layer, OCR processes), run it off the event loop
+            async with extraction_limit:
+                pages = await asyncio.to_thread(extract_pages_from_pdf, document["path"], document.get("sha256"))
+            result["extraction_seconds"] = time.perf_counter() - start
+            # The extractor node is a no-op for seeded context, so extraction is timed here
+            timings.add_stage("extractor", result["extraction_seconds"])
+            context = "\n\n".join(page["text"] for page in pages)
+            provenance = [{key: value for key, value in page.items() if key != "text"} for page in pages]
+            if not context.strip():
+                raise ValueError("No text could be extracted from the document")
+            
+            # Seeded context makes the extractor node a no-op; LLM calls from all
+            # documents share the pooled client's per-model concurrency limit
+            analysis_start = time.perf_counter()
+            state = await chain.ainvoke({
+                "file_name": document["path"],
+                "file_hash": document.get("sha256"),
+                "bypass_cache": bypass_cache,
+                "context": context,
+                "pages": provenance,
+            })
+            result.update({
+                "analysis": state.get("analysis_result", ""),
+                "summary": state.get("summary", ""),
+                "validation": state.get("validation_result", ""),
+                "pages": provenance,
+                "analysis_seconds": time.perf_counter() - analysis_start,
+            })
+        except Exception as e:
+            logger.error(f"Error processing packet document {document['filename']}: {str(e)}", exc_info=not isinstance(e, ValueError))
+            result["status"] = "error"
+            # Validation errors are safe to surface, anything else stays generic
+            result["error"] = str(e) if isinstance(e, ValueError) else "An error occurred while processing the document"
+    result["total_seconds"] = time.perf_counter() - start
+    result["timings"] = timings.to_dict()
+    await asyncio.to_thread(document_index.set_status, document["path"], "analyzed" if result["status"] == "success" else "failed")
+    return result
+
+async def analyze_packet(
+    documents: List[Dict[str, Any]],
+    bypass_cache: bool = False,
+    patient_summary: bool = True
+) -> Dict[str, Any]:
+    """
+    Analyze the documents of a patient packet concurrently
+    
+    Each document moves from extraction to analysis as soon as its text is
+    ready, so OCR of one document overlaps with LLM calls for another.
+    
+    Args:
+        documents: Dicts with 'path', 'filename' and optionally 'sha256'
+        bypass_cache: Call the LLMs even if cached responses exist
+        patient_summary: Also combine the document summaries into a patient summary
+        
+    Returns:
+        Dict: Per-document results, the optional patient summary and packet timings
+    """
+    start = time.perf_counter()
+    chain = get_medical_analysis_chain()
+    extraction_limit = asyncio.Semaphore(max(1, int(settings.PACKET_EXTRACTION_WORKERS)))
+    
+    results = await asyncio.gather(*(
+        _process_packet_document(chain, document, extraction_limit, bypass_cache)
+        for document in documents
+    ))
+    succeeded = [result for result in results if result["status"] == "success"]
+    
+    summary = None
+    summary_seconds = None
+    if patient_summary and len(succeeded) > 1:
+        summary_start = time.perf_counter()
+        summary = await summarize_patient(
+            [(result["filename"], result["summary"]) for result in succeeded],
+            bypass_cache=bypass_cache
+        )
+        summary_seconds = time.perf_counter() - summary_start
+    
+    packet_seconds = time.perf_counter() - start
+    logger.info(
+        f"Packet of {len(documents)} documents processed in {packet_seconds:.2f}s "
+        f"({len(documents) - len(succeeded)} failed)"
+    )
+    return {
+        "documents": results,
+        "patient_summary": summary,
+        "document_count": len(documents),
+        "failed_count": len(documents) - len(succeeded),
+        "packet_seconds": packet_seconds,
+        "patient_summary_seconds": summary_seconds,
+        # Measured while the documents shared the OCR pool and LLM slots, so each
+        # one is slower than it would be alone; compare against packet_seconds
+        # with care, it overstates the cost of a sequential run
+        "document_seconds_total": sum(result["total_seconds"] for result in results),
+    }
+
+def process_medical_packet(
+    documents: List[Dict[str, Any]],
+    bypass_cache: bool = False,
+    patient_summary: bool = True
+) -> Dict[str, Any]:
+    """
+    Process a packet of medical documents through the analysis pipeline
+    
+    Args:
+        documents: Dicts with 'path', 'filename' and optionally 'sha256'
+        bypass_cache: Call the LLMs even if cached responses exist
+        patient_summary: Also produce a cross-document patient summary
+        
+    Returns:
+        Dict containing per-document results, the patient summary and timings
+    """
+    # The LLM nodes are async, this runs on a job worker thread
+    result = asyncio.run(analyze_packet(documents, bypass_cache, patient_summary))
+    graph = get_workflow_graph()
+    result["graph_url"] = graph["url"] if graph else None
+    return result
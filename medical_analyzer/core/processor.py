@@ -2,56 +2,177 @@
 Main document processing logic
 """
 
-from typing import Dict, Any
+from typing import Callable, Dict, Any, Optional
 from pathlib import Path
+import asyncio
 import logging
+import threading
+import time
 
-from medical_analyzer.core.llm_chain import create_medical_analysis_chain
-from medical_analyzer.services.ocr import extract_text_from_pdf
+from medical_analyzer.core.llm_chain import get_medical_analysis_chain, get_workflow_graph
+from medical_analyzer.core.metrics import collect_timings, time_to_first_token, time_to_first_token_seconds
+from medical_analyzer.services.document import document_index
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def process_medical_document(document_path: str) -> Dict[str, Any]:
+# Graph nodes whose progress is streamed, and the state key holding each one's output
+STREAMED_STAGES = {
+    "extractor": None,
+    "analyzer": "analysis_result",
+    "summarizer": "summary",
+    "validator": "validation_result",
+}
+
+def _check_document(document_path: str):
+    """Raise ValueError if the document is missing or not a PDF"""
+    if not Path(document_path).exists():
+        raise ValueError(f"Document not found at path: {document_path}")
+    if not document_path.lower().endswith('.pdf'):
+        raise ValueError("Only PDF documents are supported")
+
+def process_medical_document(document_path: str, bypass_cache: bool = False, file_hash: Optional[str] = None) -> Dict[str, Any]:
     """
     Process a medical document through the analysis pipeline
     
     Args:
         document_path: Path to the document file
+        bypass_cache: Call the LLMs even if cached responses exist
+        file_hash: SHA-256 of the document, if already computed during upload
         
     Returns:
-        Dict containing analysis results
+        Dict containing analysis results and the per-stage timings
     """
     try:
-        # Validate the file exists
-        if not Path(document_path).exists():
-            raise ValueError(f"Document not found at path: {document_path}")
-            
+        # Validate the file exists and is a PDF before processing
+        _check_document(document_path)
         logger.info(f"Processing document: {document_path}")
         
-        # Create the chain and get graph visualization
-        chain, graph_viz = create_medical_analysis_chain()
-        
-        # Validate the document is a PDF before processing
-        if not document_path.lower().endswith('.pdf'):
-            raise ValueError("Only PDF documents are supported")
+        # Reuse the process-wide chain and the pre-rendered graph visualization
+        chain = get_medical_analysis_chain()
+        graph = get_workflow_graph()
         
-        # Process the document
-        result = chain.invoke({"file_name": document_path})
+        # Process the document (the LLM nodes are async, this runs on a worker thread)
+        with collect_timings() as timings:
+            result = asyncio.run(chain.ainvoke({"file_name": document_path, "bypass_cache": bypass_cache, "file_hash": file_hash}))
         
         # Clean up result keys if needed
         analysis = result.get("analysis_result", "")
         summary = result.get("summary", "")
         validation = result.get("validation_result", "")
+        pages = result.get("pages", [])
         
         logger.info(f"Document processed successfully: {document_path}")
+        document_index.set_status(document_path, "analyzed")
         
         return {
             "analysis": analysis,
             "summary": summary,
             "validation": validation,
-            "graph": graph_viz
+            "pages": pages,
+            "graph": graph["base64"] if graph else "",
+            "graph_url": graph["url"] if graph else None,
+            "timings": timings.to_dict()
         }
     except Exception as e:
         logger.error(f"Error processing document: {str(e)}", exc_info=True)
-        raise
\ No newline at end of file
+        document_index.set_status(document_path, "failed")
+        raise
+
+def stream_medical_document(
+    document_path: str,
+    emit: Callable[[str, Dict[str, Any]], None],
+    bypass_cache: bool = False,
+    file_hash: Optional[str] = None,
+    stop: Optional[threading.Event] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Process a medical document, reporting progress while the pipeline runs
+    
+    Runs on a job worker thread like process_medical_document. emit(event, data)
+    is called with 'stage' events (node started/completed with its output) and
+    'token' events (LLM token of the running stage; 'run' identifies the LLM
+    call, since map-reduce analyses stream several chunks at once).
+    
+    Args:
+        document_path: Path to the document file
+        emit: Callback receiving each event
+        bypass_cache: Call the LLMs even if cached responses exist
+        file_hash: SHA-256 of the document, if already computed during upload
+        stop: Set to abandon the analysis (e.g. the client disconnected)
+        
+    Returns:
+        Dict like process_medical_document's, plus time_to_first_token and
+        duration, or None if stopped
+    """
+    try:
+        _check_document(document_path)
+        logger.info(f"Streaming analysis of document: {document_path}")
+        chain = get_medical_analysis_chain()
+        
+        with collect_timings() as timings:
+            outputs, first_token_at, start = asyncio.run(
+                _stream_chain(chain, document_path, emit, bypass_cache, file_hash, stop)
+            )
+            if stop is not None and stop.is_set():
+                logger.info(f"Streaming analysis abandoned: {document_path}")
+                return None
+        
+        graph = get_workflow_graph()
+        document_index.set_status(document_path, "analyzed")
+        return {
+            "analysis": outputs.get("analysis_result", ""),
+            "summary": outputs.get("summary", ""),
+            "validation": outputs.get("validation_result", ""),
+            "pages": outputs.get("pages", []),
+            "graph": graph["base64"] if graph else "",
+            "graph_url": graph["url"] if graph else None,
+            "timings": timings.to_dict(),
+            "time_to_first_token": first_token_at,
+            "duration": time.perf_counter() - start,
+        }
+    except Exception as e:
+        logger.error(f"Error streaming document analysis: {str(e)}", exc_info=True)
+        document_index.set_status(document_path, "failed")
+        raise
+
+async def _stream_chain(chain, document_path, emit, bypass_cache, file_hash, stop):
+    """Drive the chain with astream_events, emitting stage and token events"""
+    start = time.perf_counter()
+    first_token_at = None
+    outputs: Dict[str, Any] = {}
+    
+    async for event in chain.astream_events(
+        {"file_name": document_path, "bypass_cache": bypass_cache, "file_hash": file_hash}, version="v2"
+    ):
+        if stop is not None and stop.is_set():
+            break
+        kind = event["event"]
+        node = event.get("metadata", {}).get("langgraph_node")
+        
+        if kind == "on_chat_model_stream" and node in STREAMED_STAGES:
+            token = event["data"]["chunk"].content
+            if not token:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter() - start
+                time_to_first_token.record(first_token_at)
+                time_to_first_token_seconds.observe(first_token_at)
+                logger.info(f"Time to first token: {first_token_at:.2f}s")
+            emit("token", {"stage": node, "run": event["run_id"], "token": token})
+        
+        elif kind in ("on_chain_start", "on_chain_end") and event["name"] == node and node in STREAMED_STAGES:
+            if kind == "on_chain_start":
+                emit("stage", {"stage": node, "status": "started"})
+                continue
+            output = event["data"].get("output") or {}
+            if isinstance(output, dict):
+                outputs.update(output)
+            key = STREAMED_STAGES[node]
+            emit("stage", {
+                "stage": node,
+                "status": "completed",
+                "content": outputs.get(key, "") if key else None,
+            })
+    
+    return outputs, first_token_at, start
@@ -0,0 +1,239 @@
+"""
+Disk-backed caches for extracted text and other derived artefacts
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from medical_analyzer.core.metrics import Counter
+from medical_analyzer.services.database import open_database
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def sha256_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Compute the SHA-256 of a file without loading it into memory
+    
+    Args:
+        file_path: Path to the file
+        chunk_size: Read size in bytes
+        
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class DiskCache:
+    """
+    A size-bounded LRU key/value cache stored in SQLite
+    
+    Entries are evicted least-recently-used first once the total size of the
+    stored values exceeds max_bytes. The total is kept in a one-row table by
+    triggers, so every process sharing the file sees it without summing the
+    entries. Hit/miss counters are kept per process.
+    """
+    
+    def __init__(self, path: str, max_bytes: int, name: str = "cache"):
+        self.path = Path(path)
+        self.max_bytes = int(max_bytes)
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        _caches.append(self)
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use (caller holds the lock)"""
+        if self._conn is None:
+            conn = open_database(self.path)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL,"
+                " expires_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed_at ON entries (accessed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_created_at ON entries (created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_expires_at ON entries (expires_at)")
+            # Running size total; seeded once from the entries of caches created before it existed
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO totals (id, bytes) SELECT 0, COALESCE(SUM(size), 0) FROM entries")
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_size_insert AFTER INSERT ON entries"
+                " BEGIN UPDATE totals SET bytes = bytes + NEW.size WHERE id = 0; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_size_delete AFTER DELETE ON entries"
+                " BEGIN UPDATE totals SET bytes = bytes - OLD.size WHERE id = 0; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_size_update AFTER UPDATE OF size ON entries"
+                " BEGIN UPDATE totals SET bytes = bytes - OLD.size + NEW.size WHERE id = 0; END"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a value, refreshing its LRU position
+        
+        Args:
+            key: Cache key
+            
+        Returns:
+            Optional[str]: The cached value, or None on a miss
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or (row[1] is not None and row[1] <= now):
+                    self.misses += 1
+                    return None
+                conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+                conn.commit()
+                self.hits += 1
+                return row[0]
+        except sqlite3.Error as e:
+            logger.warning(f"{self.name} cache lookup failed: {e}")
+            self.misses += 1
+            return None
+    
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        """
+        Store a value and evict old entries if the cache is over its size budget
+        
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl: Optional time-to-live in seconds
+        """
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            logger.info(f"Not caching {size} byte entry larger than the {self.name} cache")
+            return
+        try:
+            with self._lock:
+                conn = self._connect()
+                # An upsert rather than INSERT OR REPLACE: REPLACE skips the delete trigger
+                conn.execute(
+                    "INSERT INTO entries (key, value, size, created_at, accessed_at, expires_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size,"
+                    " created_at = excluded.created_at, accessed_at = excluded.accessed_at, expires_at = excluded.expires_at",
+                    (key, value, size, now, now, now + ttl if ttl else None),
+                )
+                if self._total_bytes(conn) > self.max_bytes:
+                    self._evict(conn)
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"{self.name} cache store failed: {e}")
+    
+    @staticmethod
+    def _total_bytes(conn: sqlite3.Connection) -> int:
+        """Size of the stored values, from the running total"""
+        return conn.execute("SELECT bytes FROM totals WHERE id = 0").fetchone()[0]
+    
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop expired entries, then least-recently-used ones until under max_bytes (caller holds the lock)"""
+        self.evictions += conn.execute(
+            "DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+        ).rowcount
+        total = self._total_bytes(conn)
+        if total <= self.max_bytes:
+            return
+        
+        excess = total - self.max_bytes
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        self.evictions += len(victims)
+        logger.info(f"Evicted {len(victims)} entries from the {self.name} cache")
+    
+    def purge(self, cutoff: float, limit: int) -> Tuple[int, int]:
+        """
+        Delete up to limit entries created before cutoff or past their TTL
+        
+        Args:
+            cutoff: Unix time; older entries are removed
+            limit: Maximum entries removed per call
+            
+        Returns:
+            tuple: (entries removed, bytes of values removed)
+        """
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute(
+                "SELECT key, size FROM entries WHERE created_at < ? OR (expires_at IS NOT NULL AND expires_at <= ?) LIMIT ?",
+                (cutoff, time.time(), int(limit))
+            ).fetchall()
+            conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in rows])
+            conn.commit()
+        return len(rows), sum(size for _, size in rows)
+    
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM entries")
+            conn.commit()
+    
+    def stats(self) -> Dict[str, int]:
+        """Counters and size for status reporting"""
+        entries, size = 0, 0
+        try:
+            with self._lock:
+                conn = self._connect()
+                entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+                size = self._total_bytes(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"{self.name} cache stats failed: {e}")
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+# Caches created in this process, exported through their hit/miss/eviction counters
+_caches: List[DiskCache] = []
+
+cache_lookups = Counter(
+    "medical_analyzer_cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"],
+    function=lambda: {
+        key: value
+        for cache in _caches
+        for key, value in (((cache.name, "hit"), cache.hits), ((cache.name, "miss"), cache.misses))
+    },
+)
+cache_evictions = Counter(
+    "medical_analyzer_cache_evictions_total", "Cache entries evicted for size or expiry", ["cache"],
+    function=lambda: {(cache.name,): cache.evictions for cache in _caches},
+)
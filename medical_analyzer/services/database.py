@@ -0,0 +1,27 @@
+"""
+SQLite connections for the stores shared by threads and server workers
+"""
+
+import sqlite3
+from pathlib import Path
+
+def open_database(path: Path) -> sqlite3.Connection:
+    """
+    Open a SQLite database used from several threads and processes
+    
+    WAL lets readers proceed while another process writes, synchronous=NORMAL
+    is durable enough for caches and indexes under WAL, and a 30s busy timeout
+    covers other workers' writes. The connection is shared by the threads of
+    its owner, which serializes access with its own lock.
+    
+    Args:
+        path: Database file; its directory is created if needed
+    
+    Returns:
+        sqlite3.Connection: The open connection
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -0,0 +1,373 @@
+"""
+Document handling services
+"""
+
+import base64
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import uuid
+
+from medical_analyzer.core.config import settings
+from medical_analyzer.services.database import open_database
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Lifecycle states of an indexed document
+DOCUMENT_STATUSES = ("uploaded", "analyzed", "failed")
+
+class DocumentIndex:
+    """
+    Metadata of the uploaded documents in SQLite
+    
+    Listing, hash lookups and retention work from the indexes on sha256,
+    upload time and status instead of globbing and stat()-ing the data
+    directory. Paths are stored relative to the data directory.
+    """
+    
+    def __init__(self, path: str, data_dir: str):
+        self.path = Path(path)
+        self.data_dir = Path(data_dir)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use (caller holds the lock)"""
+        if self._conn is None:
+            conn = open_database(self.path)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " path TEXT PRIMARY KEY,"
+                " filename TEXT NOT NULL,"
+                " sha256 TEXT,"
+                " size INTEGER NOT NULL,"
+                " uploaded_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " status TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_sha256 ON documents (sha256)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_uploaded_at ON documents (uploaded_at, path)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_status ON documents (status, uploaded_at, path)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+    
+    def relative_path(self, file_path: str) -> str:
+        """Key of a file: its path relative to the data directory"""
+        return Path(os.path.relpath(Path(file_path).resolve(), self.data_dir.resolve())).as_posix()
+    
+    def absolute_path(self, relative_path: str) -> Path:
+        return self.data_dir / relative_path
+    
+    def add(self, file_path: str, filename: str, size: int, sha256: Optional[str] = None,
+            uploaded_at: Optional[float] = None, status: str = "uploaded"):
+        """Record a stored document"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (path, filename, sha256, size, uploaded_at, updated_at, status)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.relative_path(file_path), filename, sha256, int(size), uploaded_at or now, now, status)
+            )
+            conn.commit()
+    
+    def set_status(self, file_path: str, status: str):
+        """Update the status of a document (no-op for files that are not indexed)"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    "UPDATE documents SET status = ?, updated_at = ? WHERE path = ?",
+                    (status, time.time(), self.relative_path(file_path))
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Document index update failed for {file_path}: {e}")
+    
+    def remove(self, relative_paths: List[str]):
+        """Drop documents from the index"""
+        with self._lock:
+            conn = self._connect()
+            conn.executemany("DELETE FROM documents WHERE path = ?", [(path,) for path in relative_paths])
+            conn.commit()
+    
+    def get(self, relative_path: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT path, filename, sha256, size, uploaded_at, updated_at, status FROM documents WHERE path = ?",
+                (relative_path,)
+            ).fetchone()
+        return self._row_to_dict(row) if row else None
+    
+    def find_by_hash(self, sha256: str) -> List[Dict[str, Any]]:
+        """Documents with the given content hash, newest first"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT path, filename, sha256, size, uploaded_at, updated_at, status FROM documents"
+                " WHERE sha256 = ? ORDER BY uploaded_at DESC", (sha256,)
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+    
+    def list(self, limit: int = 100, cursor: Optional[str] = None, status: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        A page of documents, newest first
+        
+        Pages are keyed on (upload time, path) rather than an offset, so
+        fetching a deep page costs the same as the first one.
+        
+        Args:
+            limit: Page size
+            cursor: next_cursor of the previous page
+            status: Only documents in this status
+            
+        Returns:
+            tuple: (documents, next_cursor or None on the last page)
+        """
+        conditions, params = [], []
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if cursor:
+            uploaded_at, path = self._decode_cursor(cursor)
+            conditions.append("(uploaded_at, path) < (?, ?)")
+            params.extend([uploaded_at, path])
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT path, filename, sha256, size, uploaded_at, updated_at, status FROM documents"
+                f"{where} ORDER BY uploaded_at DESC, path DESC LIMIT ?",
+                (*params, int(limit) + 1)
+            ).fetchall()
+        documents = [self._row_to_dict(row) for row in rows[:limit]]
+        next_cursor = self._encode_cursor(rows[limit - 1][4], rows[limit - 1][0]) if len(rows) > limit else None
+        return documents, next_cursor
+    
+    def count(self, status: Optional[str] = None) -> int:
+        with self._lock:
+            conn = self._connect()
+            if status:
+                return conn.execute("SELECT COUNT(*) FROM documents WHERE status = ?", (status,)).fetchone()[0]
+            return conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    
+    def uploaded_before(self, cutoff: float, limit: int, exclude: Iterable[str] = ()) -> List[Tuple[str, int]]:
+        """(path, size) of the oldest documents uploaded before cutoff, an index range scan"""
+        excluded = [self.relative_path(file_path) for file_path in exclude]
+        query = "SELECT path, size FROM documents WHERE uploaded_at < ?"
+        if excluded:
+            query += f" AND path NOT IN ({', '.join('?' * len(excluded))})"
+        with self._lock:
+            return self._connect().execute(
+                query + " ORDER BY uploaded_at LIMIT ?",
+                (cutoff, *excluded, int(limit))
+            ).fetchall()
+    
+    def import_existing(self, extensions: List[str]) -> int:
+        """
+        Index files already in the data directory, once per index database
+        
+        Uploads saved before the index existed keep their place on disk; they
+        are added with their modification time as upload time.
+        
+        Returns:
+            int: Number of files added
+        """
+        with self._lock:
+            conn = self._connect()
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= 1:
+                return 0
+            added = 0
+            for root, _, files in os.walk(self.data_dir):
+                for name in files:
+                    if name.rsplit(".", 1)[-1].lower() not in extensions:
+                        continue
+                    file_path = Path(root) / name
+                    stats = file_path.stat()
+                    conn.execute(
+                        "INSERT OR IGNORE INTO documents (path, filename, sha256, size, uploaded_at, updated_at, status)"
+                        " VALUES (?, ?, NULL, ?, ?, ?, 'uploaded')",
+                        (self.relative_path(str(file_path)), name, stats.st_size, stats.st_mtime, stats.st_mtime)
+                    )
+                    added += 1
+            conn.execute("PRAGMA user_version = 1")
+            conn.commit()
+        if added:
+            logger.info(f"Indexed {added} existing files in {self.data_dir}")
+        return added
+    
+    @staticmethod
+    def _encode_cursor(uploaded_at: float, path: str) -> str:
+        return base64.urlsafe_b64encode(f"{uploaded_at!r}|{path}".encode("utf-8")).decode("ascii")
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[float, str]:
+        try:
+            uploaded_at, path = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+            return float(uploaded_at), path
+        except Exception:
+            raise ValueError("Invalid cursor")
+    
+    def _row_to_dict(self, row) -> Dict[str, Any]:
+        return {
+            "filename": row[1],
+            "path": row[0],
+            "sha256": row[2],
+            "size": row[3],
+            "created": datetime.fromtimestamp(row[4]).isoformat(),
+            "modified": datetime.fromtimestamp(row[5]).isoformat(),
+            "status": row[6],
+        }
+
+# Index of the uploads in the data directory
+document_index = DocumentIndex(os.path.join(settings.DATA_DIR, "documents.sqlite3"), settings.DATA_DIR)
+
+class DocumentService:
+    """Service for handling document operations"""
+    
+    @staticmethod
+    def build_upload_path(original_filename: str) -> str:
+        """
+        Build a unique path in the data directory for an uploaded file
+        
+        Files are sharded into two levels of subdirectories named after the
+        random part of the filename, so no directory grows past a few thousand
+        entries.
+        
+        Args:
+            original_filename: Original filename
+            
+        Returns:
+            str: Path the upload should be saved to
+        """
+        # Create a unique filename to avoid overwrites
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        unique_id = str(uuid.uuid4())[:8]
+        safe_filename = f"{timestamp}_{unique_id}_{original_filename}"
+        
+        shard = Path(settings.DATA_DIR) / unique_id[:2] / unique_id[2:4]
+        shard.mkdir(parents=True, exist_ok=True)
+        return str(shard / safe_filename)
+    
+    @staticmethod
+    def register_upload(file_path: str, original_filename: str, size: int, sha256: Optional[str] = None):
+        """Add a saved upload to the document index"""
+        document_index.add(file_path, original_filename, size, sha256)
+    
+    @staticmethod
+    def save_uploaded_file(file_content, original_filename: str) -> str:
+        """
+        Save an uploaded file to the data directory
+        
+        Args:
+            file_content: File content (bytes)
+            original_filename: Original filename
+            
+        Returns:
+            str: Path to the saved file
+        """
+        file_path = Path(DocumentService.build_upload_path(original_filename))
+        
+        # Save the file
+        with open(file_path, "wb") as buffer:
+            buffer.write(file_content)
+        
+        DocumentService.register_upload(str(file_path), original_filename, len(file_content), hashlib.sha256(file_content).hexdigest())
+        logger.info(f"Saved uploaded file to {file_path}")
+        return str(file_path)
+    
+    @staticmethod
+    def validate_file_extension(filename: str) -> bool:
+        """
+        Validate if file has an allowed extension
+        
+        Args:
+            filename: Filename to validate
+            
+        Returns:
+            bool: True if extension is allowed, False otherwise
+        """
+        extension = filename.split('.')[-1].lower() if '.' in filename else ''
+        return extension in settings.ALLOWED_EXTENSIONS
+    
+    @staticmethod
+    def list_saved_files(limit: int = 100, cursor: Optional[str] = None, status: Optional[str] = None) -> Dict[str, Any]:
+        """
+        List saved files from the document index, newest first
+        
+        Args:
+            limit: Page size
+            cursor: next_cursor of the previous page
+            status: Only files in this status
+        
+        Returns:
+            Dict: files (list of file information dictionaries), count (total
+            matching files) and next_cursor (None on the last page)
+        """
+        files, next_cursor = document_index.list(limit, cursor, status)
+        return {"files": files, "count": document_index.count(status), "next_cursor": next_cursor}
+    
+    @staticmethod
+    def delete_file(filename: str) -> bool:
+        """
+        Delete a file from the data directory
+        
+        Args:
+            filename: Path of the file relative to the data directory
+            
+        Returns:
+            bool: True if deletion was successful, False otherwise
+        """
+        try:
+            file_path = document_index.absolute_path(filename)
+            
+            # Security check - ensure the file is within the data directory
+            if not file_path.resolve().is_relative_to(Path(settings.DATA_DIR).resolve()):
+                logger.error(f"Attempted to delete file outside data directory: {filename}")
+                return False
+            
+            document_index.remove([filename])
+            # Delete the file if it exists
+            if file_path.exists():
+                file_path.unlink()
+                logger.info(f"Deleted file: {filename}")
+                return True
+            else:
+                logger.warning(f"File not found: {filename}")
+                return False
+        except Exception as e:
+            logger.error(f"Error deleting file {filename}: {str(e)}")
+            return False
+    
+    @staticmethod
+    def delete_uploaded_before(cutoff: float, limit: int, exclude: Iterable[str] = ()) -> Tuple[int, int]:
+        """
+        Delete one batch of the oldest uploads saved before cutoff
+        
+        Args:
+            cutoff: Unix time; older uploads are deleted
+            limit: Maximum files handled
+            exclude: Paths of files still in use (e.g. by queued or running jobs), which are kept
+            
+        Returns:
+            tuple: (index entries removed, bytes of the files deleted)
+        """
+        batch = document_index.uploaded_before(cutoff, limit, exclude)
+        if not batch:
+            return 0, 0
+        reclaimed = 0
+        for relative_path, size in batch:
+            try:
+                document_index.absolute_path(relative_path).unlink(missing_ok=True)
+                reclaimed += size
+            except OSError as e:
+                logger.error(f"Error deleting file {relative_path}: {e}")
+        # Rows go even if the unlink failed, so one bad file cannot stall the sweep
+        document_index.remove([relative_path for relative_path, _ in batch])
+        return len(batch), reclaimed
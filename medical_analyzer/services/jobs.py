@@ -0,0 +1,425 @@
+"""
+Background job queue for long-running document analysis
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from medical_analyzer.core.config import settings
+from medical_analyzer.core.metrics import Gauge, Histogram
+from medical_analyzer.services.database import open_database
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class JobStatus(str, Enum):
+    """Lifecycle states of a job"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+FINISHED_STATUSES = {JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED}
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity"""
+
+class Job:
+    """A unit of work tracked by the job manager"""
+    
+    def __init__(self, job_id: str, description: str = ""):
+        self.id = job_id
+        self.description = description
+        self.status = JobStatus.QUEUED
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.cancel_requested = False
+        self.future: Optional[Future] = None
+        self.document_paths: List[str] = []
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the job metadata (without the result)"""
+        return {
+            "job_id": self.id,
+            "job_status": self.status.value,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error,
+        }
+
+class JobStore:
+    """
+    Job state in SQLite, shared by the server worker processes
+    
+    With several workers a status poll may reach a process other than the one
+    running the job, so every state change is written through and lookups of
+    unknown ids fall back to the store. Cancelling a job owned by another
+    worker sets a flag that its owner checks before starting and when finishing.
+    """
+    
+    def __init__(self, path: str, history_limit: int = 1000):
+        self.path = Path(path)
+        self.history_limit = int(history_limit)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use (caller holds the lock)"""
+        if self._conn is None:
+            conn = open_database(self.path)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " description TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " created_at TEXT NOT NULL,"
+                " started_at TEXT,"
+                " finished_at TEXT,"
+                " error TEXT,"
+                " result TEXT,"
+                " cancel_requested INTEGER NOT NULL DEFAULT 0,"
+                " worker_pid INTEGER NOT NULL,"
+                " document_paths TEXT)"
+            )
+            # Stores created before jobs recorded their documents
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "document_paths" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN document_paths TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs (finished_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+    
+    def save(self, job: "Job"):
+        """Write the job's current state"""
+        row = (
+            job.id, job.description, job.status.value, job.created_at.isoformat(),
+            job.started_at.isoformat() if job.started_at else None,
+            job.finished_at.isoformat() if job.finished_at else None,
+            job.error,
+            json.dumps(job.result, default=str) if job.result is not None else None,
+            int(job.cancel_requested), os.getpid(),
+            json.dumps(job.document_paths),
+        )
+        try:
+            with self._lock:
+                conn = self._connect()
+                # Keep a flag set by another worker when this one writes its state
+                conn.execute(
+                    "INSERT INTO jobs (id, description, status, created_at, started_at, finished_at, error, result, cancel_requested, worker_pid, document_paths)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT(id) DO UPDATE SET status = excluded.status, started_at = excluded.started_at,"
+                    " finished_at = excluded.finished_at, error = excluded.error, result = excluded.result,"
+                    " cancel_requested = MAX(cancel_requested, excluded.cancel_requested)",
+                    row
+                )
+                if job.status in FINISHED_STATUSES:
+                    conn.execute(
+                        "DELETE FROM jobs WHERE finished_at IS NOT NULL AND id NOT IN"
+                        " (SELECT id FROM jobs WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT ?)",
+                        (self.history_limit,)
+                    )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Job store write failed for {job.id}: {e}")
+    
+    def load(self, job_id: str) -> Optional["Job"]:
+        """Read a job, or None if it is unknown"""
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT id, description, status, created_at, started_at, finished_at, error, result, cancel_requested"
+                    " FROM jobs WHERE id = ?", (job_id,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Job store lookup failed for {job_id}: {e}")
+            return None
+        if row is None:
+            return None
+        job = Job(row[0], row[1])
+        job.status = JobStatus(row[2])
+        job.created_at = datetime.fromisoformat(row[3])
+        job.started_at = datetime.fromisoformat(row[4]) if row[4] else None
+        job.finished_at = datetime.fromisoformat(row[5]) if row[5] else None
+        job.error = row[6]
+        job.result = json.loads(row[7]) if row[7] else None
+        job.cancel_requested = bool(row[8])
+        return job
+    
+    def request_cancel(self, job_id: str) -> Optional["Job"]:
+        """Flag an unfinished job for cancellation by whichever worker owns it"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status IN (?, ?)",
+                    (job_id, JobStatus.QUEUED.value, JobStatus.RUNNING.value)
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Job store cancel failed for {job_id}: {e}")
+        return self.load(job_id)
+    
+    def purge(self, cutoff: float, limit: int) -> Tuple[int, int]:
+        """
+        Delete up to limit jobs that finished before cutoff, results included
+        
+        Args:
+            cutoff: Unix time; jobs finished earlier are removed
+            limit: Maximum jobs removed per call
+            
+        Returns:
+            tuple: (jobs removed, bytes of results removed)
+        """
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute(
+                "SELECT id, COALESCE(LENGTH(result), 0) FROM jobs WHERE finished_at < ? ORDER BY finished_at LIMIT ?",
+                (datetime.fromtimestamp(cutoff).isoformat(), int(limit))
+            ).fetchall()
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id, _ in rows])
+            conn.commit()
+        return len(rows), sum(size for _, size in rows)
+    
+    def active_documents(self) -> Set[str]:
+        """Documents of the queued and running jobs of every worker"""
+        try:
+            with self._lock:
+                rows = self._connect().execute(
+                    "SELECT document_paths FROM jobs WHERE status IN (?, ?)",
+                    (JobStatus.QUEUED.value, JobStatus.RUNNING.value)
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Job store lookup of active documents failed: {e}")
+            return set()
+        return {path for (paths,) in rows if paths for path in json.loads(paths)}
+    
+    def cancel_requested(self, job_id: str) -> bool:
+        """Whether another worker asked for the job to be cancelled"""
+        try:
+            with self._lock:
+                row = self._connect().execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        except sqlite3.Error:
+            return False
+        return bool(row and row[0])
+
+# Time jobs wait for a worker and run on it
+job_wait_seconds = Histogram("medical_analyzer_job_wait_seconds", "Time jobs spend queued before a worker picks them up")
+job_run_seconds = Histogram("medical_analyzer_job_run_seconds", "Time jobs spend running, by final status", ["status"])
+
+class JobManager:
+    """
+    Runs jobs on a bounded worker pool with admission control on the queue depth
+    
+    The queue depth is this process's own: with several server workers each one
+    admits up to max_queue_depth queued jobs, even with a shared store.
+    """
+    
+    def __init__(self, max_workers: int, max_queue_depth: int, history_limit: int = 1000, store: Optional[JobStore] = None):
+        self.max_workers = int(max_workers)
+        self.max_queue_depth = int(max_queue_depth)
+        self.history_limit = int(history_limit)
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="analysis-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @property
+    def queue_depth(self) -> int:
+        """Number of jobs waiting for a worker"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status == JobStatus.QUEUED)
+    
+    @property
+    def in_flight(self) -> int:
+        """Number of jobs currently running"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status == JobStatus.RUNNING)
+    
+    def submit(self, fn: Callable[..., Any], *args, description: str = "", document_paths: Optional[List[str]] = None, **kwargs) -> Job:
+        """
+        Queue a callable for execution on the worker pool
+        
+        Args:
+            fn: Callable to run
+            description: Human readable description used in logs
+            document_paths: Uploaded files the job reads, kept from the retention sweep until it finishes
+            
+        Returns:
+            Job: The queued job
+            
+        Raises:
+            QueueFullError: If the queue depth limit has been reached
+        """
+        with self._lock:
+            queued = sum(1 for job in self._jobs.values() if job.status == JobStatus.QUEUED)
+            if queued >= self.max_queue_depth:
+                raise QueueFullError(f"Job queue is full ({queued} jobs waiting)")
+            
+            job = Job(uuid.uuid4().hex, description)
+            job.document_paths = list(document_paths or [])
+            self._jobs[job.id] = job
+            self._prune_history()
+        
+        if self.store is not None:
+            self.store.save(job)
+        job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+        logger.info(f"Queued job {job.id}: {description}")
+        return job
+    
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job by id, in the shared store if another worker runs it"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            return self.store.load(job_id)
+        return job
+    
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a job
+        
+        Queued jobs are removed from the queue. Running jobs cannot be interrupted,
+        so they are flagged and their result is discarded when they finish.
+        
+        Args:
+            job_id: Id of the job to cancel
+            
+        Returns:
+            Optional[Job]: The job, or None if it does not exist
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status in FINISHED_STATUSES:
+                return job
+            
+            if job is not None:
+                job.cancel_requested = True
+                if job.future is not None and job.future.cancel():
+                    job.status = JobStatus.CANCELLED
+                    job.finished_at = datetime.now()
+        
+        if self.store is not None:
+            if job is None:
+                # Owned by another worker, which sees the flag
+                job = self.store.request_cancel(job_id)
+                if job is None or job.status in FINISHED_STATUSES:
+                    return job
+            else:
+                self.store.save(job)
+        elif job is None:
+            return None
+        
+        logger.info(f"Cancellation requested for job {job_id}")
+        return job
+    
+    def active_documents(self) -> Set[str]:
+        """Documents read by queued or running jobs, in this worker and (with the shared store) the others"""
+        with self._lock:
+            paths = {
+                path for job in self._jobs.values()
+                if job.status in (JobStatus.QUEUED, JobStatus.RUNNING)
+                for path in job.document_paths
+            }
+        if self.store is not None:
+            paths |= self.store.active_documents()
+        return paths
+    
+    def stats(self) -> Dict[str, int]:
+        """Queue statistics for status reporting"""
+        with self._lock:
+            counts = {status.value: 0 for status in JobStatus}
+            for job in self._jobs.values():
+                counts[job.status.value] += 1
+        return {
+            "workers": self.max_workers,
+            "max_queue_depth": self.max_queue_depth,
+            "queue_depth": counts[JobStatus.QUEUED.value],
+            "in_flight": counts[JobStatus.RUNNING.value],
+            **{f"jobs_{status}": count for status, count in counts.items()},
+        }
+    
+    def shutdown(self, wait: bool = False):
+        """Stop the worker pool, cancelling queued jobs"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+    
+    def _run(self, job: Job, fn: Callable[..., Any], args, kwargs):
+        """Execute a job on a worker thread and record its outcome"""
+        if self.store is not None and self.store.cancel_requested(job.id):
+            job.cancel_requested = True
+        with self._lock:
+            if job.cancel_requested:
+                job.status = JobStatus.CANCELLED
+                job.finished_at = datetime.now()
+            else:
+                job.status = JobStatus.RUNNING
+                job.started_at = datetime.now()
+        if self.store is not None:
+            self.store.save(job)
+        if job.status == JobStatus.CANCELLED:
+            return
+        job_wait_seconds.observe((job.started_at - job.created_at).total_seconds())
+        
+        try:
+            result = fn(*args, **kwargs)
+            error = None
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}", exc_info=True)
+            result = None
+            error = e
+        
+        if self.store is not None and self.store.cancel_requested(job.id):
+            job.cancel_requested = True
+        with self._lock:
+            job.finished_at = datetime.now()
+            if job.cancel_requested:
+                job.status = JobStatus.CANCELLED
+            elif error is not None:
+                job.status = JobStatus.FAILED
+                # Validation errors are safe to surface, anything else stays generic
+                job.error = str(error) if isinstance(error, ValueError) else "An error occurred while processing the document"
+            else:
+                job.status = JobStatus.SUCCEEDED
+                job.result = result
+        
+        if self.store is not None:
+            self.store.save(job)
+        
+        duration = (job.finished_at - job.started_at).total_seconds()
+        job_run_seconds.observe(duration, status=job.status.value)
+        logger.info(f"Job {job.id} finished with status {job.status.value} in {duration:.2f}s")
+    
+    def _prune_history(self):
+        """Drop the oldest finished jobs beyond the history limit (caller holds the lock)"""
+        excess = len(self._jobs) - self.history_limit
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATUSES][:excess]:
+            del self._jobs[job_id]
+
+# Shared job manager for the application
+job_manager = JobManager(
+    max_workers=settings.JOB_WORKERS,
+    max_queue_depth=settings.JOB_QUEUE_LIMIT,
+    history_limit=settings.JOB_HISTORY_LIMIT,
+    store=JobStore(os.path.join(settings.CACHE_DIR, "jobs.sqlite3"), settings.JOB_HISTORY_LIMIT) if settings.JOB_SHARED_STORE else None,
+)
+
+# Read from the job manager at scrape time
+job_queue_depth = Gauge("medical_analyzer_job_queue_depth", "Jobs waiting for a worker", function=lambda: job_manager.queue_depth)
+jobs_in_flight = Gauge("medical_analyzer_jobs_in_flight", "Jobs currently running", function=lambda: job_manager.in_flight)
@@ -0,0 +1,180 @@
+"""
+Response cache between the analysis graph and the LLM clients
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+from medical_analyzer.core.config import settings
+from medical_analyzer.core.metrics import LatencyStats, current_timings, llm_call_seconds, llm_tokens
+from medical_analyzer.services.cache import DiskCache
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# LLM responses keyed by normalized messages, model and temperature
+llm_response_cache = DiskCache(
+    os.path.join(settings.CACHE_DIR, "llm_responses.sqlite3"),
+    max_bytes=int(settings.LLM_CACHE_MAX_MB) * 1024 * 1024,
+    name="llm",
+)
+
+# Time to serve a cached response versus time spent calling the model
+cache_hit_latency = LatencyStats()
+llm_call_latency = LatencyStats()
+
+_WHITESPACE = re.compile(r"[ \t]+")
+
+def _normalize_content(content: Any) -> Any:
+    """Normalize whitespace so formatting-only differences map to the same key"""
+    if isinstance(content, str):
+        lines = [_WHITESPACE.sub(" ", line).strip() for line in content.strip().splitlines()]
+        return "\n".join(lines)
+    return content
+
+def _model_name(llm) -> str:
+    """Short model name for metric labels and logs"""
+    params = getattr(llm, "_identifying_params", None)
+    if isinstance(params, dict) and params.get("model"):
+        return str(params["model"])
+    for attribute in ("model", "model_name", "model_path"):
+        value = getattr(llm, attribute, None)
+        if value:
+            return str(value)
+    return type(llm).__name__
+
+def _model_identity(llm) -> Dict[str, Any]:
+    """Parameters that identify the model behind a client (name, model file and its version, ...)"""
+    params = getattr(llm, "_identifying_params", None)
+    if isinstance(params, dict) and params:
+        return dict(params)
+    return {"model": _model_name(llm)}
+
+class CachedChatModel:
+    """
+    Wraps a LangChain chat model with a disk-backed response cache
+    
+    The key is a SHA-256 over the normalized messages, the model's identifying
+    parameters (for llama.cpp, the model file and its size and mtime) and the
+    temperature, so identical prompts reuse the earlier response while a
+    replaced model starts a fresh set of entries.
+    """
+    
+    def __init__(self, llm, cache: DiskCache = llm_response_cache, ttl: Optional[int] = None):
+        self.llm = llm
+        self.cache = cache
+        self.ttl = int(ttl if ttl is not None else settings.LLM_CACHE_TTL_SECONDS)
+        self.model_name = _model_name(llm)
+        self.temperature = getattr(llm, "temperature", None)
+    
+    def cache_key(self, messages: List[BaseMessage]) -> str:
+        """Hash of the normalized messages, model identity and temperature"""
+        payload = {
+            "model": _model_identity(self.llm),
+            "temperature": self.temperature,
+            "messages": [
+                {"type": message.type, "content": _normalize_content(message.content)}
+                for message in messages
+            ],
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+    
+    def invoke(self, messages: List[BaseMessage], bypass_cache: bool = False, **kwargs) -> BaseMessage:
+        """
+        Return the cached response for these messages, calling the model on a miss
+        
+        Args:
+            messages: Chat messages
+            bypass_cache: Skip the lookup and always call the model (the response is still stored)
+            
+        Returns:
+            BaseMessage: The model response
+        """
+        start = time.perf_counter()
+        if not settings.LLM_CACHE_ENABLED:
+            return self._observe(self.llm.invoke(messages, **kwargs), start)
+        
+        key = self.cache_key(messages)
+        if not bypass_cache:
+            cached = self._lookup(key)
+            if cached is not None:
+                return self._observe(cached, start, cached=True)
+        
+        start = time.perf_counter()
+        response = self.llm.invoke(messages, **kwargs)
+        llm_call_latency.record(time.perf_counter() - start)
+        self._store(key, response)
+        return self._observe(response, start)
+    
+    async def ainvoke(self, messages: List[BaseMessage], bypass_cache: bool = False, **kwargs) -> BaseMessage:
+        """Async variant of invoke"""
+        start = time.perf_counter()
+        if not settings.LLM_CACHE_ENABLED:
+            return self._observe(await self.llm.ainvoke(messages, **kwargs), start)
+        
+        # The SQLite lookups and writes run on a thread, off the event loop
+        key = self.cache_key(messages)
+        if not bypass_cache:
+            cached = await asyncio.to_thread(self._lookup, key)
+            if cached is not None:
+                return self._observe(cached, start, cached=True)
+        
+        start = time.perf_counter()
+        response = await self.llm.ainvoke(messages, **kwargs)
+        llm_call_latency.record(time.perf_counter() - start)
+        await asyncio.to_thread(self._store, key, response)
+        return self._observe(response, start)
+    
+    def _observe(self, response: BaseMessage, start: float, cached: bool = False) -> BaseMessage:
+        """Record the call latency and token usage in the metrics and the request timings"""
+        seconds = time.perf_counter() - start
+        usage = getattr(response, "usage_metadata", None) or {}
+        input_tokens = int(usage.get("input_tokens", 0))
+        output_tokens = int(usage.get("output_tokens", 0))
+        
+        llm_call_seconds.observe(seconds, model=self.model_name, cache="hit" if cached else "miss")
+        if input_tokens or output_tokens:
+            llm_tokens.inc(input_tokens, model=self.model_name, kind="input")
+            llm_tokens.inc(output_tokens, model=self.model_name, kind="output")
+        timings = current_timings()
+        if timings is not None:
+            timings.add_llm_call(seconds, cached, input_tokens, output_tokens)
+        return response
+    
+    def _lookup(self, key: str) -> Optional[AIMessage]:
+        start = time.perf_counter()
+        cached = self.cache.get(key)
+        if cached is None:
+            return None
+        entry = json.loads(cached)
+        response = AIMessage(content=entry["content"], response_metadata={"cache_hit": True, "model": self.model_name})
+        cache_hit_latency.record(time.perf_counter() - start)
+        logger.info(f"LLM cache hit for {self.model_name}")
+        return response
+    
+    def _store(self, key: str, response: BaseMessage):
+        entry = {"content": response.content, "model": self.model_name}
+        self.cache.set(key, json.dumps(entry), ttl=self.ttl)
+    
+    def __getattr__(self, name):
+        # Delegate anything else (streaming, bind, ...) to the wrapped model
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+def llm_cache_stats() -> Dict[str, Any]:
+    """Cache counters and latency metrics for status reporting"""
+    return {
+        **llm_response_cache.stats(),
+        "hit_latency": cache_hit_latency.to_dict(),
+        "llm_latency": llm_call_latency.to_dict(),
+    }
@@ -0,0 +1,352 @@
+"""
+Connection-pooled async client for the Ollama API
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import logging
+import queue
+import random
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from medical_analyzer.core.config import settings
+from medical_analyzer.services.llm import get_llm_client
+from medical_analyzer.services.model_pool import PooledChatLlamaCpp
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying: overload and transient server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# LangChain message types to Ollama chat roles
+MESSAGE_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+_STREAM_DONE = object()
+
+class OllamaError(Exception):
+    """Raised when the Ollama API fails after all retries"""
+
+class _RetryableStatus(Exception):
+    """Internal: HTTP status that should be retried"""
+
+class OllamaConnectionPool:
+    """
+    Shared keep-alive HTTP pool for Ollama with per-model concurrency limits
+    
+    The pool owns a dedicated event loop thread, so one set of connections and
+    semaphores serves callers on any thread or event loop (request handlers,
+    job workers running their own loops, batch CLIs).
+    """
+    
+    def __init__(
+        self,
+        base_url: str,
+        max_connections: int,
+        max_parallel_per_model: int,
+        max_retries: int,
+        retry_backoff: float,
+        timeout: float
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = int(max_connections)
+        self.max_parallel_per_model = int(max_parallel_per_model)
+        self.max_retries = int(max_retries)
+        self.retry_backoff = float(retry_backoff)
+        self.timeout = float(timeout)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "failures": 0}
+        self._in_flight: Dict[str, int] = {}
+    
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the pool's event loop thread on first use"""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="ollama-pool", daemon=True)
+                thread.start()
+                self._loop = loop
+                logger.info(f"Started Ollama connection pool for {self.base_url}")
+            return self._loop
+    
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Schedule a coroutine on the pool's event loop"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """HTTP client bound to the pool loop (only call from the pool loop)"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60.0,
+                ),
+            )
+        return self._client
+    
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        """Concurrency limit for a model (only call from the pool loop)"""
+        if model not in self._semaphores:
+            self._semaphores[model] = asyncio.Semaphore(self.max_parallel_per_model)
+        return self._semaphores[model]
+    
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with jitter"""
+        return self.retry_backoff * (2 ** attempt) * (1 + random.random() / 2)
+    
+    async def chat(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST a non-streaming /api/chat request with retries (runs on the pool loop)"""
+        model = payload["model"]
+        async with self._semaphore(model):
+            self._track(model, 1)
+            try:
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        response = await self._get_client().post("/api/chat", json=payload)
+                        if response.status_code in RETRYABLE_STATUS_CODES:
+                            raise _RetryableStatus(f"HTTP {response.status_code}: {response.text[:200]}")
+                        response.raise_for_status()
+                        return response.json()
+                    except (httpx.TransportError, _RetryableStatus) as e:
+                        if attempt == self.max_retries:
+                            self._stats["failures"] += 1
+                            raise OllamaError(f"Ollama request to {model} failed after {attempt + 1} attempts: {e}") from e
+                        self._stats["retries"] += 1
+                        delay = self._backoff(attempt)
+                        logger.warning(f"Ollama request to {model} failed ({e}), retrying in {delay:.1f}s")
+                        await asyncio.sleep(delay)
+            finally:
+                self._track(model, -1)
+    
+    async def chat_stream(self, payload: Dict[str, Any], emit: Callable[[Dict[str, Any]], None]):
+        """
+        POST a streaming /api/chat request, passing each NDJSON message to emit (runs on the pool loop)
+        
+        Failures are only retried before the first message has been emitted.
+        """
+        model = payload["model"]
+        async with self._semaphore(model):
+            self._track(model, 1)
+            try:
+                for attempt in range(self.max_retries + 1):
+                    started = False
+                    try:
+                        async with self._get_client().stream("POST", "/api/chat", json=payload) as response:
+                            if response.status_code in RETRYABLE_STATUS_CODES:
+                                raise _RetryableStatus(f"HTTP {response.status_code}")
+                            response.raise_for_status()
+                            async for line in response.aiter_lines():
+                                if not line.strip():
+                                    continue
+                                data = json.loads(line)
+                                if "error" in data:
+                                    raise OllamaError(data["error"])
+                                started = True
+                                emit(data)
+                        return
+                    except (httpx.TransportError, _RetryableStatus) as e:
+                        if started or attempt == self.max_retries:
+                            self._stats["failures"] += 1
+                            raise OllamaError(f"Ollama stream from {model} failed: {e}") from e
+                        self._stats["retries"] += 1
+                        delay = self._backoff(attempt)
+                        logger.warning(f"Ollama stream from {model} failed ({e}), retrying in {delay:.1f}s")
+                        await asyncio.sleep(delay)
+            finally:
+                self._track(model, -1)
+    
+    def _track(self, model: str, delta: int):
+        """Update request counters (called on the pool loop)"""
+        self._in_flight[model] = self._in_flight.get(model, 0) + delta
+        if delta > 0:
+            self._stats["requests"] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Pool counters for status reporting"""
+        return {
+            "base_url": self.base_url,
+            "max_parallel_per_model": self.max_parallel_per_model,
+            **self._stats,
+            "in_flight": dict(self._in_flight),
+        }
+    
+    def close(self):
+        """Close pooled connections and stop the loop thread"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._client is not None:
+            client, self._client = self._client, None
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(timeout=10)
+        self._semaphores = {}
+        loop.call_soon_threadsafe(loop.stop)
+
+# Shared pool for the application
+ollama_pool = OllamaConnectionPool(
+    base_url=settings.OLLAMA_HOST,
+    max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+    max_parallel_per_model=settings.OLLAMA_NUM_PARALLEL,
+    max_retries=settings.LLM_MAX_RETRIES,
+    retry_backoff=settings.LLM_RETRY_BACKOFF,
+    timeout=settings.LLM_REQUEST_TIMEOUT,
+)
+
+class PooledChatOllama(BaseChatModel):
+    """LangChain chat model for Ollama that sends requests through the shared connection pool"""
+    
+    model: str
+    temperature: float = 0.0
+    keep_alive: Optional[str] = None
+    num_ctx: Optional[int] = None
+    
+    @property
+    def _llm_type(self) -> str:
+        return "pooled-ollama"
+    
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        params = {"model": self.model, "temperature": self.temperature}
+        # A smaller context truncates the prompt, so it changes the response
+        if self.num_ctx:
+            params["num_ctx"] = self.num_ctx
+        return params
+    
+    def _payload(self, messages: List[BaseMessage], stream: bool, stop: Optional[List[str]]) -> Dict[str, Any]:
+        options: Dict[str, Any] = {"temperature": self.temperature}
+        if self.num_ctx:
+            options["num_ctx"] = self.num_ctx
+        if stop:
+            options["stop"] = stop
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": MESSAGE_ROLES.get(message.type, "user"), "content": message.content}
+                for message in messages
+            ],
+            "stream": stream,
+            "options": options,
+        }
+        if self.keep_alive:
+            payload["keep_alive"] = self.keep_alive
+        return payload
+    
+    @staticmethod
+    def _metadata(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Timing and token counts reported by Ollama on the final message"""
+        keys = ("model", "total_duration", "load_duration", "prompt_eval_count",
+                "prompt_eval_duration", "eval_count", "eval_duration", "done_reason")
+        return {key: data[key] for key in keys if key in data}
+    
+    @staticmethod
+    def _usage(data: Dict[str, Any]) -> Optional[Dict[str, int]]:
+        if "prompt_eval_count" not in data and "eval_count" not in data:
+            return None
+        input_tokens = int(data.get("prompt_eval_count", 0))
+        output_tokens = int(data.get("eval_count", 0))
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+    
+    def _result(self, data: Dict[str, Any]) -> ChatResult:
+        message = AIMessage(
+            content=data.get("message", {}).get("content", ""),
+            response_metadata=self._metadata(data),
+            usage_metadata=self._usage(data),
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+    
+    def _chunk(self, data: Dict[str, Any]) -> ChatGenerationChunk:
+        content = data.get("message", {}).get("content", "")
+        if data.get("done"):
+            return ChatGenerationChunk(message=AIMessageChunk(
+                content=content,
+                response_metadata=self._metadata(data),
+                usage_metadata=self._usage(data),
+            ))
+        return ChatGenerationChunk(message=AIMessageChunk(content=content))
+    
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        data = ollama_pool.submit(ollama_pool.chat(self._payload(messages, False, stop))).result()
+        return self._result(data)
+    
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        future = ollama_pool.submit(ollama_pool.chat(self._payload(messages, False, stop)))
+        data = await asyncio.wrap_future(future)
+        return self._result(data)
+    
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        items: "queue.Queue" = queue.Queue()
+        future = ollama_pool.submit(ollama_pool.chat_stream(self._payload(messages, True, stop), items.put))
+        future.add_done_callback(lambda _: items.put(_STREAM_DONE))
+        try:
+            while True:
+                item = items.get()
+                if item is _STREAM_DONE:
+                    future.result()
+                    return
+                chunk = self._chunk(item)
+                if run_manager and chunk.message.content:
+                    run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+                yield chunk
+        finally:
+            future.cancel()
+    
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        caller_loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+        
+        def emit(item):
+            caller_loop.call_soon_threadsafe(items.put_nowait, item)
+        
+        future = ollama_pool.submit(ollama_pool.chat_stream(self._payload(messages, True, stop), emit))
+        future.add_done_callback(lambda _: emit(_STREAM_DONE))
+        try:
+            while True:
+                item = await items.get()
+                if item is _STREAM_DONE:
+                    future.result()
+                    return
+                chunk = self._chunk(item)
+                if run_manager and chunk.message.content:
+                    await run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+                yield chunk
+        finally:
+            future.cancel()
+
+def get_pooled_llm_client(model_type: str = "summary", temperature: float = 0.0):
+    """
+    Get an LLM client, using the pooled async Ollama client for the Ollama backend
+    and the shared in-process model pool for llama.cpp
+    
+    Args:
+        model_type: 'summary' or 'analyzer'
+        temperature: Sampling temperature
+    
+    Returns:
+        BaseChatModel: Chat model for the configured backend
+    """
+    if settings.LLM_BACKEND == "ollama":
+        model = settings.OLLAMA_SUMMARY_MODEL if model_type == "summary" else settings.OLLAMA_ANALYZER_MODEL
+        # A long keep_alive keeps the model resident, so Ollama can reuse the KV cache
+        # of the constant system prompt that starts every request
+        return PooledChatOllama(
+            model=model,
+            temperature=temperature,
+            keep_alive=settings.OLLAMA_KEEP_ALIVE,
+            num_ctx=int(settings.OLLAMA_CONTEXT_SIZE),
+        )
+    if settings.LLM_BACKEND == "llamacpp":
+        return PooledChatLlamaCpp(model_type=model_type, temperature=temperature)
+    return get_llm_client(model_type=model_type, temperature=temperature)
@@ -0,0 +1,435 @@
+"""
+In-process pool of llama.cpp models with warm loading and LRU eviction
+"""
+
+import gc
+import hashlib
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from medical_analyzer.core.config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Check if llama.cpp bindings are available
+try:
+    from llama_cpp import Llama
+    LLAMACPP_AVAILABLE = True
+except ImportError:
+    LLAMACPP_AVAILABLE = False
+    logger.warning("llama-cpp-python not available. Install with: pip install llama-cpp-python")
+
+# LangChain message types to llama.cpp chat roles
+MESSAGE_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+# Saved system prompt states kept per model; the chains use a handful of fixed prompts
+MAX_PROMPT_STATES = 4
+
+class ModelPoolError(Exception):
+    """Raised when a model cannot be loaded into the pool"""
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Not Linux: fall back to the peak, which is the best portable figure
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+class LoadedModel:
+    """A model registered with the pool, loaded or not"""
+    
+    def __init__(self, name: str, path: Path, pinned: bool = False):
+        self.name = name
+        self.path = path
+        self.pinned = pinned
+        self.llm: Any = None
+        # llama.cpp contexts are not thread-safe: one caller at a time per model
+        self.lock = threading.Lock()
+        self.users = 0
+        self.loads = 0
+        self.uses = 0
+        self.load_seconds: Optional[float] = None
+        self.rss_delta_bytes: Optional[int] = None
+        self.last_used: Optional[float] = None
+        # Saved llama.cpp states with a system prompt evaluated, by prompt hash, least recently used first
+        self.prompt_states: "OrderedDict[str, Any]" = OrderedDict()
+        self.active_prefix: Optional[str] = None
+    
+    @property
+    def loaded(self) -> bool:
+        return self.llm is not None
+    
+    @property
+    def size_bytes(self) -> int:
+        """Memory charged against the budget: the GGUF file size, since the weights are mmapped"""
+        try:
+            return self.path.stat().st_size
+        except OSError:
+            return 0
+    
+    @property
+    def prompt_cache_bytes(self) -> int:
+        """Memory held by the saved prompt states, which are copies of the KV cache"""
+        return sum(getattr(state, "llama_state_size", 0) for state in list(self.prompt_states.values()))
+    
+    @property
+    def charged_bytes(self) -> int:
+        """Memory charged against the budget while the model is loaded"""
+        return self.size_bytes + self.prompt_cache_bytes
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "loaded": self.loaded,
+            "pinned": self.pinned,
+            "in_use": self.users,
+            "size_mb": round(self.size_bytes / (1024 * 1024), 1),
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "rss_delta_mb": round(self.rss_delta_bytes / (1024 * 1024), 1) if self.rss_delta_bytes is not None else None,
+            "loads": self.loads,
+            "uses": self.uses,
+            "cached_prompts": len(self.prompt_states),
+            "prompt_cache_mb": round(self.prompt_cache_bytes / (1024 * 1024), 1),
+        }
+
+class LlamaCppModelPool:
+    """
+    Keeps llama.cpp models loaded across requests under a memory budget
+    
+    Models are mmapped, so weights are shared with the page cache and a reload
+    after eviction is cheap while the file stays cached. Each loaded model is
+    used by one thread at a time; other callers wait on its lock. When loading
+    a model would exceed the budget, idle unpinned models are evicted in least
+    recently used order. Saved system prompt states count towards the budget
+    of their model and are capped at MAX_PROMPT_STATES per model.
+    """
+    
+    def __init__(self, memory_budget_bytes: int, n_ctx: int, n_threads: int, use_mlock: bool = False,
+                 prompt_cache: bool = True):
+        self.memory_budget_bytes = int(memory_budget_bytes)
+        self.n_ctx = int(n_ctx)
+        self.n_threads = int(n_threads)
+        self.use_mlock = bool(use_mlock)
+        self._models: Dict[str, LoadedModel] = {}
+        # Loaded models in least to most recently used order
+        self._lru: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._evictions = 0
+        self.prompt_cache_enabled = bool(prompt_cache)
+        self._prompt_cache_hits = 0
+        self._prompt_cache_misses = 0
+    
+    def register(self, name: str, path, pinned: bool = False):
+        """Register a model under a name without loading it"""
+        with self._lock:
+            if name not in self._models:
+                self._models[name] = LoadedModel(name, Path(path), pinned)
+            else:
+                self._models[name].pinned = pinned
+    
+    def preload(self, names: Optional[List[str]] = None):
+        """Load registered models ahead of the first request"""
+        for name in names or list(self._models):
+            try:
+                with self.acquire(name):
+                    pass
+            except ModelPoolError as e:
+                logger.error(f"Could not preload model '{name}': {e}")
+    
+    @contextmanager
+    def acquire(self, name: str) -> Iterator[Any]:
+        """
+        Borrow a loaded model for exclusive use, loading it if needed
+        
+        Yields:
+            Llama: The llama.cpp model instance
+        """
+        with self._lock:
+            model = self._models.get(name)
+            if model is None:
+                raise ModelPoolError(f"Model '{name}' is not registered")
+            # Counted as a user before loading so it cannot be evicted while we wait
+            model.users += 1
+        try:
+            with model.lock:
+                if not model.loaded:
+                    self._load(model)
+                with self._lock:
+                    model.uses += 1
+                    model.last_used = time.time()
+                    self._lru.pop(name, None)
+                    self._lru[name] = None
+                yield model.llm
+        finally:
+            with self._lock:
+                model.users -= 1
+    
+    def _load(self, model: LoadedModel):
+        """Load a model from disk, evicting others first if the budget requires it (caller holds model.lock)"""
+        if not LLAMACPP_AVAILABLE:
+            raise ModelPoolError("llama-cpp-python is not installed")
+        if not model.path.exists():
+            raise ModelPoolError(f"Model file not found: {model.path}")
+        
+        self._make_room(model)
+        
+        logger.info(f"Loading llama.cpp model '{model.name}' from {model.path}")
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        try:
+            llm = Llama(
+                model_path=str(model.path),
+                n_ctx=self.n_ctx,
+                n_threads=self.n_threads,
+                use_mmap=True,
+                use_mlock=self.use_mlock,
+                verbose=False,
+            )
+        except Exception as e:
+            raise ModelPoolError(f"Failed to load model '{model.name}': {e}") from e
+        model.llm = llm
+        model.load_seconds = time.perf_counter() - start
+        model.rss_delta_bytes = current_rss_bytes() - rss_before
+        model.loads += 1
+        logger.info(
+            f"Loaded '{model.name}' in {model.load_seconds:.2f}s "
+            f"(RSS +{model.rss_delta_bytes / (1024 * 1024):.0f} MB)"
+        )
+    
+    def prepare_prompt_prefix(self, name: str, llm: Any, system_prompt: str):
+        """
+        Put a borrowed model in a state where the system prompt is already evaluated
+        
+        The first time a system prompt is seen its tokens are evaluated once and
+        the model state is saved; later requests restore that state, and
+        llama.cpp's prefix matching then only evaluates the user content. Must
+        be called while the model is borrowed via acquire(), which also guards
+        the model's saved states.
+        """
+        if not self.prompt_cache_enabled:
+            return
+        model = self._models[name]
+        key = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+        
+        # The previous request on this model used the same prompt, so its context already starts with it
+        if model.active_prefix == key:
+            self._count_prompt_cache(hit=True)
+            return
+        
+        state = model.prompt_states.get(key)
+        if state is not None:
+            llm.load_state(state)
+            model.prompt_states.move_to_end(key)
+            self._count_prompt_cache(hit=True)
+        else:
+            llm.reset()
+            # An empty user turn evaluates the templated system prompt and stops at the user content
+            llm.create_chat_completion(
+                messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": ""}],
+                max_tokens=1,
+                temperature=0.0,
+            )
+            model.prompt_states[key] = llm.save_state()
+            while len(model.prompt_states) > MAX_PROMPT_STATES:
+                model.prompt_states.popitem(last=False)
+            self._count_prompt_cache(hit=False)
+            # The new state may push the loaded models over the budget
+            self._make_room(model)
+        model.active_prefix = key
+    
+    def _count_prompt_cache(self, hit: bool):
+        with self._lock:
+            if hit:
+                self._prompt_cache_hits += 1
+            else:
+                self._prompt_cache_misses += 1
+    
+    def _make_room(self, incoming: LoadedModel):
+        """Evict idle, unpinned models in LRU order until the incoming model and its prompt states fit the budget"""
+        if self.memory_budget_bytes <= 0:
+            return
+        victims = []
+        with self._lock:
+            # The incoming model may already be loaded, when its prompt states grew
+            others = [name for name in self._lru if name != incoming.name]
+            used = sum(self._models[name].charged_bytes for name in others)
+            for name in others:
+                if used + incoming.charged_bytes <= self.memory_budget_bytes:
+                    break
+                candidate = self._models[name]
+                if candidate.pinned or candidate.users > 0:
+                    continue
+                self._lru.pop(name)
+                used -= candidate.charged_bytes
+                victims.append(candidate)
+            if used + incoming.charged_bytes > self.memory_budget_bytes:
+                logger.warning(
+                    f"Keeping '{incoming.name}' loaded exceeds the model memory budget "
+                    f"({(used + incoming.charged_bytes) / (1024 * 1024):.0f} MB > "
+                    f"{self.memory_budget_bytes / (1024 * 1024):.0f} MB); remaining models are pinned or in use"
+                )
+        for victim in victims:
+            # Taking the lock keeps new borrowers out while the model is released
+            with victim.lock:
+                with self._lock:
+                    # Borrowed again since it was chosen: it is recently used now, keep it
+                    if victim.name in self._lru:
+                        continue
+                self._release(victim)
+                self._evictions += 1
+            logger.info(f"Evicted llama.cpp model '{victim.name}' to stay within the memory budget")
+    
+    @staticmethod
+    def _release(model: LoadedModel):
+        llm, model.llm = model.llm, None
+        model.prompt_states = OrderedDict()
+        model.active_prefix = None
+        if llm is not None and hasattr(llm, "close"):
+            llm.close()
+        del llm
+        gc.collect()
+    
+    def model_path(self, name: str) -> Optional[Path]:
+        """Path of a registered model"""
+        model = self._models.get(name)
+        return model.path if model else None
+    
+    def unload(self, name: str):
+        """Unload a model, waiting for its current user to finish"""
+        model = self._models.get(name)
+        if model is None:
+            return
+        with model.lock:
+            with self._lock:
+                self._lru.pop(name, None)
+            self._release(model)
+    
+    def close(self):
+        """Unload all models"""
+        for name in list(self._models):
+            self.unload(name)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Per-model load time, memory and usage plus pool totals"""
+        with self._lock:
+            loaded_bytes = sum(self._models[name].charged_bytes for name in self._lru)
+            return {
+                "available": LLAMACPP_AVAILABLE,
+                "memory_budget_mb": round(self.memory_budget_bytes / (1024 * 1024), 1),
+                "loaded_mb": round(loaded_bytes / (1024 * 1024), 1),
+                "process_rss_mb": round(current_rss_bytes() / (1024 * 1024), 1),
+                "evictions": self._evictions,
+                "prompt_cache": {
+                    "enabled": self.prompt_cache_enabled,
+                    "hits": self._prompt_cache_hits,
+                    "misses": self._prompt_cache_misses,
+                },
+                "models": {name: model.to_dict() for name, model in self._models.items()},
+            }
+
+def _pinned_model_types() -> List[str]:
+    return [name.strip() for name in str(settings.LLAMACPP_PINNED_MODELS).split(",") if name.strip()]
+
+# Shared pool for the application, keyed by model type
+llamacpp_pool = LlamaCppModelPool(
+    memory_budget_bytes=int(settings.LLAMACPP_MEMORY_BUDGET_MB) * 1024 * 1024,
+    n_ctx=settings.LLAMACPP_CONTEXT_SIZE,
+    n_threads=settings.LLAMACPP_THREADS,
+    use_mlock=settings.LLAMACPP_USE_MLOCK,
+    prompt_cache=settings.LLAMACPP_PROMPT_CACHE,
+)
+llamacpp_pool.register("summary", Path(settings.MODELS_DIR) / settings.LLAMACPP_SUMMARY_MODEL, "summary" in _pinned_model_types())
+llamacpp_pool.register("analyzer", Path(settings.MODELS_DIR) / settings.LLAMACPP_ANALYZER_MODEL, "analyzer" in _pinned_model_types())
+
+class PooledChatLlamaCpp(BaseChatModel):
+    """LangChain chat model backed by a model borrowed from the shared llama.cpp pool"""
+    
+    model_type: str
+    temperature: float = 0.0
+    max_tokens: Optional[int] = None
+    
+    @property
+    def _llm_type(self) -> str:
+        return "pooled-llamacpp"
+    
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        path = llamacpp_pool.model_path(self.model_type)
+        params = {"model": path.name if path else self.model_type, "temperature": self.temperature}
+        if path is not None:
+            params["model_path"] = str(path)
+            # Size and mtime change when the GGUF file is replaced under the same name
+            try:
+                stat = path.stat()
+                params["model_version"] = f"{stat.st_size}-{stat.st_mtime_ns}"
+            except OSError:
+                pass
+        return params
+    
+    @staticmethod
+    def _messages(messages: List[BaseMessage]) -> List[Dict[str, str]]:
+        return [
+            {"role": MESSAGE_ROLES.get(message.type, "user"), "content": message.content}
+            for message in messages
+        ]
+    
+    def _prepare(self, llm: Any, messages: List[BaseMessage]):
+        """Restore the evaluated system prompt, if the conversation starts with one"""
+        if messages and messages[0].type == "system":
+            llamacpp_pool.prepare_prompt_prefix(self.model_type, llm, messages[0].content)
+    
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        with llamacpp_pool.acquire(self.model_type) as llm:
+            self._prepare(llm, messages)
+            response = llm.create_chat_completion(
+                messages=self._messages(messages),
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                stop=stop,
+            )
+        usage = response.get("usage") or {}
+        message = AIMessage(
+            content=response["choices"][0]["message"].get("content") or "",
+            response_metadata={"model": response.get("model"), "finish_reason": response["choices"][0].get("finish_reason")},
+            usage_metadata={
+                "input_tokens": usage.get("prompt_tokens", 0),
+                "output_tokens": usage.get("completion_tokens", 0),
+                "total_tokens": usage.get("total_tokens", 0),
+            } if usage else None,
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+    
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        # The model stays borrowed until the stream is exhausted or closed
+        with llamacpp_pool.acquire(self.model_type) as llm:
+            self._prepare(llm, messages)
+            for part in llm.create_chat_completion(
+                messages=self._messages(messages),
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                stop=stop,
+                stream=True,
+            ):
+                content = part["choices"][0].get("delta", {}).get("content") or ""
+                if not content:
+                    continue
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=content))
+                if run_manager:
+                    run_manager.on_llm_new_token(content, chunk=chunk)
+                yield chunk
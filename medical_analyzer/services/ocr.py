@@ -3,25 +3,26 @@ OCR service for extracting text from PDF documents using open-source libraries
 """
 
 import os
+import json
 import logging
-import tempfile
-from pathlib import Path
+import time
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
 import subprocess
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from medical_analyzer.core.config import settings
+from medical_analyzer.core.metrics import current_timings, ocr_page_seconds
+from medical_analyzer.services.cache import DiskCache, sha256_file
+from medical_analyzer.services.ocr_engines import OCR_ENGINES, get_engine_class, ocr_options, ocr_page_batch, ocr_worker_pool
 
 # Try to import PDF libraries but don't fail if not installed
+# (the OCR engines themselves are checked by the registry in ocr_engines)
 try:
-    import pytesseract
     import pdf2image
-    TESSERACT_AVAILABLE = True
+    PDF2IMAGE_AVAILABLE = True
 except ImportError:
-    TESSERACT_AVAILABLE = False
-
-try:
-    import paddleocr
-    PADDLE_AVAILABLE = True
-except ImportError:
-    PADDLE_AVAILABLE = False
+    PDF2IMAGE_AVAILABLE = False
 
 try:
     import pymupdf
@@ -29,117 +30,383 @@ try:
 except ImportError:
     PYMUPDF_AVAILABLE = False
 
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def extract_text_from_pdf(pdf_path: str) -> str:
+# Extracted pages keyed by PDF hash and extraction settings
+extraction_cache = DiskCache(
+    os.path.join(settings.CACHE_DIR, "extraction.sqlite3"),
+    max_bytes=int(settings.EXTRACTION_CACHE_MAX_MB) * 1024 * 1024,
+    name="extraction",
+)
+
+def extract_text_from_pdf(pdf_path: str, file_hash: Optional[str] = None) -> str:
     """
     Extract text from a PDF document using open-source OCR
     
     Args:
         pdf_path: Path to the PDF file
+        file_hash: SHA-256 of the file, if already known
         
     Returns:
         str: Extracted text content
     """
+    pages = extract_pages_from_pdf(pdf_path, file_hash)
+    return "\n\n".join(page["text"] for page in pages)
+
+def extract_pages_from_pdf(pdf_path: str, file_hash: Optional[str] = None) -> List[Dict]:
+    """
+    Extract text page by page, using the embedded text layer where there is one
+    and OCR only for the pages that lack it
+    
+    Results are cached by the SHA-256 of the file and the extraction settings,
+    so a repeat upload skips rasterization and OCR entirely.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        file_hash: SHA-256 of the file, if already known
+        
+    Returns:
+        List[Dict]: Per-page results in page order with the text and its
+        provenance (source, chars, image_coverage, has_fonts, seconds)
+    """
+    if not settings.EXTRACTION_CACHE_ENABLED:
+        return _extract_pages_from_pdf(pdf_path)
+    
+    cache_key = _extraction_cache_key(file_hash or sha256_file(pdf_path))
+    cached = extraction_cache.get(cache_key)
+    if cached is not None:
+        pages = json.loads(cached)
+        logger.info(f"Extraction cache hit for {pdf_path} ({len(pages)} pages)")
+        return pages
+    
+    pages = _extract_pages_from_pdf(pdf_path)
+    # Degraded results are not cached, so they are redone once OCR is available
+    if not any(page["source"] == "ocr_unavailable" for page in pages):
+        extraction_cache.set(cache_key, json.dumps(pages))
+    return pages
+
+def _extraction_cache_key(file_hash: str) -> str:
+    """Cache key covering the file content and everything that affects the extracted text"""
+    options = ocr_options()
+    parts = [
+        file_hash,
+        f"pymupdf={_pymupdf_version()}",
+        f"engine={settings.OCR_ENGINE}",
+        f"version={_ocr_engine_version()}",
+        f"preset={options['preset']}",
+        f"psm={options['psm']}",
+        f"oem={options['oem']}",
+        f"dpi={options['dpi']}",
+        f"min_chars={settings.OCR_PAGE_MIN_CHARS}",
+        f"coverage={settings.OCR_PAGE_IMAGE_COVERAGE}",
+    ]
+    return "|".join(parts)
+
+def _pymupdf_version() -> str:
+    return pymupdf.VersionBind if PYMUPDF_AVAILABLE else "none"
+
+_engine_versions: Dict[str, str] = {}
+
+def _ocr_engine_version() -> str:
+    """Version of the configured OCR engine, looked up once per process"""
+    engine = settings.OCR_ENGINE
+    if engine not in _engine_versions:
+        version = "unknown"
+        try:
+            engine_class = OCR_ENGINES.get(engine)
+            if engine_class is not None and engine_class.available():
+                version = engine_class.version()
+        except Exception as e:
+            logger.warning(f"Could not determine {engine} version: {e}")
+        _engine_versions[engine] = version
+    return _engine_versions[engine]
+
+def _extract_pages_from_pdf(pdf_path: str) -> List[Dict]:
+    """Extract pages without consulting the cache"""
     try:
         logger.info(f"Extracting text from PDF: {pdf_path}")
         
-        # First try to extract text directly without OCR
-        if PYMUPDF_AVAILABLE:
-            text = _extract_text_with_pymupdf(pdf_path)
-            
-            # If we got meaningful text, return it
-            if text and len(text) > 100:  # Arbitrary threshold for "meaningful" text
-                logger.info(f"Successfully extracted {len(text)} characters from PDF using PyMuPDF")
-                return text
+        # Without PyMuPDF we cannot inspect pages, so OCR all of them
+        if not PYMUPDF_AVAILABLE:
+            pages = ocr_pdf_pages(pdf_path)
+            for page in pages:
+                page["source"] = "ocr"
+                page["chars"] = len(page["text"])
+            return pages
+        
+        pages = _extract_text_layer_pages(pdf_path)
+        ocr_page_numbers = [page["page"] for page in pages if page["source"] == "ocr"]
         
-        # If direct extraction failed or returned minimal text, try OCR
-        if settings.OCR_ENGINE == "tesseract":
-            if not TESSERACT_AVAILABLE:
-                raise ImportError("pytesseract and pdf2image are required for Tesseract OCR")
-            text = _extract_text_with_tesseract(pdf_path)
-        elif settings.OCR_ENGINE == "paddle":
-            if not PADDLE_AVAILABLE:
-                raise ImportError("paddleocr is required for PaddleOCR")
-            text = _extract_text_with_paddleocr(pdf_path)
-        else:
-            raise ValueError(f"Unsupported OCR engine: {settings.OCR_ENGINE}")
+        if ocr_page_numbers:
+            try:
+                ocr_results = {result["page"]: result for result in ocr_pdf_pages(pdf_path, ocr_page_numbers)}
+            except ImportError as e:
+                # Degrade to the text layer if there is one, otherwise there is nothing to return
+                if not any(page["source"] == "text_layer" for page in pages):
+                    raise
+                logger.warning(f"Skipping OCR of {len(ocr_page_numbers)} pages: {str(e)}")
+                ocr_results = {}
+            
+            for page in pages:
+                if page["source"] == "ocr":
+                    result = ocr_results.get(page["page"])
+                    if result is None:
+                        page["source"] = "ocr_unavailable"
+                        continue
+                    page["text"] = result["text"]
+                    page["chars"] = len(result["text"])
+                    page["seconds"] += result["seconds"]
         
-        logger.info(f"Successfully extracted {len(text)} characters from PDF using {settings.OCR_ENGINE}")
-        return text
+        counts = {}
+        for page in pages:
+            counts[page["source"]] = counts.get(page["source"], 0) + 1
+        total_chars = sum(page["chars"] for page in pages)
+        logger.info(f"Successfully extracted {total_chars} characters from {len(pages)} pages ({counts})")
+        return pages
         
     except Exception as e:
         logger.error(f"Error extracting text from PDF: {str(e)}", exc_info=True)
         raise ValueError(f"Failed to extract text from PDF: {str(e)}")
 
-def _extract_text_with_pymupdf(pdf_path: str) -> str:
-    """Extract text directly from PDF using PyMuPDF"""
-    text_parts = []
-    doc = pymupdf.open(pdf_path)
+def classify_page(page) -> Dict:
+    """
+    Decide whether a PyMuPDF page can use its text layer or needs OCR
     
-    for page_num in range(len(doc)):
-        page = doc.load_page(page_num)
-        text_parts.append(page.get_text())
+    A page is sent to OCR when it has no fonts or too little text, or when
+    images cover most of it and the text is sparse (e.g. a scan with a stamp).
     
-    return "\n\n".join(text_parts)
+    Args:
+        page: PyMuPDF page
+        
+    Returns:
+        Dict: source ('text_layer', 'ocr' or 'empty'), chars, image_coverage, has_fonts
+    """
+    text = page.get_text()
+    chars = len(text.strip())
+    has_fonts = bool(page.get_fonts())
+    
+    # Fraction of the page covered by images (clipped to the page, overlaps not merged)
+    page_rect = page.rect
+    page_area = abs(page_rect) or 1.0
+    image_area = 0.0
+    for image_info in page.get_image_info():
+        image_area += abs(pymupdf.Rect(image_info["bbox"]) & page_rect)
+    image_coverage = min(1.0, image_area / page_area)
+    
+    min_chars = int(settings.OCR_PAGE_MIN_CHARS)
+    if has_fonts and chars >= min_chars:
+        sparse_text = chars < min_chars * 4
+        source = "ocr" if sparse_text and image_coverage >= float(settings.OCR_PAGE_IMAGE_COVERAGE) else "text_layer"
+    elif image_coverage > 0:
+        source = "ocr"
+    else:
+        source = "text_layer" if chars else "empty"
+    
+    return {
+        "text": text,
+        "source": source,
+        "chars": chars,
+        "image_coverage": round(image_coverage, 3),
+        "has_fonts": has_fonts,
+    }
+
+def _extract_text_layer_pages(pdf_path: str) -> List[Dict]:
+    """Classify every page and extract the text layer of the pages that have one"""
+    pages = []
+    with pymupdf.open(pdf_path) as doc:
+        for page_index in range(len(doc)):
+            start = time.perf_counter()
+            page = classify_page(doc.load_page(page_index))
+            if page["source"] != "text_layer":
+                page["text"] = ""
+            page["page"] = page_index + 1
+            page["seconds"] = time.perf_counter() - start
+            pages.append(page)
+    return pages
 
-def _extract_text_with_tesseract(pdf_path: str) -> str:
-    """Extract text from PDF using Tesseract OCR"""
-    # Set tesseract command if specified in settings
-    if settings.TESSERACT_CMD:
-        pytesseract.pytesseract.tesseract_cmd = settings.TESSERACT_CMD
+def ocr_pdf_pages(pdf_path: str, page_numbers: List[int] = None) -> List[Dict]:
+    """
+    OCR pages of a PDF with the configured engine
     
-    # Convert PDF to images
-    images = pdf2image.convert_from_path(pdf_path)
+    Args:
+        pdf_path: Path to the PDF file
+        page_numbers: 1-based pages to OCR (defaults to all pages)
+        
+    Returns:
+        List[Dict]: Per-page results (page, text, seconds) in page order
+    """
+    # Raises ValueError for an unknown engine and ImportError if it is not installed
+    engine_class = get_engine_class()
+    engine_name = engine_class.name
+    options = ocr_options()
+    batch_fn = partial(ocr_page_batch, engine_name, options)
     
-    # Process each image with Tesseract
-    text_parts = []
-    for i, image in enumerate(images):
-        logger.info(f"Processing page {i+1}/{len(images)} with Tesseract")
-        text = pytesseract.image_to_string(image, lang='eng')
-        text_parts.append(text)
+    if page_numbers is None:
+        page_numbers = list(range(1, get_page_count(pdf_path) + 1))
     
-    return "\n\n".join(text_parts)
+    # Rasterize pages one at a time, in the format the engine consumes, and OCR them in parallel
+    images = iter_page_images(
+        pdf_path,
+        dpi=options["dpi"],
+        page_numbers=page_numbers,
+        as_array=engine_class.input_format == "array"
+    )
+    return _ocr_pages(images, batch_fn, engine_name, len(page_numbers), engine_class.pages_per_batch())
 
-def _extract_text_with_paddleocr(pdf_path: str) -> str:
-    """Extract text from PDF using PaddleOCR"""
-    # Initialize PaddleOCR
-    ocr = paddleocr.PaddleOCR(use_angle_cls=True, lang='en')
+def get_page_count(pdf_path: str) -> int:
+    """Number of pages in a PDF"""
+    if PYMUPDF_AVAILABLE:
+        with pymupdf.open(pdf_path) as doc:
+            return len(doc)
+    return int(pdf2image.pdfinfo_from_path(pdf_path)["Pages"])
+
+def iter_page_images(
+    pdf_path: str,
+    dpi: int = None,
+    page_numbers: List[int] = None,
+    as_array: bool = False
+) -> Iterator[Tuple[int, object]]:
+    """
+    Rasterize a PDF lazily, one page at a time
     
-    # Convert PDF to images
-    images = pdf2image.convert_from_path(pdf_path)
+    Only the page being yielded is held in memory, so peak memory depends on
+    the page size and DPI rather than on the number of pages.
     
-    # Process each image with PaddleOCR
-    text_parts = []
-    for i, image in enumerate(images):
-        logger.info(f"Processing page {i+1}/{len(images)} with PaddleOCR")
+    Args:
+        pdf_path: Path to the PDF file
+        dpi: Rasterization resolution (defaults to the OCR preset's, see ocr_options)
+        page_numbers: 1-based pages to rasterize (defaults to all pages)
+        as_array: Yield RGB numpy arrays (height x width x 3, uint8) copied
+            straight from the pixmap buffer instead of PIL images
         
-        # Save image to temporary file
-        with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp:
-            image_path = temp.name
-            image.save(image_path, 'JPEG')
+    Yields:
+        Tuple[int, PIL.Image.Image | numpy.ndarray]: 1-based page number and page image
+    """
+    dpi = int(dpi or ocr_options()["dpi"])
+    if page_numbers is None:
+        page_numbers = range(1, get_page_count(pdf_path) + 1)
+    as_array = as_array and NUMPY_AVAILABLE
+    
+    if PYMUPDF_AVAILABLE and (as_array or PIL_AVAILABLE):
+        with pymupdf.open(pdf_path) as doc:
+            for page_number in page_numbers:
+                pixmap = doc.load_page(page_number - 1).get_pixmap(dpi=dpi, alpha=False)
+                if as_array:
+                    image = pixmap_to_array(pixmap)
+                else:
+                    image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+                del pixmap
+                yield page_number, image
+    else:
+        # Render single-page windows instead of the whole document at once
+        for page_number in page_numbers:
+            images = pdf2image.convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number)
+            yield page_number, np.asarray(images[0].convert("RGB")) if as_array else images[0]
+
+def pixmap_to_array(pixmap):
+    """Copy a PyMuPDF pixmap into an RGB numpy array without encoding it"""
+    samples = pixmap.samples_mv if hasattr(pixmap, "samples_mv") else pixmap.samples
+    # Pixmap rows are tightly packed (stride == width * n); the copy outlives the pixmap
+    array = np.frombuffer(samples, dtype=np.uint8).reshape(pixmap.height, pixmap.width, pixmap.n)
+    if pixmap.n == 1:
+        array = np.repeat(array, 3, axis=2)
+    return array[:, :, :3].copy()
+
+def _ocr_pages(
+    pages: Iterable[Tuple[int, object]],
+    batch_fn: Callable[[List[Tuple[int, object]]], List[Dict]],
+    engine_name: str,
+    page_count: int,
+    batch_size: int = 1
+) -> List[Dict]:
+    """
+    Run OCR over page images, spreading the pages across the shared process pool
+    
+    Pages are pulled from the iterable as workers free up and grouped into
+    batches for engines that handle several pages per call. At most two pages
+    (or one batch) per worker plus one are in flight, so memory stays bounded
+    for long documents. Concurrent documents share the pool's workers; with a
+    single worker the pages are OCR'd in this process.
+    
+    Args:
+        pages: (page_number, image) pairs in document order
+        batch_fn: Picklable function OCR-ing a list of (page_number, image)
+        engine_name: Engine name used in log messages and metric labels
+        page_count: Number of pages, used to size the pool and the batches
+        batch_size: Maximum pages per batch_fn call
         
-        # Process with PaddleOCR
+    Returns:
+        List[Dict]: Per-page results (page, text, seconds) in page order
+    """
+    start = time.perf_counter()
+    workers = ocr_worker_pool.workers
+    # Smaller batches for short documents, so every worker gets some pages
+    batch_size = max(1, min(int(batch_size), -(-page_count // workers)))
+    batches = _batched(pages, batch_size)
+    max_in_flight = max(workers + 1, workers * 2 // batch_size)
+    results = []
+    
+    if workers == 1:
+        # In-process, reusing this process's loaded engine
+        for batch in batches:
+            results.extend(batch_fn(batch))
+            del batch
+    else:
         try:
-            result = ocr.ocr(image_path, cls=True)
-            
-            # Extract text from result
-            page_text = []
-            for line in result:
-                for word_info in line:
-                    if isinstance(word_info, list) and len(word_info) >= 2:
-                        # Extract text and confidence
-                        text, confidence = word_info[1]
-                        page_text.append(text)
-            
-            text_parts.append(" ".join(page_text))
-        finally:
-            # Clean up temporary file
-            if os.path.exists(image_path):
-                os.unlink(image_path)
+            with ocr_worker_pool.borrow() as pool:
+                results = _collect_in_order(pool, batches, batch_fn, max_in_flight)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start fresh workers for the next document
+            ocr_worker_pool.reset()
+            raise
     
-    return "\n\n".join(text_parts)
+    elapsed = time.perf_counter() - start
+    timings = current_timings()
+    for page in results:
+        ocr_page_seconds.observe(page["seconds"], engine=engine_name)
+        if timings is not None:
+            timings.add_ocr_page(page["seconds"])
+        logger.info(f"{engine_name} page {page['page']}/{len(results)}: {len(page['text'])} characters in {page['seconds']:.2f}s")
+    logger.info(f"{engine_name} processed {len(results)} pages with {workers} workers in {elapsed:.2f}s")
+    return results
+
+def _batched(pages: Iterable[Tuple[int, object]], size: int) -> Iterator[List[Tuple[int, object]]]:
+    """Group (page_number, image) pairs into lists of up to size pages, lazily"""
+    batch = []
+    for page in pages:
+        batch.append(page)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _collect_in_order(pool, batches: Iterable[List[Tuple[int, object]]], batch_fn: Callable, max_in_flight: int) -> List[Dict]:
+    """Submit page batches to a pool with at most max_in_flight outstanding, returning results in page order"""
+    results = []
+    in_flight = deque()
+    for batch in batches:
+        in_flight.append(pool.submit(batch_fn, batch))
+        del batch
+        # Collect the oldest batch first, which also preserves page order
+        if len(in_flight) >= max_in_flight:
+            results.extend(in_flight.popleft().result())
+    while in_flight:
+        results.extend(in_flight.popleft().result())
+    return results
 
 def check_ocr_dependencies():
     """Check if OCR dependencies are installed and working"""
@@ -151,7 +418,7 @@ def check_ocr_dependencies():
     
     # Check OCR engine dependencies
     if settings.OCR_ENGINE == "tesseract":
-        if not TESSERACT_AVAILABLE:
+        if not (OCR_ENGINES["tesseract"].available() and PDF2IMAGE_AVAILABLE):
             issues.append("Tesseract dependencies are not installed. Install with: pip install pytesseract pdf2image")
         
         # Check if tesseract binary is available
@@ -162,8 +429,12 @@ def check_ocr_dependencies():
             issues.append(f"Tesseract binary not found at: {settings.TESSERACT_CMD}")
             issues.append("Install Tesseract from: https://github.com/tesseract-ocr/tesseract")
     
+    elif settings.OCR_ENGINE == "tesserocr":
+        if not OCR_ENGINES["tesserocr"].available():
+            issues.append("tesserocr is not installed. Install with: pip install tesserocr")
+    
     elif settings.OCR_ENGINE == "paddle":
-        if not PADDLE_AVAILABLE:
+        if not OCR_ENGINES["paddle"].available():
             issues.append("PaddleOCR is not installed. Install with: pip install paddleocr")
     
     return issues
\ No newline at end of file
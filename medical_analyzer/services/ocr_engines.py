@@ -0,0 +1,441 @@
+"""
+Registry of OCR engines kept initialized per process, and a persistent OCR worker pool
+"""
+
+import logging
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+
+from medical_analyzer.core.config import settings
+
+# Try to import OCR libraries but don't fail if not installed
+try:
+    import pytesseract
+    PYTESSERACT_AVAILABLE = True
+except ImportError:
+    PYTESSERACT_AVAILABLE = False
+
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+try:
+    import paddleocr
+    PADDLE_AVAILABLE = True
+except ImportError:
+    PADDLE_AVAILABLE = False
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Tesseract tuning per kind of document: page segmentation mode, OCR engine
+# mode (1 = LSTM only, 3 = default) and minimum rasterization DPI
+OCR_PRESETS: Dict[str, Dict[str, Any]] = {
+    # Automatic page layout, settings.OCR_DPI
+    "default": {"psm": 3, "oem": 3, "dpi": 0},
+    # Typed forms and letters: uniform blocks of printed text
+    "typed": {"psm": 6, "oem": 1, "dpi": 300},
+    # Handwritten notes: sparse text in no particular order, finer strokes need more pixels
+    "handwriting": {"psm": 11, "oem": 1, "dpi": 400},
+}
+
+def ocr_options() -> Dict[str, Any]:
+    """
+    Effective OCR options from OCR_PRESET, with TESSERACT_PSM/TESSERACT_OEM overrides
+    
+    Returns:
+        Dict: preset, lang, psm, oem and dpi (the larger of OCR_DPI and the preset minimum)
+    """
+    preset = OCR_PRESETS.get(settings.OCR_PRESET)
+    if preset is None:
+        raise ValueError(f"Unknown OCR preset: {settings.OCR_PRESET} (choose from {', '.join(OCR_PRESETS)})")
+    return {
+        "preset": settings.OCR_PRESET,
+        "lang": "eng",
+        "psm": int(settings.TESSERACT_PSM) or preset["psm"],
+        "oem": preset["oem"] if int(settings.TESSERACT_OEM) < 0 else int(settings.TESSERACT_OEM),
+        "dpi": max(int(settings.OCR_DPI), preset["dpi"]),
+    }
+
+class OCREngine:
+    """
+    An OCR engine whose expensive state is created once by load()
+    
+    Subclasses set `name` and implement load(), recognize() and version().
+    `input_format` tells the rasterizer what to hand over: "pil" for PIL
+    images or "array" for RGB numpy arrays. Engines with a per-call cost
+    (such as a process spawn) override pages_per_batch() and
+    recognize_batch() to handle several pages at once.
+    """
+    
+    name = ""
+    input_format = "pil"
+    
+    def __init__(self):
+        self.loaded = False
+        self.load_seconds: Optional[float] = None
+    
+    @classmethod
+    def available(cls) -> bool:
+        """Whether the engine's dependencies are installed"""
+        return False
+    
+    @classmethod
+    def version(cls) -> str:
+        """Engine version, part of the extraction cache key"""
+        return "unknown"
+    
+    @classmethod
+    def pages_per_batch(cls) -> int:
+        """Pages sent to recognize_batch() in one call"""
+        return 1
+    
+    def load(self):
+        """Initialize models and configuration"""
+    
+    def recognize(self, image, options: Dict[str, Any]) -> str:
+        """Return the text of a page image"""
+        raise NotImplementedError
+    
+    def recognize_batch(self, images: List[Any], options: Dict[str, Any]) -> List[str]:
+        """Return the text of several page images, in order"""
+        return [self.recognize(image, options) for image in images]
+    
+    def ensure_loaded(self):
+        if not self.loaded:
+            start = time.perf_counter()
+            self.load()
+            self.load_seconds = time.perf_counter() - start
+            self.loaded = True
+            logger.info(f"OCR engine '{self.name}' loaded in {self.load_seconds:.2f}s (pid {os.getpid()})")
+
+class TesseractEngine(OCREngine):
+    """
+    Tesseract command line
+    
+    Pages are sent in batches of TESSERACT_BATCH_PAGES to a single tesseract
+    process through a list file, so the process spawn and traineddata load are
+    paid once per batch rather than once per page. Pages are written as
+    uncompressed grayscale PGM, which is cheaper than pytesseract's PNG.
+    """
+    
+    name = "tesseract"
+    
+    @classmethod
+    def available(cls) -> bool:
+        return PYTESSERACT_AVAILABLE
+    
+    @classmethod
+    def version(cls) -> str:
+        if settings.TESSERACT_CMD:
+            pytesseract.pytesseract.tesseract_cmd = settings.TESSERACT_CMD
+        return str(pytesseract.get_tesseract_version())
+    
+    @classmethod
+    def pages_per_batch(cls) -> int:
+        return max(1, int(settings.TESSERACT_BATCH_PAGES))
+    
+    def load(self):
+        # Set tesseract command if specified in settings
+        if settings.TESSERACT_CMD:
+            pytesseract.pytesseract.tesseract_cmd = settings.TESSERACT_CMD
+        self.cmd = settings.TESSERACT_CMD or "tesseract"
+    
+    @staticmethod
+    def _args(options: Dict[str, Any]) -> List[str]:
+        return ["-l", options["lang"], "--psm", str(options["psm"]), "--oem", str(options["oem"]), "--dpi", str(options["dpi"])]
+    
+    def recognize(self, image, options: Dict[str, Any]) -> str:
+        return pytesseract.image_to_string(image, config=" ".join(self._args(options)[2:]), lang=options["lang"])
+    
+    def recognize_batch(self, images: List[Any], options: Dict[str, Any]) -> List[str]:
+        if len(images) == 1:
+            return [self.recognize(images[0], options)]
+        
+        with tempfile.TemporaryDirectory(prefix="ocr-batch-") as tmp_dir:
+            paths = []
+            for index, image in enumerate(images):
+                path = os.path.join(tmp_dir, f"page-{index:04d}.pgm")
+                image.convert("L").save(path)
+                paths.append(path)
+            list_path = os.path.join(tmp_dir, "pages.txt")
+            with open(list_path, "w") as f:
+                f.write("\n".join(paths) + "\n")
+            
+            completed = subprocess.run(
+                [self.cmd, list_path, "stdout", *self._args(options), "-c", "page_separator=\f"],
+                capture_output=True, check=True,
+            )
+        
+        # The text renderer ends every page with the separator
+        texts = completed.stdout.decode("utf-8", "replace").split("\f")
+        if len(texts) < len(images):
+            logger.warning(f"Tesseract batch returned {len(texts)} pages for {len(images)} images, retrying page by page")
+            return [self.recognize(image, options) for image in images]
+        return texts[:len(images)]
+
+class TesserocrEngine(OCREngine):
+    """
+    Tesseract through the tesserocr C API bindings
+    
+    One API session is kept per process and reused for every page, so there
+    is no process spawn, no temp file and no model reload per page.
+    """
+    
+    name = "tesserocr"
+    
+    @classmethod
+    def available(cls) -> bool:
+        return TESSEROCR_AVAILABLE
+    
+    @classmethod
+    def version(cls) -> str:
+        return tesserocr.tesseract_version().splitlines()[0]
+    
+    def load(self):
+        self.api = None
+        self.api_key: Optional[Tuple[str, int]] = None
+    
+    def _session(self, options: Dict[str, Any]):
+        # Language and engine mode are fixed when the session starts
+        key = (options["lang"], options["oem"])
+        if self.api is None or self.api_key != key:
+            if self.api is not None:
+                self.api.End()
+            self.api = tesserocr.PyTessBaseAPI(lang=options["lang"], oem=options["oem"])
+            self.api_key = key
+        return self.api
+    
+    def recognize(self, image, options: Dict[str, Any]) -> str:
+        api = self._session(options)
+        api.SetPageSegMode(options["psm"])
+        api.SetVariable("user_defined_dpi", str(options["dpi"]))
+        api.SetImage(image)
+        return api.GetUTF8Text()
+
+class PaddleEngine(OCREngine):
+    """PaddleOCR with angle classification; loading the models takes seconds, so it is done once"""
+    
+    name = "paddle"
+    # Paddle works on arrays, so pages skip PIL and any file round trip
+    input_format = "array"
+    
+    @classmethod
+    def available(cls) -> bool:
+        return PADDLE_AVAILABLE and NUMPY_AVAILABLE
+    
+    @classmethod
+    def version(cls) -> str:
+        return getattr(paddleocr, "__version__", "unknown")
+    
+    def load(self):
+        self.ocr = paddleocr.PaddleOCR(use_angle_cls=True, lang='en')
+    
+    @staticmethod
+    def to_bgr(image):
+        """RGB array or PIL image to the contiguous BGR array Paddle expects (as from cv2.imread)"""
+        array = image if isinstance(image, np.ndarray) else np.asarray(image.convert("RGB"))
+        return np.ascontiguousarray(array[:, :, ::-1])
+    
+    def recognize(self, image, options: Dict[str, Any]) -> str:
+        result = self.ocr.ocr(self.to_bgr(image), cls=True)
+        
+        # Extract text from result
+        page_text = []
+        for line in result or []:
+            for word_info in line or []:
+                if isinstance(word_info, list) and len(word_info) >= 2:
+                    # Extract text and confidence
+                    text, confidence = word_info[1]
+                    page_text.append(text)
+        return " ".join(page_text)
+
+# Engine classes by OCR_ENGINE name
+OCR_ENGINES: Dict[str, Type[OCREngine]] = {
+    TesseractEngine.name: TesseractEngine,
+    TesserocrEngine.name: TesserocrEngine,
+    PaddleEngine.name: PaddleEngine,
+}
+
+# Initialized engines of the current process
+_engines: Dict[str, OCREngine] = {}
+_engines_lock = threading.Lock()
+
+def register_engine(engine_class: Type[OCREngine]):
+    """Make an engine selectable through OCR_ENGINE"""
+    OCR_ENGINES[engine_class.name] = engine_class
+
+def get_engine_class(name: Optional[str] = None) -> Type[OCREngine]:
+    """Look up an engine class, raising if it is unknown or not installed"""
+    name = name or settings.OCR_ENGINE
+    engine_class = OCR_ENGINES.get(name)
+    if engine_class is None:
+        raise ValueError(f"Unsupported OCR engine: {name}")
+    if not engine_class.available():
+        raise ImportError(f"Dependencies for the '{name}' OCR engine are not installed")
+    return engine_class
+
+def get_engine(name: Optional[str] = None) -> OCREngine:
+    """The loaded engine of this process, created on first use"""
+    engine_class = get_engine_class(name)
+    with _engines_lock:
+        engine = _engines.get(engine_class.name)
+        if engine is None:
+            engine = _engines[engine_class.name] = engine_class()
+        engine.ensure_loaded()
+    return engine
+
+def warm_up_engine(name: Optional[str] = None):
+    """Load an engine and run it once on a blank page so lazy initialization is paid up front"""
+    engine = get_engine(name)
+    if PIL_AVAILABLE:
+        engine.recognize(Image.new("RGB", (64, 64), "white"), ocr_options())
+    return engine
+
+def ocr_page_batch(engine_name: str, options: Dict[str, Any], pages: List[Tuple[int, Any]]) -> List[Dict[str, Any]]:
+    """
+    OCR a batch of (page_number, image) with this process's engine (picklable for worker processes)
+    
+    Options are passed in rather than read from settings, so worker processes
+    follow the caller's configuration.
+    """
+    engine = get_engine(engine_name)
+    start = time.perf_counter()
+    texts = engine.recognize_batch([image for _, image in pages], options)
+    # Batched pages share one call, so each is charged an equal share
+    seconds = (time.perf_counter() - start) / max(1, len(pages))
+    return [
+        {"page": page_number, "text": text, "seconds": seconds}
+        for (page_number, _), text in zip(pages, texts)
+    ]
+
+def _init_worker(engine_name: str):
+    """Worker process initializer: load the engine before the first page arrives"""
+    try:
+        warm_up_engine(engine_name)
+    except Exception as e:
+        # Surface the error on the first page instead of breaking the pool
+        logger.error(f"Could not warm up OCR engine '{engine_name}' in worker {os.getpid()}: {e}")
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+class OCRWorkerPool:
+    """
+    Long-lived OCR worker processes shared by all documents
+    
+    Each worker loads its engine once when it starts, so requests pay neither
+    process spawn nor model load. Pages are fed through the executor's call
+    queue; the pool is recreated if a worker dies. Without
+    OCR_PERSISTENT_WORKERS the workers are shut down once no document is using
+    them, but concurrent documents still share one set of processes.
+    """
+    
+    def __init__(self, workers: int, engine_name: str):
+        self.workers = max(1, int(workers))
+        self.engine_name = engine_name
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._restarts = 0
+        self._users = 0
+    
+    def executor(self) -> ProcessPoolExecutor:
+        """The running executor, started on first use"""
+        with self._lock:
+            if self._executor is None:
+                # Spawn rather than fork: the server process runs threads (event loop, job workers)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.engine_name,),
+                )
+                logger.info(f"Started {self.workers} OCR worker processes for '{self.engine_name}'")
+            return self._executor
+    
+    @contextmanager
+    def borrow(self) -> Iterator[ProcessPoolExecutor]:
+        """
+        Use the executor for one document
+        
+        Yields:
+            ProcessPoolExecutor: The shared executor
+        """
+        with self._lock:
+            self._users += 1
+        try:
+            yield self.executor()
+        finally:
+            with self._lock:
+                self._users -= 1
+                executor = None
+                if not settings.OCR_PERSISTENT_WORKERS and self._users == 0:
+                    executor, self._executor = self._executor, None
+            if executor is not None:
+                executor.shutdown(wait=True)
+    
+    def warm_up(self):
+        """Start all workers now so their engines are loaded before the first request"""
+        executor = self.executor()
+        # Each submit without an idle worker starts a new process
+        wait([executor.submit(_worker_ready) for _ in range(self.workers)])
+    
+    def reset(self):
+        """Discard a broken executor; the next use starts a fresh one"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._restarts += 1
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "engine": self.engine_name,
+            "workers": self.workers,
+            "running": self._executor is not None,
+            "in_use": self._users,
+            "restarts": self._restarts,
+        }
+
+def default_ocr_workers() -> int:
+    """OCR processes per server worker: OCR_WORKERS, or this worker's share of the CPU cores"""
+    if int(settings.OCR_WORKERS) > 0:
+        return int(settings.OCR_WORKERS)
+    return max(1, (os.cpu_count() or 1) // max(1, int(settings.SERVER_WORKERS)))
+
+# Shared worker pool for the application
+ocr_worker_pool = OCRWorkerPool(workers=default_ocr_workers(), engine_name=settings.OCR_ENGINE)
+
+def warm_ocr_engines():
+    """Load the configured engine at startup, in the persistent workers or in this process"""
+    if settings.OCR_PERSISTENT_WORKERS:
+        ocr_worker_pool.warm_up()
+    else:
+        warm_up_engine()
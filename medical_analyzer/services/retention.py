@@ -0,0 +1,228 @@
+"""
+Background retention sweeper for uploads and derived artefacts
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from medical_analyzer.core.config import settings
+from medical_analyzer.core.metrics import Counter, Gauge, Histogram
+from medical_analyzer.services.jobs import job_manager
+from medical_analyzer.services.document import DocumentService
+from medical_analyzer.services.llm_cache import llm_response_cache
+from medical_analyzer.services.ocr import extraction_cache
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+retention_deleted = Counter("medical_analyzer_retention_deleted_total", "Items removed by the retention sweeper", ["target"])
+retention_reclaimed_bytes = Counter("medical_analyzer_retention_reclaimed_bytes_total", "Bytes reclaimed by the retention sweeper", ["target"])
+retention_sweep_seconds = Histogram("medical_analyzer_retention_sweep_seconds", "Duration of retention sweeps")
+retention_last_sweep = Gauge("medical_analyzer_retention_last_sweep_timestamp_seconds", "Unix time the last retention sweep finished")
+
+# A purge function removes up to `limit` items older than `cutoff` and returns (items, bytes)
+PurgeFunction = Callable[[float, int], Tuple[int, int]]
+
+class RetentionSweeper:
+    """
+    Applies FILE_RETENTION_DAYS periodically on a background task
+    
+    Each sweep walks the targets (uploaded PDFs, expired extracted text and LLM
+    responses and, with the shared job store, job results) in batches of batch_size with
+    a pause between batches, so it never holds the databases or the disk for
+    long. The blocking work runs on a thread; the event loop only schedules it.
+    With several server workers, a lock file lets one of them sweep at a time.
+    
+    Args:
+        retention_days: Age in days after which uploads and finished jobs are removed
+        cache_retention_days: Maximum age in days of cache entries, 0 = same as retention_days
+        interval_seconds: Time between sweeps
+        batch_size: Items removed per batch
+        pause_seconds: Pause between batches
+    """
+    
+    def __init__(self, retention_days: float, cache_retention_days: float, interval_seconds: float, batch_size: int, pause_seconds: float):
+        self.retention_days = float(retention_days)
+        self.cache_retention_days = float(cache_retention_days)
+        self.interval_seconds = float(interval_seconds)
+        self.batch_size = max(1, int(batch_size))
+        self.pause_seconds = float(pause_seconds)
+        self.last_sweep: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = threading.Event()
+    
+    def targets(self) -> List[Tuple[str, PurgeFunction, float]]:
+        """
+        Named purge functions covering everything retention applies to, with their cutoffs
+        
+        Uploads and finished jobs follow retention_days. Cached extractions and LLM
+        responses hold text derived from the uploads, so they follow the same
+        retention unless cache_retention_days sets a different one; entries past
+        their TTL are removed either way.
+        """
+        now = datetime.now()
+        cutoff = (now - timedelta(days=self.retention_days)).timestamp()
+        cache_days = self.cache_retention_days if self.cache_retention_days > 0 else self.retention_days
+        cache_cutoff = (now - timedelta(days=cache_days)).timestamp()
+        targets = [
+            ("documents", self._purge_documents, cutoff),
+            ("extraction_cache", extraction_cache.purge, cache_cutoff),
+            ("llm_cache", llm_response_cache.purge, cache_cutoff),
+        ]
+        if job_manager.store is not None:
+            targets.append(("jobs", job_manager.store.purge, cutoff))
+        return targets
+    
+    @staticmethod
+    def _purge_documents(cutoff: float, limit: int) -> Tuple[int, int]:
+        # Uploads that queued or running jobs still read are kept until the next sweep
+        return DocumentService.delete_uploaded_before(cutoff, limit, exclude=job_manager.active_documents())
+    
+    def sweep(self) -> Dict[str, Any]:
+        """
+        Run one sweep over all targets (blocking)
+        
+        Returns:
+            Dict: Start time, duration and items/bytes removed per target
+        """
+        start = time.perf_counter()
+        report: Dict[str, Any] = {"started_at": datetime.now().isoformat(), "targets": {}}
+        
+        with self._sweep_lock() as acquired:
+            if not acquired:
+                logger.info("Retention sweep skipped, another worker is sweeping")
+                report["skipped"] = True
+                return report
+            for name, purge, cutoff in self.targets():
+                report["targets"][name] = self._sweep_target(name, purge, cutoff)
+                if self._stopping.is_set():
+                    break
+        
+        duration = time.perf_counter() - start
+        retention_sweep_seconds.observe(duration)
+        retention_last_sweep.set(time.time())
+        report["duration_seconds"] = round(duration, 3)
+        report["deleted"] = sum(target["deleted"] for target in report["targets"].values())
+        report["bytes_reclaimed"] = sum(target["bytes"] for target in report["targets"].values())
+        if report["deleted"]:
+            logger.info(f"Retention sweep removed {report['deleted']} items ({report['bytes_reclaimed']} bytes) in {duration:.2f}s")
+        return report
+    
+    def _sweep_target(self, name: str, purge: PurgeFunction, cutoff: float) -> Dict[str, int]:
+        deleted = reclaimed = 0
+        while not self._stopping.is_set():
+            try:
+                count, size = purge(cutoff, self.batch_size)
+            except Exception as e:
+                logger.error(f"Retention sweep of {name} failed: {e}")
+                break
+            deleted += count
+            reclaimed += size
+            retention_deleted.inc(count, target=name)
+            retention_reclaimed_bytes.inc(size, target=name)
+            if count < self.batch_size:
+                break
+            # Rate limit: give request handlers the database and the disk between batches
+            self._stopping.wait(self.pause_seconds)
+        return {"deleted": deleted, "bytes": reclaimed}
+    
+    def _sweep_lock(self):
+        return _SweepLock(os.path.join(settings.CACHE_DIR, "retention.lock"))
+    
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.last_sweep = await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.error(f"Retention sweep failed: {e}", exc_info=True)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+    
+    def start(self):
+        """Start sweeping on the running event loop (first sweep right away)"""
+        if self._task is not None:
+            return
+        self._stopping.clear()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Retention sweeper started (every {self.interval_seconds:.0f}s, {self.retention_days:g} day retention)")
+    
+    def trigger(self) -> bool:
+        """Run a sweep now instead of waiting for the interval; False if the sweeper is not running"""
+        if self._task is None or self._wake is None:
+            return False
+        self._wake.set()
+        return True
+    
+    async def stop(self):
+        """Stop after the current batch"""
+        if self._task is None:
+            return
+        self._stopping.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """Settings and the last sweep for status reporting"""
+        return {
+            "running": self._task is not None,
+            "retention_days": self.retention_days,
+            "cache_retention_days": self.cache_retention_days,
+            "interval_seconds": self.interval_seconds,
+            "batch_size": self.batch_size,
+            "last_sweep": self.last_sweep,
+        }
+
+class _SweepLock:
+    """Non-blocking exclusive lock file shared by the server workers"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._handle = None
+    
+    def __enter__(self) -> bool:
+        if not FCNTL_AVAILABLE:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._handle = open(self.path, "w")
+        try:
+            fcntl.flock(self._handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            self._handle.close()
+            self._handle = None
+            return False
+    
+    def __exit__(self, *exc_info):
+        if self._handle is not None:
+            fcntl.flock(self._handle, fcntl.LOCK_UN)
+            self._handle.close()
+            self._handle = None
+
+# Shared sweeper, started and stopped with the application
+retention_sweeper = RetentionSweeper(
+    retention_days=settings.FILE_RETENTION_DAYS,
+    cache_retention_days=settings.CACHE_RETENTION_DAYS,
+    interval_seconds=settings.RETENTION_SWEEP_INTERVAL_SECONDS,
+    batch_size=settings.RETENTION_SWEEP_BATCH_SIZE,
+    pause_seconds=settings.RETENTION_SWEEP_PAUSE_SECONDS,
+)
@@ -0,0 +1,214 @@
+"""
+Streaming multipart upload handling
+"""
+
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from medical_analyzer.core.config import settings
+from medical_analyzer.services.document import DocumentService, document_index
+
+# python-multipart was renamed to python_multipart in 0.0.13
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Allowance for multipart boundaries and part headers when checking Content-Length
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the maximum file size"""
+
+class UploadedDocument:
+    """A file streamed to the data directory"""
+    
+    def __init__(self, path: str, filename: str, size: int, sha256: str):
+        self.path = path
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+
+class _UploadReceiver:
+    """Callbacks for python-multipart that collect file part data as it is parsed"""
+    
+    def __init__(self, field_name: str, max_files: int):
+        self.field_name = field_name
+        self.max_files = max_files
+        self.header_field = b""
+        self.header_value = b""
+        self.headers: Dict[bytes, bytes] = {}
+        self.current: Optional[int] = None
+        # Original filenames of the file parts, in upload order
+        self.filenames: List[str] = []
+        # (file index, bytes) parsed since the last write
+        self.pending: List[Tuple[int, bytes]] = []
+    
+    def callbacks(self) -> Dict[str, object]:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+    
+    def on_part_begin(self):
+        self.headers = {}
+    
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self.header_field += data[start:end]
+    
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self.header_value += data[start:end]
+    
+    def on_header_end(self):
+        self.headers[self.header_field.lower()] = self.header_value
+        self.header_field = b""
+        self.header_value = b""
+    
+    def on_headers_finished(self):
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        if name != self.field_name or filename is None:
+            return
+        if len(self.filenames) >= self.max_files:
+            raise ValueError(f"Too many files, at most {self.max_files} are accepted")
+        # Browsers may send a full client path; keep only the name
+        self.filenames.append(Path(filename.decode("utf-8", "replace").replace("\\", "/")).name)
+        self.current = len(self.filenames) - 1
+    
+    def on_part_data(self, data: bytes, start: int, end: int):
+        # Other form fields are ignored; only file bytes are kept, and only until written
+        if self.current is not None:
+            self.pending.append((self.current, data[start:end]))
+    
+    def on_part_end(self):
+        self.current = None
+
+class _UploadTarget:
+    """A file being written to the data directory"""
+    
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.path = Path(DocumentService.build_upload_path(filename))
+        self.partial = self.path.with_name(self.path.name + ".part")
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.handle = None
+
+async def receive_uploads(
+    request: Request,
+    field_name: str = "files",
+    max_files: int = 1,
+    max_bytes: Optional[int] = None
+) -> List[UploadedDocument]:
+    """
+    Stream the files of a multipart upload to the data directory
+    
+    The body is parsed as it arrives: file bytes are hashed and written to disk
+    chunk by chunk, so memory use per upload stays constant and an oversized
+    file is rejected as soon as it crosses the limit rather than after the
+    whole body has been spooled. If any file is rejected, none are kept.
+    
+    Args:
+        request: Incoming multipart/form-data request
+        field_name: Form field holding the file(s)
+        max_files: Maximum number of files accepted
+        max_bytes: Maximum size of each file (defaults to settings.MAX_FILE_SIZE)
+        
+    Returns:
+        List[UploadedDocument]: Saved path, original filename, size and SHA-256 per file, in upload order
+        
+    Raises:
+        UploadTooLargeError: If a file exceeds max_bytes
+        ValueError: If the body is not a valid upload of allowed file types
+    """
+    max_bytes = max_bytes or settings.MAX_FILE_SIZE
+    
+    # Reject on the declared length before reading anything
+    content_length = request.headers.get("content-length")
+    limit = max_files * (max_bytes + MULTIPART_OVERHEAD_BYTES)
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise UploadTooLargeError(f"File size exceeds maximum allowed ({max_bytes / (1024 * 1024):.1f} MB)")
+    
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise ValueError("Expected a multipart/form-data upload")
+    
+    receiver = _UploadReceiver(field_name, max_files)
+    parser = MultipartParser(boundary, receiver.callbacks())
+    targets: Dict[int, _UploadTarget] = {}
+    
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for index, data in receiver.pending:
+                target = targets.get(index)
+                if target is None:
+                    filename = receiver.filenames[index]
+                    if not DocumentService.validate_file_extension(filename):
+                        raise ValueError(f"Only {', '.join(settings.ALLOWED_EXTENSIONS)} files are supported")
+                    target = targets[index] = _UploadTarget(filename)
+                    target.handle = await run_in_threadpool(open, target.partial, "wb")
+                
+                target.size += len(data)
+                if target.size > max_bytes:
+                    raise UploadTooLargeError(f"File size exceeds maximum allowed ({max_bytes / (1024 * 1024):.1f} MB)")
+                target.hasher.update(data)
+                await run_in_threadpool(target.handle.write, data)
+            receiver.pending.clear()
+        parser.finalize()
+        
+        if not receiver.filenames:
+            raise ValueError(f"No file uploaded in form field '{field_name}'")
+        empty = [filename for index, filename in enumerate(receiver.filenames) if index not in targets]
+        if empty:
+            raise ValueError(f"Uploaded file is empty: {empty[0]}")
+        
+        for target in targets.values():
+            await run_in_threadpool(target.handle.close)
+            os.replace(target.partial, target.path)
+    except BaseException:
+        for target in targets.values():
+            # The open may itself have failed or been cancelled
+            if target.handle is not None:
+                target.handle.close()
+            target.partial.unlink(missing_ok=True)
+            target.path.unlink(missing_ok=True)
+        raise
+    
+    uploads = []
+    for index in sorted(targets):
+        target = targets[index]
+        await run_in_threadpool(DocumentService.register_upload, str(target.path), target.filename, target.size, target.hasher.hexdigest())
+        logger.info(f"Saved uploaded file to {target.path} ({target.size} bytes, sha256 {target.hasher.hexdigest()[:12]})")
+        uploads.append(UploadedDocument(str(target.path), target.filename, target.size, target.hasher.hexdigest()))
+    return uploads
+
+async def receive_upload(request: Request, field_name: str = "file", max_bytes: Optional[int] = None) -> UploadedDocument:
+    """
+    Stream a single multipart file upload to the data directory
+    
+    See receive_uploads; extra file parts in the same field are rejected.
+    """
+    uploads = await receive_uploads(request, field_name=field_name, max_files=1, max_bytes=max_bytes)
+    return uploads[0]
+
+async def discard_uploads(uploads: List[UploadedDocument]):
+    """Delete saved uploads that will not be processed, e.g. when the job queue filled up meanwhile"""
+    for upload in uploads:
+        await run_in_threadpool(DocumentService.delete_file, document_index.relative_path(upload.path))
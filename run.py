@@ -6,7 +6,6 @@ Startup script for the Medical Document Analyzer application
 import os
 import sys
 import argparse
-import logging
 import uvicorn
 from pathlib import Path
 
@@ -21,28 +20,37 @@ def parse_arguments():
     parser.add_argument("--host", default="0.0.0.0", help="Host to bind the server to")
     parser.add_argument("--port", type=int, default=8000, help="Port to bind the server to")
     parser.add_argument("--reload", action="store_true", help="Enable auto-reload for development")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVER_WORKERS", 1)),
+                        help="Server worker processes; each warms up its own OCR engine and chains")
     parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"], 
                         help="Logging level")
+    parser.add_argument("--log-format", default=os.getenv("LOG_FORMAT", "text"), choices=["text", "json"],
+                        help="Log as text or as one JSON object per line")
     parser.add_argument("--check", action="store_true", help="Check system dependencies and exit")
     parser.add_argument("--download-models", action="store_true", help="Download models and exit")
-    parser.add_argument("--ocr-engine", choices=["tesseract", "paddle"], 
+    parser.add_argument("--ocr-engine", choices=["tesseract", "tesserocr", "paddle"], 
                         help="Override OCR engine from .env")
     parser.add_argument("--llm-backend", choices=["ollama", "llamacpp"], 
                         help="Override LLM backend from .env")
     
+    subparsers = parser.add_subparsers(dest="command")
+    batch = subparsers.add_parser("batch", help="Analyze a folder or glob of PDFs and write results as JSONL")
+    batch.add_argument("inputs", nargs="+", help="Directories (searched recursively), glob patterns or PDF files")
+    batch.add_argument("--output", default="batch_results.jsonl", help="JSONL file results are appended to")
+    batch.add_argument("--manifest", help="Checkpoint manifest (default: <output>.manifest.jsonl)")
+    batch.add_argument("--ocr-workers", type=int, default=2, help="Documents extracted concurrently")
+    batch.add_argument("--llm-workers", type=int, default=2, help="Documents analyzed concurrently")
+    batch.add_argument("--max-in-flight", type=int, help="Documents between stages at once (default: ocr + 2 * llm workers)")
+    batch.add_argument("--skip-failed", action="store_true", help="Do not retry documents that failed in a previous run")
+    batch.add_argument("--no-cache", action="store_true", help="Call the LLMs even if cached responses exist")
+    
     return parser.parse_args()
 
-def configure_logging(log_level):
+def configure_logging(log_level, log_format="text"):
     """Configure logging for the application"""
-    numeric_level = getattr(logging, log_level.upper(), None)
-    if not isinstance(numeric_level, int):
-        raise ValueError(f"Invalid log level: {log_level}")
-    
-    logging.basicConfig(
-        level=numeric_level,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[logging.StreamHandler()]
-    )
+    from medical_analyzer.core.log import configure_logging as configure
+    
+    configure(log_level, log_format)
 
 def check_dependencies():
     """Check system dependencies"""
@@ -121,6 +129,53 @@ def download_models():
     
     print("=" * 60)
 
+def run_batch(args):
+    """Run the analysis pipeline over many documents and print throughput"""
+    from medical_analyzer.core.batch import BatchRunner, discover_documents
+    
+    paths = discover_documents(args.inputs)
+    print("\n" + "=" * 60)
+    print(" Batch Analysis ".center(60, "="))
+    print("=" * 60)
+    print(f" Documents found: {len(paths)}".ljust(60))
+    print(f" OCR workers: {args.ocr_workers}, LLM workers: {args.llm_workers}".ljust(60))
+    print("=" * 60 + "\n")
+    
+    if not paths:
+        print("❌ No PDF files matched")
+        return 1
+    
+    runner = BatchRunner(
+        output_path=args.output,
+        manifest_path=args.manifest,
+        ocr_workers=args.ocr_workers,
+        llm_workers=args.llm_workers,
+        max_in_flight=args.max_in_flight,
+        bypass_cache=args.no_cache,
+        retry_failed=not args.skip_failed
+    )
+    try:
+        report = runner.run(paths)
+    except KeyboardInterrupt:
+        print(f"\n⚠️  Interrupted. Rerun the same command to resume from {runner.manifest.path}")
+        return 130
+    
+    print("\n" + "=" * 60)
+    print(" Batch Summary ".center(60, "="))
+    print("=" * 60)
+    print(f"  Succeeded: {report['succeeded']}  Failed: {report['failed']}  Skipped: {report['skipped']}")
+    print(f"  Elapsed: {report['elapsed_seconds']}s  Throughput: {report['docs_per_minute']} docs/min")
+    for stage, stats in report["stages"].items():
+        print(f"  {stage.upper()} stage: mean {stats['mean_s']}s, max {stats['max_s']}s, total {stats['total_s']}s")
+    if report["top_errors"]:
+        print("\n  Failures:")
+        for error, count in report["top_errors"]:
+            print(f"    • {count} x {error}")
+    print(f"\n  Results: {report['output']}")
+    print(f"  Manifest: {report['manifest']}")
+    print("=" * 60)
+    return 1 if report["failed"] else 0
+
 def main():
     """Main entry point"""
     # Set up environment
@@ -130,7 +185,7 @@ def main():
     args = parse_arguments()
     
     # Configure logging
-    configure_logging(args.log_level)
+    configure_logging(args.log_level, args.log_format)
     
     # Set environment variables from command line arguments
     if args.ocr_engine:
@@ -139,6 +194,18 @@ def main():
     if args.llm_backend:
         os.environ["LLM_BACKEND"] = args.llm_backend
     
+    # The server process (uvicorn reload) reads the format from the environment
+    os.environ["LOG_FORMAT"] = args.log_format
+    
+    # Pre-forked workers share the caches (SQLite files under CACHE_DIR) and the
+    # job store, and split the cores between their OCR pools
+    if args.command != "batch" and args.workers > 1:
+        if args.reload:
+            print("❌ --reload cannot be combined with --workers")
+            return 2
+        os.environ.setdefault("JOB_SHARED_STORE", "true")
+        os.environ["SERVER_WORKERS"] = str(args.workers)
+    
     # Import here to ensure environment variables are set
     from medical_analyzer.core.config import settings
     
@@ -151,12 +218,16 @@ def main():
         download_models()
         return 0
     
+    if args.command == "batch":
+        return run_batch(args)
+    
     # Show banner
     print("\n" + "=" * 60)
     print(" Medical Document Analyzer ".center(60, "="))
     print("=" * 60)
     print(f" OCR Engine: {settings.OCR_ENGINE}".ljust(60))
     print(f" LLM Backend: {settings.LLM_BACKEND}".ljust(60))
+    print(f" Workers: {args.workers}".ljust(60))
     print("=" * 60 + "\n")
     
     # Start the server
@@ -166,6 +237,7 @@ def main():
         host=args.host,
         port=args.port,
         reload=args.reload,
+        workers=args.workers,
         log_level=args.log_level.lower()
     )
     
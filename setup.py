@@ -17,6 +17,7 @@ required_packages = [
     "langchain-community>=0.0.16",
     "python-dotenv>=1.0.0",
     "pymupdf>=1.22.0",  # For direct PDF text extraction
+    "httpx>=0.24.0",
 ]
 
 # Optional dependencies for different components
@@ -25,6 +26,10 @@ tesseract_requires = [
     "pdf2image>=1.16.3",
 ]
 
+tesserocr_requires = [
+    "tesserocr>=2.6.0",
+]
+
 paddle_requires = [
     "paddleocr>=2.6.0.1",
     "pdf2image>=1.16.3",
@@ -52,6 +57,7 @@ setup(
     install_requires=required_packages,
     extras_require={
         "tesseract": tesseract_requires,
+        "tesserocr": tesserocr_requires,
         "paddle": paddle_requires,
         "llamacpp": llamacpp_requires,
         "dev": dev_requires,
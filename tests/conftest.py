@@ -0,0 +1,49 @@
+"""
+Shared fixtures for the test suite
+"""
+
+import pytest
+
+from benchmarks.stub_ollama import start_stub_ollama
+
+@pytest.fixture
+def stub_ollama():
+    """Start benchmarks.stub_ollama servers on free ports; returns (url, config) per call"""
+    servers = []
+    
+    def start(**kwargs):
+        server, url, config = start_stub_ollama(**kwargs)
+        servers.append(server)
+        return url, config
+    
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Point uploads and the document index at a temporary data directory"""
+    from medical_analyzer.core.config import settings
+    from medical_analyzer.services import document, upload
+    from medical_analyzer.services.document import DocumentIndex
+    
+    path = tmp_path / "data"
+    path.mkdir()
+    index = DocumentIndex(str(path / "documents.sqlite3"), str(path))
+    monkeypatch.setattr(settings, "DATA_DIR", str(path))
+    monkeypatch.setattr(document, "document_index", index)
+    monkeypatch.setattr(upload, "document_index", index)
+    return path
+
+@pytest.fixture
+def api_client(data_dir):
+    """TestClient for the API routes, without the application's startup warm-up"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from medical_analyzer.api.routes import router
+    
+    app = FastAPI()
+    app.include_router(router)
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,135 @@
+"""
+Tests for the SQLite disk cache
+"""
+
+import sqlite3
+
+import pytest
+
+from medical_analyzer.services import cache as cache_module
+from medical_analyzer.services.cache import DiskCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time() for the cache module"""
+    now = [1_700_000_000.0]
+    
+    def advance(seconds: float):
+        now[0] += seconds
+    
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    return advance
+
+def make_cache(tmp_path, max_bytes: int = 300) -> DiskCache:
+    return DiskCache(str(tmp_path / "cache.sqlite3"), max_bytes=max_bytes, name="test")
+
+def stored_bytes(cache: DiskCache) -> int:
+    """Size summed from the entries, to check the running total against"""
+    with cache._lock:
+        return cache._connect().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+def test_get_returns_stored_values_and_counts_hits(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("key", "value")
+    
+    assert cache.get("key") == "value"
+    assert cache.get("missing") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    for key in "abc":
+        cache.set(key, key * 100)
+        clock(1)
+    cache.get("a")
+    clock(1)
+    
+    cache.set("d", "d" * 100)
+    
+    assert cache.get("b") is None
+    assert [cache.get(key) is not None for key in "acd"] == [True, True, True]
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 300
+
+def test_expired_entries_are_evicted_before_recently_used_ones(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.set("old", "o" * 100)
+    clock(1)
+    cache.set("short_lived", "s" * 100, ttl=5)
+    clock(1)
+    cache.set("recent", "r" * 100)
+    clock(10)
+    
+    cache.set("new", "n" * 100)
+    
+    assert cache.get("short_lived") is None
+    assert cache.get("old") == "o" * 100
+
+def test_entries_expire_after_their_ttl(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.set("key", "value", ttl=60)
+    
+    clock(59)
+    assert cache.get("key") == "value"
+    clock(2)
+    assert cache.get("key") is None
+
+def test_purge_removes_aged_and_expired_entries(tmp_path, clock):
+    cache = make_cache(tmp_path, max_bytes=10_000)
+    cache.set("aged", "a" * 10)
+    clock(100)
+    cache.set("expired", "e" * 20, ttl=1)
+    cache.set("fresh", "f" * 30)
+    clock(10)
+    
+    assert cache.purge(cutoff=cache_module.time.time() - 50, limit=10) == (2, 30)
+    assert cache.get("fresh") == "f" * 30
+    assert cache.stats()["entries"] == 1
+
+def test_oversized_values_are_not_cached(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=10)
+    cache.set("key", "x" * 11)
+    
+    assert cache.get("key") is None
+    assert cache.stats()["bytes"] == 0
+
+def test_running_total_matches_the_entries(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=250)
+    cache.set("a", "a" * 100)
+    cache.set("a", "a" * 40)
+    cache.set("é", "é" * 50)
+    cache.set("b", "b" * 100)
+    assert cache.stats()["bytes"] == stored_bytes(cache) <= 250
+    
+    cache.purge(cutoff=cache_module.time.time() + 1, limit=1)
+    assert cache.stats()["bytes"] == stored_bytes(cache)
+    
+    cache.clear()
+    assert cache.stats()["bytes"] == stored_bytes(cache) == 0
+
+def test_caches_sharing_a_file_share_the_size_budget(tmp_path, clock):
+    first = make_cache(tmp_path)
+    second = make_cache(tmp_path)
+    first.set("a", "a" * 200)
+    clock(1)
+    
+    second.set("b", "b" * 200)
+    
+    assert first.get("a") is None
+    assert first.stats()["bytes"] == 200
+
+def test_existing_cache_without_a_total_is_seeded(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    conn = sqlite3.connect(str(path))
+    conn.execute(
+        "CREATE TABLE entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+        " created_at REAL NOT NULL, accessed_at REAL NOT NULL, expires_at REAL)"
+    )
+    conn.execute("INSERT INTO entries VALUES ('old', 'value', 5, 0, 0, NULL)")
+    conn.commit()
+    conn.close()
+    
+    cache = make_cache(tmp_path)
+    
+    assert cache.stats()["bytes"] == 5
+    assert cache.get("old") == "value"
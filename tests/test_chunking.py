@@ -0,0 +1,100 @@
+"""
+Tests for document chunking and the map-reduce analysis of long documents
+"""
+
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from medical_analyzer.core import llm_chain
+from medical_analyzer.core.chunking import CHARS_PER_TOKEN, estimate_tokens, merge_markdown_sections, split_into_chunks
+from medical_analyzer.core.config import settings
+
+def paragraphs(count: int, words: int = 40) -> str:
+    return "\n\n".join(f"Paragraph {i}: " + " ".join(["finding"] * words) for i in range(count))
+
+def test_short_text_is_one_chunk():
+    text = paragraphs(3)
+    assert split_into_chunks(text, estimate_tokens(text)) == [text]
+
+def test_chunks_fit_the_budget_and_keep_every_paragraph():
+    text = paragraphs(30)
+    budget = 200
+    
+    chunks = split_into_chunks(text, budget)
+    
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= budget for chunk in chunks)
+    assert "\n\n".join(chunks) == text
+
+def test_new_section_starts_a_new_chunk_once_half_full():
+    first = "\n\n".join(["HISTORY:"] + ["x" * 200] * 3)
+    second = "\n\n".join(["MEDICATIONS:"] + ["y" * 200] * 3)
+    
+    chunks = split_into_chunks(f"{first}\n\n{second}", token_budget=1000 // CHARS_PER_TOKEN)
+    
+    assert chunks == [first, second]
+
+def test_oversized_lines_are_split_hard():
+    chunks = split_into_chunks("z" * 1000, token_budget=50)
+    
+    assert all(len(chunk) <= 50 * CHARS_PER_TOKEN for chunk in chunks)
+    assert "".join(chunks) == "z" * 1000
+
+def test_merge_combines_sections_and_drops_duplicate_lines():
+    merged = merge_markdown_sections([
+        "## Diagnosis\n- Hypertension\n## Medications\n- Lisinopril",
+        "## Diagnosis\n- Hypertension\n- Type 2 diabetes\n## Follow-up\n- 3 months",
+    ])
+    
+    assert merged == (
+        "## Diagnosis\n- Hypertension\n- Type 2 diabetes\n\n"
+        "## Medications\n- Lisinopril\n\n"
+        "## Follow-up\n- 3 months"
+    )
+
+def test_token_budget_follows_the_active_backend(monkeypatch):
+    monkeypatch.setattr(settings, "OLLAMA_CONTEXT_SIZE", 2048)
+    monkeypatch.setattr(settings, "LLAMACPP_CONTEXT_SIZE", 8192)
+    
+    monkeypatch.setattr(settings, "LLM_BACKEND", "ollama")
+    ollama_budget = llm_chain.analysis_token_budget()
+    monkeypatch.setattr(settings, "LLM_BACKEND", "llamacpp")
+    llamacpp_budget = llm_chain.analysis_token_budget()
+    
+    assert llamacpp_budget - ollama_budget == 8192 - 2048
+    assert ollama_budget == 2048 - estimate_tokens(llm_chain.ANALYZER_SYSTEM_PROMPT) - int(settings.ANALYZER_RESPONSE_TOKENS)
+
+class RecordingLLM:
+    """Stands in for the analyzer model, answering each chunk with a markdown section"""
+    
+    def __init__(self):
+        self.contents = []
+    
+    async def ainvoke(self, messages, bypass_cache: bool = False):
+        content = messages[-1].content
+        self.contents.append(content)
+        return AIMessage(content=f"## Findings\n- chunk {len(self.contents)}\n## Plan\n- Review")
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    llm = RecordingLLM()
+    monkeypatch.setattr(llm_chain, "analyzer_llm", llm)
+    monkeypatch.setattr(llm_chain, "analysis_token_budget", lambda: 300)
+    return llm
+
+def test_long_document_is_analyzed_per_chunk_and_merged(analyzer):
+    result = asyncio.run(llm_chain.analyze_document({"context": paragraphs(40)}))
+    
+    chunk_count = len(analyzer.contents)
+    assert chunk_count > 1
+    assert all(content.startswith("Part ") for content in analyzer.contents)
+    findings, plan = result["analysis_result"].split("\n\n")
+    assert findings.splitlines()[1:] == [f"- chunk {i}" for i in range(1, chunk_count + 1)]
+    assert plan == "## Plan\n- Review"
+
+def test_short_document_is_analyzed_in_one_call(analyzer):
+    asyncio.run(llm_chain.analyze_document({"context": paragraphs(2)}))
+    
+    assert analyzer.contents == [paragraphs(2)]
@@ -0,0 +1,75 @@
+"""
+Tests for cursor pagination of the document index
+"""
+
+import time
+
+import pytest
+
+from medical_analyzer.services import document
+
+NOW = time.time()
+
+@pytest.fixture
+def index(data_dir):
+    """The test data directory's index, with ten uploads one minute apart"""
+    index = document.document_index
+    for i in range(10):
+        # Pairs share an upload time, so the path breaks the tie
+        add(index, data_dir, f"doc_{i}.pdf", uploaded_at=NOW - (i // 2) * 60, status="analyzed" if i % 3 == 0 else "uploaded")
+    return index
+
+def add(index, data_dir, name: str, uploaded_at: float, status: str = "uploaded"):
+    index.add(str(data_dir / name), name, 100, sha256=name, uploaded_at=uploaded_at, status=status)
+
+def walk(index, limit: int, status=None):
+    """Every page until next_cursor runs out"""
+    pages, cursor = [], None
+    while True:
+        documents, cursor = index.list(limit, cursor, status)
+        pages.append([doc["filename"] for doc in documents])
+        if cursor is None:
+            return pages
+
+def test_pages_cover_every_document_once_newest_first(index):
+    pages = walk(index, limit=3)
+    
+    assert [len(page) for page in pages] == [3, 3, 3, 1]
+    names = [name for page in pages for name in page]
+    assert sorted(names) == sorted(f"doc_{i}.pdf" for i in range(10))
+    # Newest first, and by path descending within the same upload time
+    assert names == ["doc_1.pdf", "doc_0.pdf", "doc_3.pdf", "doc_2.pdf", "doc_5.pdf",
+                     "doc_4.pdf", "doc_7.pdf", "doc_6.pdf", "doc_9.pdf", "doc_8.pdf"]
+
+def test_last_full_page_has_no_cursor(index):
+    assert [len(page) for page in walk(index, limit=5)] == [5, 5]
+
+def test_status_filter_applies_to_every_page(index):
+    pages = walk(index, limit=2, status="analyzed")
+    
+    assert [name for page in pages for name in page] == ["doc_0.pdf", "doc_3.pdf", "doc_6.pdf", "doc_9.pdf"]
+    assert index.count("analyzed") == 4
+
+def test_new_uploads_do_not_shift_later_pages(index, data_dir):
+    _, cursor = index.list(4)
+    add(index, data_dir, "newer.pdf", uploaded_at=NOW + 60)
+    
+    second, _ = index.list(4, cursor)
+    
+    assert [doc["filename"] for doc in second] == ["doc_5.pdf", "doc_4.pdf", "doc_7.pdf", "doc_6.pdf"]
+
+def test_invalid_cursor_is_rejected(index):
+    with pytest.raises(ValueError):
+        index.list(3, "not-a-cursor")
+
+def test_files_endpoint_pages_through_the_index(api_client, index):
+    response = api_client.get("/files", params={"limit": 4})
+    body = response.json()
+    assert response.status_code == 200
+    assert body["count"] == 10
+    assert len(body["files"]) == 4
+    
+    response = api_client.get("/files", params={"limit": 4, "cursor": body["next_cursor"]})
+    assert [file["filename"] for file in response.json()["files"]] == ["doc_5.pdf", "doc_4.pdf", "doc_7.pdf", "doc_6.pdf"]
+    
+    assert api_client.get("/files", params={"cursor": "not-a-cursor"}).status_code == 400
@@ -0,0 +1,157 @@
+"""
+Tests for the job manager and the upload admission control
+"""
+
+import threading
+
+import pytest
+
+from medical_analyzer.api import routes
+from medical_analyzer.services.jobs import JobManager, JobStatus, JobStore, QueueFullError
+
+PDF = ("report.pdf", b"%PDF-1.4 test document", "application/pdf")
+
+@pytest.fixture
+def manager():
+    """One worker, so a blocking job keeps the next ones queued"""
+    manager = JobManager(max_workers=1, max_queue_depth=2)
+    yield manager
+    manager.shutdown()
+
+def block(manager: JobManager):
+    """Submit a job that runs until the returned event is set"""
+    release = threading.Event()
+    started = threading.Event()
+    
+    def wait():
+        started.set()
+        release.wait(10)
+        return "released"
+    
+    job = manager.submit(wait, description="blocker")
+    assert started.wait(10)
+    return job, release
+
+def test_job_runs_to_success(manager):
+    job = manager.submit(lambda a, b: a + b, 2, b=3, description="add")
+    job.future.result(timeout=10)
+    
+    assert job.status == JobStatus.SUCCEEDED
+    assert job.result == 5
+    assert job.started_at is not None and job.finished_at >= job.started_at
+    assert manager.get(job.id) is job
+
+def test_failed_job_only_surfaces_validation_errors(manager):
+    def fail(error):
+        raise error
+    
+    invalid = manager.submit(fail, ValueError("Not a PDF"))
+    crashed = manager.submit(fail, RuntimeError("secret path /srv/data"))
+    invalid.future.result(timeout=10)
+    crashed.future.result(timeout=10)
+    
+    assert invalid.status == JobStatus.FAILED
+    assert invalid.error == "Not a PDF"
+    assert crashed.status == JobStatus.FAILED
+    assert "secret" not in crashed.error
+
+def test_cancelled_queued_job_never_runs(manager):
+    _, release = block(manager)
+    calls = []
+    queued = manager.submit(calls.append, "ran")
+    
+    assert manager.cancel(queued.id).status == JobStatus.CANCELLED
+    release.set()
+    
+    assert manager.queue_depth == 0
+    assert calls == []
+
+def test_cancelled_running_job_discards_its_result(manager):
+    job, release = block(manager)
+    
+    manager.cancel(job.id)
+    assert job.status == JobStatus.RUNNING
+    release.set()
+    job.future.result(timeout=10)
+    
+    assert job.status == JobStatus.CANCELLED
+    assert job.result is None
+
+def test_submit_rejects_beyond_queue_depth(manager):
+    _, release = block(manager)
+    try:
+        manager.submit(lambda: None)
+        manager.submit(lambda: None)
+        with pytest.raises(QueueFullError):
+            manager.submit(lambda: None)
+        assert manager.stats()["queue_depth"] == 2
+    finally:
+        release.set()
+
+def test_shared_store_answers_for_other_workers(tmp_path):
+    store_path = str(tmp_path / "jobs.sqlite3")
+    owner = JobManager(max_workers=1, max_queue_depth=2, store=JobStore(store_path))
+    other = JobManager(max_workers=1, max_queue_depth=2, store=JobStore(store_path))
+    try:
+        job, release = block(owner)
+        
+        assert other.get(job.id).status == JobStatus.RUNNING
+        assert other.cancel(job.id) is not None
+        release.set()
+        job.future.result(timeout=10)
+        
+        assert job.status == JobStatus.CANCELLED
+        assert other.get(job.id).status == JobStatus.CANCELLED
+        assert other.get("unknown") is None
+    finally:
+        owner.shutdown()
+        other.shutdown()
+
+def uploaded_files(data_dir):
+    return [path for path in data_dir.rglob("*") if path.is_file() and not path.name.startswith("documents.sqlite3")]
+
+def test_upload_rejected_with_503_when_queue_is_full(api_client, data_dir, manager, monkeypatch):
+    monkeypatch.setattr(routes, "job_manager", manager)
+    _, release = block(manager)
+    try:
+        manager.submit(lambda: None)
+        manager.submit(lambda: None)
+        
+        for url, field in (("/analyze-medical-document", "file"), ("/analyze-medical-documents", "files")):
+            response = api_client.post(url, files={field: PDF})
+            assert response.status_code == 503
+            assert response.headers["Retry-After"] == "30"
+    finally:
+        release.set()
+    
+    assert uploaded_files(data_dir) == []
+
+def test_upload_discarded_when_queue_fills_during_upload(api_client, data_dir, manager, monkeypatch):
+    def full(*args, **kwargs):
+        raise QueueFullError("Job queue is full (2 jobs waiting)")
+    
+    monkeypatch.setattr(routes, "job_manager", manager)
+    monkeypatch.setattr(manager, "submit", full)
+    
+    response = api_client.post("/analyze-medical-document", files={"file": PDF})
+    
+    assert response.status_code == 503
+    assert uploaded_files(data_dir) == []
+    assert routes.DocumentService.list_saved_files()["count"] == 0
+
+def test_job_status_and_cancel_endpoints(api_client, manager, monkeypatch):
+    monkeypatch.setattr(routes, "job_manager", manager)
+    job, release = block(manager)
+    try:
+        response = api_client.get(f"/jobs/{job.id}")
+        assert response.status_code == 200
+        assert response.json()["job_status"] == "running"
+        
+        queued = manager.submit(lambda: None)
+        response = api_client.delete(f"/jobs/{queued.id}")
+        assert response.json()["job_status"] == "cancelled"
+        
+        assert api_client.get("/jobs/unknown").status_code == 404
+        assert api_client.delete("/jobs/unknown").status_code == 404
+    finally:
+        release.set()
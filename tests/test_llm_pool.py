@@ -0,0 +1,94 @@
+"""
+Tests for the pooled Ollama client against benchmarks.stub_ollama
+"""
+
+import asyncio
+
+import pytest
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from medical_analyzer.services import llm_pool
+from medical_analyzer.services.llm_pool import OllamaConnectionPool, OllamaError, PooledChatOllama
+
+# Fast stub responses: no prompt delay, three tokens
+FAST = dict(latency=0.0, tokens_per_second=1000.0, response_tokens=3)
+REPLY = "token0 token1 token2 "
+
+@pytest.fixture
+def use_pool(monkeypatch):
+    """Point PooledChatOllama at a fresh pool for the given stub server"""
+    pools = []
+    
+    def install(url: str, max_parallel_per_model: int = 4, max_retries: int = 2):
+        pool = OllamaConnectionPool(
+            base_url=url,
+            max_connections=8,
+            max_parallel_per_model=max_parallel_per_model,
+            max_retries=max_retries,
+            retry_backoff=0.01,
+            timeout=10,
+        )
+        monkeypatch.setattr(llm_pool, "ollama_pool", pool)
+        pools.append(pool)
+        return pool
+    
+    yield install
+    for pool in pools:
+        pool.close()
+
+def test_ainvoke_returns_content_and_usage(stub_ollama, use_pool):
+    url, _ = stub_ollama(**FAST)
+    use_pool(url)
+    llm = PooledChatOllama(model="phi3")
+    response = asyncio.run(llm.ainvoke([SystemMessage(content="system"), HumanMessage(content="blood pressure normal")]))
+    assert response.content == REPLY
+    assert response.usage_metadata["input_tokens"] == 4
+    assert response.usage_metadata["output_tokens"] == 3
+
+def test_invoke_from_sync_code(stub_ollama, use_pool):
+    url, _ = stub_ollama(**FAST)
+    use_pool(url)
+    response = PooledChatOllama(model="phi3").invoke([HumanMessage(content="hello")])
+    assert response.content == REPLY
+
+def test_retries_transient_errors(stub_ollama, use_pool):
+    url, config = stub_ollama(failures=2, **FAST)
+    pool = use_pool(url, max_retries=2)
+    response = PooledChatOllama(model="phi3").invoke([HumanMessage(content="recovered")])
+    assert response.content == REPLY
+    assert config.requests == 3
+    assert pool.stats()["retries"] == 2
+
+def test_gives_up_after_max_retries(stub_ollama, use_pool):
+    url, config = stub_ollama(failures=10, **FAST)
+    pool = use_pool(url, max_retries=1)
+    with pytest.raises(OllamaError):
+        PooledChatOllama(model="phi3").invoke([HumanMessage(content="lost")])
+    assert config.requests == 2
+    assert pool.stats()["failures"] == 1
+
+def test_per_model_concurrency_limit(stub_ollama, use_pool):
+    url, config = stub_ollama(latency=0.1, tokens_per_second=1000.0, response_tokens=3, num_parallel=8)
+    use_pool(url, max_parallel_per_model=2)
+    llm = PooledChatOllama(model="llama3")
+    
+    async def run():
+        return await asyncio.gather(*(llm.ainvoke([HumanMessage(content=f"doc {i}")]) for i in range(6)))
+    
+    responses = asyncio.run(run())
+    assert [response.content for response in responses] == [REPLY] * 6
+    assert config.max_active == 2
+
+def test_astream_yields_tokens(stub_ollama, use_pool):
+    url, _ = stub_ollama(**FAST)
+    use_pool(url)
+    llm = PooledChatOllama(model="phi3")
+    
+    async def run():
+        return [chunk async for chunk in llm.astream([HumanMessage(content="one two three")])]
+    
+    chunks = asyncio.run(run())
+    message = sum(chunks[1:], chunks[0])
+    assert message.content.split() == ["token0", "token1", "token2"]
+    assert message.usage_metadata["output_tokens"] == 3
@@ -0,0 +1,103 @@
+"""
+Tests for routing PDF pages between the text layer and OCR
+"""
+
+import pymupdf
+import pytest
+
+from benchmarks.synthetic import generate_mixed_pdf
+from medical_analyzer.services import ocr
+from medical_analyzer.services.ocr import classify_page
+
+STAMP = "RECEIVED 03/06/2024 - Medical Records Dept."
+
+def new_page():
+    doc = pymupdf.open()
+    return doc, doc.new_page()
+
+def cover_with_image(page):
+    """Fill the page with a bitmap, as a scanner would"""
+    pixmap = pymupdf.Pixmap(pymupdf.csGRAY, pymupdf.IRect(0, 0, 100, 130), False)
+    pixmap.clear_with(200)
+    page.insert_image(page.rect, pixmap=pixmap, keep_proportion=False)
+
+@pytest.fixture
+def page():
+    doc, page = new_page()
+    yield page
+    doc.close()
+
+def test_text_page_uses_the_text_layer(page):
+    page.insert_text((50, 50), "Vital Signs: BP 150/95 mmHg, HR 92 bpm, RR 18, SpO2 97% on room air.\n" * 5, fontsize=9)
+    
+    result = classify_page(page)
+    
+    assert result["source"] == "text_layer"
+    assert result["has_fonts"] and result["image_coverage"] == 0
+    assert "SpO2" in result["text"]
+
+def test_image_only_page_is_sent_to_ocr(page):
+    cover_with_image(page)
+    
+    result = classify_page(page)
+    
+    assert result["source"] == "ocr"
+    assert result["chars"] == 0
+    assert result["image_coverage"] == pytest.approx(1.0)
+
+def test_scan_with_a_text_stamp_is_sent_to_ocr(page):
+    cover_with_image(page)
+    page.insert_text((50, 50), STAMP, fontsize=9)
+    
+    assert classify_page(page)["source"] == "ocr"
+
+def test_dense_text_over_an_image_uses_the_text_layer(page):
+    cover_with_image(page)
+    page.insert_text((50, 50), "Assessment: likely stable angina pectoris, no acute changes.\n" * 10, fontsize=9)
+    
+    assert classify_page(page)["source"] == "text_layer"
+
+def test_short_text_without_images_is_kept(page):
+    page.insert_text((50, 50), "Page 2", fontsize=9)
+    
+    assert classify_page(page)["source"] == "text_layer"
+
+def test_blank_page_is_empty(page):
+    assert classify_page(page)["source"] == "empty"
+
+def test_thresholds_come_from_the_settings(page, monkeypatch):
+    cover_with_image(page)
+    page.insert_text((50, 50), STAMP, fontsize=9)
+    monkeypatch.setattr(ocr.settings, "OCR_PAGE_MIN_CHARS", 10)
+    
+    assert classify_page(page)["source"] == "text_layer"
+
+def test_only_scanned_pages_are_ocrd(tmp_path, monkeypatch):
+    path = generate_mixed_pdf(str(tmp_path / "mixed.pdf"), pages=4, dpi=50)
+    requested = []
+    
+    def fake_ocr(pdf_path, page_numbers=None):
+        requested.extend(page_numbers)
+        return [{"page": number, "text": f"ocr text {number}", "seconds": 0.0} for number in page_numbers]
+    
+    monkeypatch.setattr(ocr, "ocr_pdf_pages", fake_ocr)
+    
+    pages = ocr._extract_pages_from_pdf(path)
+    
+    assert requested == [2, 4]
+    assert [page["source"] for page in pages] == ["text_layer", "ocr", "text_layer", "ocr"]
+    assert pages[1]["text"] == "ocr text 2"
+    assert "Page 1" in pages[0]["text"]
+
+def test_missing_ocr_engine_falls_back_to_the_text_layer(tmp_path, monkeypatch):
+    path = generate_mixed_pdf(str(tmp_path / "mixed.pdf"), pages=2, dpi=50)
+    
+    def no_engine(pdf_path, page_numbers=None):
+        raise ImportError("tesseract is not installed")
+    
+    monkeypatch.setattr(ocr, "ocr_pdf_pages", no_engine)
+    
+    pages = ocr._extract_pages_from_pdf(path)
+    
+    assert [page["source"] for page in pages] == ["text_layer", "ocr_unavailable"]
+    assert pages[1]["text"] == ""
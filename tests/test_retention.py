@@ -0,0 +1,105 @@
+"""
+Tests for the retention sweeper
+"""
+
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from medical_analyzer.core.config import settings
+from medical_analyzer.services import document, retention
+from medical_analyzer.services.cache import DiskCache
+from medical_analyzer.services.document import DocumentIndex
+from medical_analyzer.services.jobs import JobManager
+from medical_analyzer.services.retention import RetentionSweeper
+
+DAY = 24 * 3600
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    """Fresh document index, caches and job manager for the sweeper"""
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path / "cache"))
+    index = DocumentIndex(str(data_dir / "documents.sqlite3"), str(data_dir))
+    extraction = DiskCache(str(tmp_path / "extraction.sqlite3"), max_bytes=1024 * 1024, name="test-extraction")
+    responses = DiskCache(str(tmp_path / "llm.sqlite3"), max_bytes=1024 * 1024, name="test-llm")
+    manager = JobManager(max_workers=1, max_queue_depth=10)
+    monkeypatch.setattr(document, "document_index", index)
+    monkeypatch.setattr(retention, "extraction_cache", extraction)
+    monkeypatch.setattr(retention, "llm_response_cache", responses)
+    monkeypatch.setattr(retention, "job_manager", manager)
+    yield data_dir, index, extraction, responses, manager
+    manager.shutdown()
+
+def add_upload(data_dir, index, name: str, age_days: float) -> str:
+    path = data_dir / name
+    path.write_bytes(b"%PDF-1.4 test")
+    index.add(str(path), name, path.stat().st_size, uploaded_at=time.time() - age_days * DAY)
+    return str(path)
+
+def add_entry(cache: DiskCache, key: str, age_days: float):
+    cache.set(key, f"value of {key}")
+    with cache._lock:
+        conn = cache._connect()
+        conn.execute("UPDATE entries SET created_at = ? WHERE key = ?", (time.time() - age_days * DAY, key))
+        conn.commit()
+
+def make_sweeper(retention_days: float = 1, cache_retention_days: float = 0) -> RetentionSweeper:
+    return RetentionSweeper(retention_days, cache_retention_days, interval_seconds=3600, batch_size=2, pause_seconds=0)
+
+def test_purges_aged_uploads_in_batches(stores):
+    data_dir, index, _, _, _ = stores
+    old = [add_upload(data_dir, index, f"old_{i}.pdf", age_days=3) for i in range(5)]
+    new = add_upload(data_dir, index, "new.pdf", age_days=0)
+    
+    report = make_sweeper().sweep()
+    
+    assert report["targets"]["documents"]["deleted"] == 5
+    assert not any(Path(path).exists() for path in old)
+    assert Path(new).exists()
+    assert index.count() == 1
+
+def test_cache_entries_follow_file_retention(stores):
+    _, _, extraction, responses, _ = stores
+    for cache in (extraction, responses):
+        add_entry(cache, "aged", age_days=2)
+        add_entry(cache, "fresh", age_days=0)
+    
+    report = make_sweeper(retention_days=1).sweep()
+    
+    assert report["targets"]["extraction_cache"]["deleted"] == 1
+    assert report["targets"]["llm_cache"]["deleted"] == 1
+    for cache in (extraction, responses):
+        assert cache.get("aged") is None
+        assert cache.get("fresh") == "value of fresh"
+
+def test_cache_retention_days_overrides_file_retention(stores):
+    _, _, extraction, _, _ = stores
+    add_entry(extraction, "two_days", age_days=2)
+    add_entry(extraction, "ten_days", age_days=10)
+    
+    make_sweeper(retention_days=1, cache_retention_days=7).sweep()
+    
+    assert extraction.get("two_days") == "value of two_days"
+    assert extraction.get("ten_days") is None
+
+def test_keeps_uploads_of_active_jobs(stores):
+    data_dir, index, _, _, manager = stores
+    in_use = add_upload(data_dir, index, "in_use.pdf", age_days=3)
+    idle = add_upload(data_dir, index, "idle.pdf", age_days=3)
+    release = threading.Event()
+    job = manager.submit(release.wait, 10, description="holds in_use.pdf", document_paths=[in_use])
+    
+    try:
+        make_sweeper().sweep()
+        assert Path(in_use).exists()
+        assert not Path(idle).exists()
+    finally:
+        release.set()
+    job.future.result(timeout=10)
+    
+    make_sweeper().sweep()
+    assert not Path(in_use).exists()
@@ -0,0 +1,98 @@
+"""
+Tests for streaming multipart uploads
+"""
+
+import hashlib
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from medical_analyzer.core.config import settings
+from medical_analyzer.services import document
+from medical_analyzer.services import upload as upload_service
+from medical_analyzer.services.upload import UploadTooLargeError, receive_uploads
+
+MAX_BYTES = 4096
+
+@pytest.fixture
+def client(data_dir):
+    """App whose only route streams up to three files of at most MAX_BYTES each"""
+    app = FastAPI()
+    
+    @app.post("/upload")
+    async def upload(request: Request):
+        try:
+            uploads = await receive_uploads(request, field_name="files", max_files=3, max_bytes=MAX_BYTES)
+        except UploadTooLargeError as e:
+            return JSONResponse(status_code=413, content={"message": str(e)})
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"message": str(e)})
+        return [
+            {"path": upload.path, "filename": upload.filename, "size": upload.size, "sha256": upload.sha256}
+            for upload in uploads
+        ]
+    
+    with TestClient(app) as client:
+        yield client
+
+def pdf(name: str, size: int):
+    content = (b"%PDF-1.4 " + bytes(range(256)) * (size // 256 + 1))[:size]
+    return ("files", (name, content, "application/pdf"))
+
+def saved_files(data_dir):
+    return sorted(path for path in data_dir.rglob("*") if path.is_file() and not path.name.startswith("documents.sqlite3"))
+
+def test_files_are_saved_hashed_and_indexed(client, data_dir):
+    files = [pdf("first.pdf", 1000), pdf("second.pdf", MAX_BYTES)]
+    
+    response = client.post("/upload", files=files)
+    
+    assert response.status_code == 200
+    uploads = response.json()
+    assert [upload["filename"] for upload in uploads] == ["first.pdf", "second.pdf"]
+    for upload, (_, (_, content, _)) in zip(uploads, files):
+        with open(upload["path"], "rb") as f:
+            assert f.read() == content
+        assert upload["size"] == len(content)
+        assert upload["sha256"] == hashlib.sha256(content).hexdigest()
+        assert document.document_index.find_by_hash(upload["sha256"])
+    assert len(saved_files(data_dir)) == 2
+
+def test_oversized_file_is_rejected_while_streaming(client, data_dir):
+    # Within the Content-Length allowance, so only the streaming check can catch it
+    response = client.post("/upload", files=[pdf("small.pdf", 100), pdf("large.pdf", MAX_BYTES + 1)])
+    
+    assert response.status_code == 413
+    # Neither the partial file nor the accepted one is kept
+    assert saved_files(data_dir) == []
+    assert document.document_index.count() == 0
+
+def test_declared_length_over_the_limit_is_rejected_up_front(api_client, data_dir, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 1024)
+    # Nothing may be written before the rejection
+    monkeypatch.setattr(upload_service, "_UploadTarget", None)
+    
+    response = api_client.post("/analyze-medical-document", files={"file": ("scan.pdf", b"x" * 200_000, "application/pdf")})
+    
+    assert response.status_code == 413
+    assert saved_files(data_dir) == []
+
+@pytest.mark.parametrize("files, message", [
+    ([("files", ("notes.txt", b"plain text", "text/plain"))], "files are supported"),
+    ([pdf(f"page{i}.pdf", 10) for i in range(4)], "Too many files"),
+    ([("files", ("empty.pdf", b"", "application/pdf"))], "empty"),
+    ([("other", ("report.pdf", b"%PDF-1.4", "application/pdf"))], "No file uploaded"),
+])
+def test_invalid_uploads_are_rejected(client, data_dir, files, message):
+    response = client.post("/upload", files=files)
+    
+    assert response.status_code == 400
+    assert message in response.json()["message"]
+    assert saved_files(data_dir) == []
+
+def test_client_paths_are_reduced_to_the_filename(client):
+    response = client.post("/upload", files=[("files", ("C:\\Users\\me\\scan.pdf", b"%PDF-1.4", "application/pdf"))])
+    
+    assert response.json()[0]["filename"] == "scan.pdf"